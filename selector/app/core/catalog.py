@@ -79,6 +79,10 @@ def load_products(csv_path: str) -> List[Dict[str, Any]]:
             category = row.get("category", "").strip().lower()
             brand = row.get("brand")
             model = row.get("model")
+            if not model:
+                # brand/model are required for SKUs (catalog/schemas/fields.yaml);
+                # template rows belong to load_capabilities
+                continue
             spec_json = row.get("spec_json") or "{}"
             try:
                 spec = json.loads(spec_json)
@@ -89,6 +93,7 @@ def load_products(csv_path: str) -> List[Dict[str, Any]]:
                 "category": category,
                 "brand": brand,
                 "model": model,
+                "price": _safe_float(row.get("price")),
                 "lifecycle_status": row.get("lifecycle_status"),
                 "updated_at": row.get("updated_at"),
                 "spec": spec,
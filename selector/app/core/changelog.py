@@ -0,0 +1,436 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import contextlib
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per catalog
+    fcntl = None  # type: ignore[assignment]
+
+from .catalog import _derive_metrics, _safe_float, load_products
+from ..rag.state import collection_path
+
+
+Key = Tuple[str, str, str]
+BASE_COLUMNS = ["category", "brand", "model", "price", "spec_json", "lifecycle_status", "updated_at"]
+_FIELDS = {"price", "lifecycle_status", "updated_at", "spec"}
+
+
+def product_key(item: Dict[str, Any]) -> Key:
+    return (str(item.get("category") or "").strip().lower(), str(item.get("brand") or ""), str(item.get("model") or ""))
+
+
+def _replace_durably(path: str, write: Callable[[Any], None], newline: Optional[str] = None) -> None:
+    """Write a uniquely named temp file next to `path`, fsync it, then rename it over `path`."""
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", newline=newline, encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        dfd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return  # no directory handles (Windows)
+    try:
+        os.fsync(dfd)
+    finally:
+        os.close(dfd)
+
+
+@contextlib.contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """Exclusive advisory lock on `path`, shared with every process (and thread) opening it."""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def build_product(category: str, brand: str, model: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """A load_products()-shaped row; derived metrics are recomputed for this row only."""
+    base: Dict[str, Any] = {
+        "category": category,
+        "brand": brand or None,
+        "model": model,
+        "price": _safe_float(fields.get("price")),
+        "lifecycle_status": fields.get("lifecycle_status"),
+        "updated_at": fields.get("updated_at"),
+        "spec": dict(fields.get("spec") or {}),
+    }
+    base.update(_derive_metrics(category, base))
+    return base
+
+
+class Snapshot:
+    """Immutable catalog state. Writers build a new one; readers keep theirs.
+
+    A snapshot made by apply() remembers the derived structures of the last
+    snapshot that built any, plus every row changed since, so derive() can
+    patch them instead of rebuilding from all rows.
+    """
+
+    def __init__(
+        self,
+        products: Dict[Key, Dict[str, Any]],
+        version: int,
+        base: Optional[Tuple[Dict[str, Any], Dict[Key, Optional[Dict[str, Any]]]]] = None,
+    ) -> None:
+        self.products = products
+        self.version = version
+        self._base = base
+        self._rows: Optional[List[Dict[str, Any]]] = None
+        self._memo: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        if self._rows is None:
+            self._rows = list(self.products.values())
+        return self._rows
+
+    def child(self, products: Dict[Key, Dict[str, Any]], version: int, changes: Dict[Key, Optional[Dict[str, Any]]]) -> "Snapshot":
+        """Next snapshot; changes maps each touched key to its new row (None = deleted)."""
+        if self._memo:
+            base = (self._memo, dict(changes))
+        elif self._base is not None:
+            base = (self._base[0], {**self._base[1], **changes})
+        else:
+            base = None
+        return Snapshot(products, version, base)
+
+    def derive(
+        self,
+        name: str,
+        build: Callable[[], Any],
+        update: Optional[Callable[[Any, Dict[Key, Optional[Dict[str, Any]]]], Any]] = None,
+    ) -> Any:
+        """Per-snapshot derived structure (e.g. the matching index), built once.
+
+        update(previous, changes) patches the structure of an earlier snapshot
+        when one exists; otherwise build() starts from scratch.
+        """
+        with self._lock:
+            if name not in self._memo:
+                if update is not None and self._base is not None and name in self._base[0]:
+                    self._memo[name] = update(self._base[0][name], self._base[1])
+                else:
+                    self._memo[name] = build()
+            return self._memo[name]
+
+
+class CatalogStore:
+    """Source CSV + append-only JSONL change log, served as copy-on-write snapshots.
+
+    apply() appends the operations to the log, then swaps in a new snapshot
+    that shares every untouched row with the previous one, so readers never
+    wait on writers and a price change costs a dict copy, not a reparse.
+    Once the log holds CATALOG_COMPACT_EVERY operations it is folded, in the
+    background, into a compacted base CSV under the state dir (the configured
+    CSV is never rewritten); operations logged meanwhile are kept. If the source
+    CSV is replaced, it becomes the new base and pending log entries replay on it.
+
+    Several processes (API workers) may share the files: appends and
+    compactions hold a file lock, versions continue from the log tail, and
+    snapshot() replays lines other processes appended since it last looked.
+    """
+
+    def __init__(self, source_csv: str, state_dir: Optional[str] = None, compact_every: Optional[int] = None) -> None:
+        self.source_csv = source_csv
+        self.name = os.path.splitext(os.path.basename(source_csv))[0]
+        self.state_dir = state_dir
+        self.base_csv = collection_path(self.name, ".base.csv", state_dir)
+        self.base_meta = collection_path(self.name, ".base.json", state_dir)
+        self.log_path = collection_path(self.name, ".changes.jsonl", state_dir)
+        self.lock_path = collection_path(self.name, ".changes.lock", state_dir)
+        self.compact_every = compact_every or int(os.getenv("CATALOG_COMPACT_EVERY", "1000"))
+        self._write = threading.Lock()
+        self._compact = threading.Lock()  # one compaction at a time
+        self._compacting = False  # a background compaction is scheduled or running
+        self._log_ops = 0
+        self._log_pos = 0  # bytes of the log replayed into _snap
+        self._log_ino: Optional[int] = None
+        self._meta_mtime: Optional[int] = None
+        self._source_sig = ""
+        self._snap = Snapshot({}, 0)
+        with self._write, _locked(self.lock_path):
+            self._refresh()
+
+    def _sig(self) -> str:
+        try:
+            st = os.stat(self.source_csv)
+            return f"{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            return "-"
+
+    def _meta(self) -> Dict[str, Any]:
+        try:
+            with open(self.base_meta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _base_path(self, meta: Dict[str, Any]) -> str:
+        # compacted bases are versioned files named by the meta; older metas
+        # point at the fixed base_csv
+        return os.path.join(os.path.dirname(self.base_meta), meta["base"]) if meta.get("base") else self.base_csv
+
+    def _compacted_for(self, sig: str) -> bool:
+        meta = self._meta()
+        return meta.get("source_sig") == sig and os.path.exists(self._base_path(meta))
+
+    def _files(self) -> Tuple[Optional[int], int, Optional[int]]:
+        """(log inode, log size, meta mtime); a compaction replaces both files."""
+        try:
+            st = os.stat(self.log_path)
+            ino, size = st.st_ino, st.st_size
+        except OSError:
+            ino, size = None, 0
+        try:
+            meta = os.stat(self.base_meta).st_mtime_ns
+        except OSError:
+            meta = None
+        return ino, size, meta
+
+    def _stale(self) -> bool:
+        ino, size, meta = self._files()
+        return self._sig() != self._source_sig or meta != self._meta_mtime or ino != self._log_ino or size != self._log_pos
+
+    def _load(self) -> None:
+        """Full reload: base CSV, then the whole log. Caller holds the file lock."""
+        sig = self._sig()
+        meta = self._meta()
+        compacted = meta.get("source_sig") == sig and os.path.exists(self._base_path(meta))
+        base = self._base_path(meta) if compacted else self.source_csv
+        products = {product_key(p): p for p in load_products(base)}
+        self._source_sig = sig
+        self._snap = Snapshot(products, int(meta.get("version") or 0) if compacted else 0)
+        self._log_ops = 0
+        self._log_pos = 0
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Replay the complete log lines past _log_pos (appended by any process)."""
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_pos)
+                data = f.read()
+        except OSError:
+            return
+        end = data.rfind(b"\n") + 1  # an unterminated tail is still being written, or torn
+        if not end:
+            return
+        products = dict(self._snap.products)
+        changes: Dict[Key, Optional[Dict[str, Any]]] = {}
+        version = self._snap.version
+        ops = 0
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            changes[product_key(entry)] = self._apply_op(products, entry)
+            version = max(version, int(entry.get("v", 0)))
+            ops += 1
+        self._log_pos += end
+        self._log_ops += ops
+        if ops:
+            self._snap = self._snap.child(products, version, changes)
+
+    def _refresh(self) -> None:
+        """Bring _snap up to the files. Caller holds _write and the file lock."""
+        ino, size, meta = self._files()
+        replaced = self._log_ino is not None and ino != self._log_ino
+        if self._sig() != self._source_sig or meta != self._meta_mtime or replaced or size < self._log_pos:
+            # source CSV replaced, or another process compacted: start over
+            self._load()
+        else:
+            self._catch_up()
+        ino, size, self._meta_mtime = self._files()
+        self._log_ino = ino
+        if size > self._log_pos:
+            # nobody appends while we hold the lock: this is a crash's torn line
+            os.truncate(self.log_path, self._log_pos)
+
+    def snapshot(self) -> Snapshot:
+        if self._stale():
+            with self._write, _locked(self.lock_path):
+                self._refresh()
+        return self._snap
+
+    @staticmethod
+    def _apply_op(products: Dict[Key, Dict[str, Any]], entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = product_key(entry)
+        op = entry.get("op")
+        if op == "delete":
+            products.pop(key, None)
+            return None
+        fields = {k: v for k, v in (entry.get("fields") or {}).items() if k in _FIELDS}
+        if op == "patch":
+            cur = products.get(key)
+            if cur is None:
+                return None
+            merged = {k: cur.get(k) for k in _FIELDS}
+            spec = dict(cur.get("spec") or {})
+            spec.update(fields.pop("spec", None) or {})
+            merged.update(fields)
+            merged["spec"] = spec
+            fields = merged
+        row = build_product(key[0], key[1], key[2], fields)
+        products[key] = row
+        return row
+
+    def apply(self, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """ops: {"op": "upsert"|"patch"|"delete", category, brand, model, fields}.
+
+        Returns the new version, the rows written, the keys deleted and the
+        patch/delete targets that did not exist.
+        """
+        with self._write, _locked(self.lock_path):
+            # replay what other processes logged, so the version continues
+            # from the log tail and patches see their rows
+            self._refresh()
+            old = self._snap
+            products = dict(old.products)  # shallow: untouched rows are shared
+            version = old.version + 1
+            changes: Dict[Key, Optional[Dict[str, Any]]] = {}
+            missing: List[Key] = []
+            entries = []
+            now = time.time()
+            for op in ops:
+                key = product_key(op)
+                if not key[0] or not key[2]:
+                    missing.append(key)
+                    continue
+                if op.get("op") in {"patch", "delete"} and key not in products:
+                    missing.append(key)
+                    continue
+                entry = {"v": version, "ts": now, "op": op.get("op"), "category": key[0], "brand": key[1], "model": key[2], "fields": op.get("fields") or {}}
+                changes[key] = self._apply_op(products, entry)
+                entries.append(entry)
+            if entries:
+                data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+                with open(self.log_path, "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._log_pos += len(data)
+                self._log_ino = self._files()[0]  # the append may have created the log
+                self._log_ops += len(entries)
+                self._snap = old.child(products, version, changes)
+            if self._log_ops >= self.compact_every and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self._compact_background, daemon=True).start()
+            return {
+                "version": self._snap.version,
+                "written": [row for row in changes.values() if row is not None],
+                "deleted": [k for k, row in changes.items() if row is None],
+                "missing": missing,
+            }
+
+    def _compact_background(self) -> None:
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def compact(self) -> int:
+        """Write the current snapshot as the compacted base and drop the folded log entries.
+
+        Callers are serialized; one arriving during a compaction waits for it,
+        then folds whatever was logged meanwhile. A process that finds the base
+        already folded to its version by another one keeps that base.
+        """
+        with self._compact:
+            snap = self.snapshot()
+            base = collection_path(self.name, f".base.{snap.version}.csv", self.state_dir)
+
+            def write_base(f: Any) -> None:
+                w = csv.writer(f)
+                w.writerow(BASE_COLUMNS)
+                for p in snap.rows:
+                    w.writerow([
+                        p.get("category"), p.get("brand") or "", p.get("model"), p.get("price"),
+                        json.dumps(p.get("spec") or {}, ensure_ascii=False), p.get("lifecycle_status") or "", p.get("updated_at") or "",
+                    ])
+
+            # writers keep appending while the base is written; it only takes
+            # effect once the meta names it, so a crash leaves the old base and
+            # the full log
+            _replace_durably(base, write_base, newline="")
+            with self._write, _locked(self.lock_path):
+                self._refresh()
+                meta = self._meta()
+                if meta.get("source_sig") == self._source_sig and int(meta.get("version") or 0) >= snap.version:
+                    if self._base_path(meta) != base:
+                        with contextlib.suppress(OSError):
+                            os.unlink(base)
+                    return int(meta["version"])
+                # every entry in the log has been replayed under the lock, and
+                # versions grow along it: the ones after snap.version are exactly
+                # those the new base lacks
+                rest: List[str] = []
+                if os.path.exists(self.log_path):
+                    with open(self.log_path, encoding="utf-8", newline="") as f:
+                        for line in f:
+                            try:
+                                if int(json.loads(line).get("v", 0)) > snap.version:
+                                    rest.append(line)
+                            except ValueError:
+                                continue
+                old_base = self._base_path(meta) if meta else None
+                new_meta = {"source_sig": self._source_sig, "version": snap.version, "base": os.path.basename(base), "compacted_at": time.time()}
+                _replace_durably(self.base_meta, lambda f: json.dump(new_meta, f))
+                _replace_durably(self.log_path, lambda f: f.writelines(rest), newline="")
+                self._log_ops = len(rest)
+                self._log_pos = len("".join(rest).encode("utf-8"))
+                self._log_ino, _, self._meta_mtime = self._files()
+                if old_base and old_base != base:
+                    with contextlib.suppress(OSError):
+                        os.unlink(old_base)
+            return snap.version
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._snap.version,
+            "products": len(self._snap.products),
+            "log_ops": self._log_ops,
+            "compact_every": self.compact_every,
+            "compacted": self._compacted_for(self._source_sig),
+        }
+
+
+_stores: Dict[str, CatalogStore] = {}
+_stores_lock = threading.Lock()
+
+
+def catalog_store(base_csv: str) -> CatalogStore:
+    path = os.path.abspath(base_csv)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CatalogStore(path)
+        return store
+
+
+def cached_products(csv_path: str) -> List[Dict[str, Any]]:
+    """Current catalog rows (base CSV + change log). Callers must not mutate them."""
+    if not os.path.exists(csv_path):
+        return []
+    return catalog_store(csv_path).snapshot().rows
@@ -0,0 +1,391 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import heapq
+import os
+import time
+
+import numpy as np
+
+from .changelog import Key, catalog_store, product_key
+from .recommend import _scenario_focus
+from .templates import TemplateIndex, plan_query
+
+
+# capacity dimensions each SKU category can supply towards a plan
+CATEGORY_DIMS: Dict[str, Tuple[str, ...]] = {
+    "server": ("vcpu", "memory_gb", "storage_tb", "iops"),
+    "switch": ("fabric_gbps",),
+    "security": ("l7_tput_gbps", "concurrent_sessions_m"),
+}
+# recommendation focus area -> category that covers it
+FOCUS_CATEGORY = {"compute": "server", "network": "switch", "security": "security"}
+_RETIRED = {"eol", "eos", "retired", "discontinued"}
+
+
+def _num(value: Any) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return 0.0
+
+
+def _stated(value: Any) -> Optional[float]:
+    """A spec number, None when the spec does not state one."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def sku_capacity(product: Dict[str, Any]) -> Dict[str, float]:
+    """Per-unit capacity of a catalog SKU along its category's dimensions.
+
+    Only dimensions the spec states are returned; a missing one is unknown and
+    the SKU is never counted on to cover it.
+    """
+    spec = product.get("spec") or {}
+    cat = product.get("category")
+    out: Dict[str, Optional[float]] = {}
+    if cat == "server":
+        vcpu = _stated(spec.get("vcpu"))
+        sockets, cores = _stated(spec.get("cpu_sockets")), _stated(spec.get("cores_per_socket"))
+        if vcpu is None and sockets is not None and cores is not None:
+            vcpu = sockets * cores * 2  # threads = sockets x cores x 2 (SMT)
+        out = {
+            "vcpu": vcpu,
+            "memory_gb": _stated(spec.get("memory_max_gb")),
+            "storage_tb": _stated(spec.get("storage_tb")),
+            "iops": _stated(spec.get("iops")),
+        }
+    elif cat == "switch":
+        ports = {k: _stated(spec.get(k)) for k in ("ports_ge", "ports_10ge", "uplinks_25g", "ports_25g", "ports_100g")}
+        if any(v is not None for v in ports.values()):
+            n = {k: v or 0.0 for k, v in ports.items()}
+            out = {"fabric_gbps": n["ports_ge"] + 10 * n["ports_10ge"] + 25 * (n["uplinks_25g"] + n["ports_25g"]) + 100 * n["ports_100g"]}
+    elif cat == "security":
+        out = {
+            "l7_tput_gbps": _stated(spec.get("l7_tput_gbps")),
+            "concurrent_sessions_m": _stated(spec.get("concurrent_sessions_m")),
+        }
+    return {d: v for d, v in out.items() if v is not None}
+
+
+def plan_requirements(plan: Dict[str, Any], categories: Sequence[str]) -> Dict[str, Dict[str, float]]:
+    """Translate planner output into per-category capacity floors (planned minimums)."""
+    c, s, n = plan.get("compute", {}), plan.get("storage", {}), plan.get("network", {})
+    need = {
+        "server": {
+            "vcpu": _num((c.get("vcpu_range") or [0])[0]),
+            "memory_gb": _num((c.get("memory_gb_range") or [0])[0]),
+            "storage_tb": _num(s.get("hot_capacity_tb")),
+            "iops": _num(s.get("iops_required")),
+        },
+        "switch": {"fabric_gbps": _num(n.get("north_south_gbps")) + _num(n.get("east_west_gbps"))},
+        "security": {
+            "l7_tput_gbps": _num(n.get("north_south_gbps")),
+            "concurrent_sessions_m": _num(n.get("max_connections")) / 1e6,
+        },
+    }
+    return {cat: need[cat] for cat in categories if cat in need}
+
+
+class CategoryIndex:
+    """Columnar view of one category: price vector plus an (n, dims) capacity
+    matrix; `known` marks the capacities the spec states (unknown ones are 0)."""
+
+    def __init__(self, category: str, products: List[Dict[str, Any]]) -> None:
+        self.category = category
+        self.dims = CATEGORY_DIMS[category]
+        self.products = products
+        self.price = np.array([_num(p.get("price")) for p in products], dtype=np.float64)
+        caps = [sku_capacity(p) for p in products]
+        self.caps = np.array([[cp.get(d, 0.0) for d in self.dims] for cp in caps], dtype=np.float64).reshape(len(products), len(self.dims))
+        self.known = np.array([[d in cp for d in self.dims] for cp in caps], dtype=bool).reshape(len(products), len(self.dims))
+        self.active = np.array([str(p.get("lifecycle_status") or "").lower() not in _RETIRED for p in products], dtype=bool)
+        self.brand = np.array([p.get("brand") for p in products], dtype=object)
+        self.pos = {product_key(p): i for i, p in enumerate(products)}
+
+    def with_changes(self, changes: Dict[Key, Optional[Dict[str, Any]]]) -> Optional["CategoryIndex"]:
+        """Copy with changed rows rewritten in place; None when rows were added or removed."""
+        mine = {k: p for k, p in changes.items() if k[0] == self.category}
+        if any(p is None or k not in self.pos for k, p in mine.items()):
+            return None
+        out = object.__new__(CategoryIndex)
+        out.category, out.dims, out.pos = self.category, self.dims, self.pos
+        out.products = list(self.products)
+        out.price, out.caps, out.known, out.active, out.brand = self.price.copy(), self.caps.copy(), self.known.copy(), self.active.copy(), self.brand
+        for k, p in mine.items():
+            i = self.pos[k]
+            cp = sku_capacity(p)
+            out.products[i] = p
+            out.price[i] = _num(p.get("price"))
+            out.caps[i] = [cp.get(d, 0.0) for d in self.dims]
+            out.known[i] = [d in cp for d in self.dims]
+            out.active[i] = str(p.get("lifecycle_status") or "").lower() not in _RETIRED
+        return out
+
+    def mask(self, brand_prefer: Optional[Sequence[str]] = None) -> np.ndarray:
+        m = self.active & (self.price > 0)
+        if brand_prefer:
+            m &= np.isin(self.brand, list(brand_prefer))
+        return m
+
+
+def build_index(products: List[Dict[str, Any]]) -> Dict[str, CategoryIndex]:
+    by_cat: Dict[str, List[Dict[str, Any]]] = {}
+    for p in products:
+        if p.get("category") in CATEGORY_DIMS:
+            by_cat.setdefault(p["category"], []).append(p)
+    return {cat: CategoryIndex(cat, rows) for cat, rows in by_cat.items()}
+
+
+def update_index(index: Dict[str, CategoryIndex], rows: List[Dict[str, Any]], changes: Dict[Key, Optional[Dict[str, Any]]]) -> Dict[str, CategoryIndex]:
+    """index after changes: touched categories are patched in place, or rebuilt if SKUs came or went."""
+    touched = {k[0] for k in changes} & set(CATEGORY_DIMS)
+    out = {cat: ci for cat, ci in index.items() if cat not in touched}
+    rebuild = []
+    for cat in touched:
+        ci = index[cat].with_changes(changes) if cat in index else None
+        if ci is None:
+            rebuild.append(cat)
+        else:
+            out[cat] = ci
+    if rebuild:
+        out.update(build_index([p for p in rows if p.get("category") in rebuild]))
+    return out
+
+
+def catalog_index(path: str) -> Dict[str, CategoryIndex]:
+    """Column index of the current catalog snapshot, patched per change-log write."""
+    if not os.path.exists(path):
+        return {}
+    snap = catalog_store(path).snapshot()
+    return snap.derive(
+        "category_index",
+        lambda: build_index(snap.rows),
+        lambda prev, changes: update_index(prev, snap.rows, changes),
+    )
+
+
+def _units(need: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """Units of each SKU (rows of caps) needed to cover every positive need."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(need > 0, need / caps, 0.0)
+    ratio = np.where(np.isnan(ratio), np.inf, ratio)
+    return np.ceil(ratio.max(axis=1, initial=0.0) - 1e-9)
+
+
+def _line(idx: CategoryIndex, i: int, qty: int, need: np.ndarray) -> Dict[str, Any]:
+    p = idx.products[i]
+    line = {"brand": p.get("brand"), "model": p.get("model"), "qty": qty, "unit_price": float(idx.price[i])}
+    unknown = [d for d, v, ok in zip(idx.dims, need, idx.known[i]) if v > 0 and not ok]
+    if unknown:
+        # needed dimensions this SKU's spec does not state; it is not counted on for them
+        line["unknown"] = unknown
+    return line
+
+
+def category_options(
+    idx: CategoryIndex,
+    need: Dict[str, float],
+    k: int = 5,
+    min_units: int = 1,
+    max_units: int = 64,
+    brand_prefer: Optional[Sequence[str]] = None,
+    deadline: Optional[float] = None,
+    mix_pool: int = 24,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """k cheapest ways to cover `need` with at most two SKU models of one category.
+
+    Homogeneous options are a vectorized pass over all SKUs. Two-model mixes
+    (bounded knapsack over unit counts) are searched among a pool of
+    `mix_pool` SKUs: the cheapest complete ones plus, per needed dimension,
+    the cheapest suppliers of it, so complementary SKUs (one for compute, one
+    for storage) are paired too. A pair is skipped when its LP lower bound
+    max_d need_d * min(price/cap_d) cannot beat the current k-th best.
+    Capacities a spec does not state count as 0; info["unknown"] counts the
+    eligible SKUs missing each needed dimension.
+    """
+    info: Dict[str, Any] = {"category": idx.category, "uncovered": [], "unknown": {}, "truncated": False}
+    m = idx.mask(brand_prefer)
+    rows = np.flatnonzero(m)
+    dims = idx.dims
+    need_vec = np.array([need.get(d, 0.0) for d in dims], dtype=np.float64)
+    # a dimension no eligible SKU supplies cannot be planned with this catalog
+    supplied = idx.caps[rows].max(axis=0, initial=0.0) > 0 if rows.size else np.zeros(len(dims), dtype=bool)
+    info["uncovered"] = [d for d, v, ok in zip(dims, need_vec, supplied) if v > 0 and not ok]
+    if rows.size:
+        missing = (~idx.known[rows]).sum(axis=0)
+        info["unknown"] = {d: int(n) for d, v, n in zip(dims, need_vec, missing) if v > 0 and n}
+    need_raw, need_vec = need_vec, np.where(supplied, need_vec, 0.0)
+    if rows.size == 0:
+        return [], info
+
+    caps = idx.caps[rows]
+    price = idx.price[rows]
+    qty = np.maximum(_units(need_vec, caps), min_units)
+    feasible = qty <= max_units
+    cost = np.where(feasible, qty * price, np.inf)
+
+    best: List[Tuple[float, int, Dict[str, Any]]] = []  # max-heap via negated cost
+    seq = 0
+
+    def offer(c: float, lines: List[Dict[str, Any]], units: int, cap: np.ndarray) -> None:
+        nonlocal seq
+        seq += 1
+        opt = {
+            "category": idx.category,
+            "cost": round(float(c), 2),
+            "units": int(units),
+            "lines": lines,
+            "capacity": {d: round(float(v), 3) for d, v in zip(dims, cap)},
+        }
+        if len(best) < k:
+            heapq.heappush(best, (-c, seq, opt))
+        elif c < -best[0][0]:
+            heapq.heapreplace(best, (-c, seq, opt))
+
+    def kth() -> float:
+        return -best[0][0] if len(best) >= k else np.inf
+
+    order = np.argsort(cost, kind="stable")
+    for j in order[:k]:
+        if not np.isfinite(cost[j]):
+            break
+        q = int(qty[j])
+        offer(float(cost[j]), [_line(idx, int(rows[j]), q, need_raw)], q, caps[j] * q)
+
+    active = need_vec > 0
+    pool = [int(j) for j in order[: mix_pool // 2] if np.isfinite(cost[j])]
+    if active.any():
+        # partial SKUs: the cheapest per unit of each needed dimension
+        per_dim = max(2, (mix_pool - len(pool)) // int(active.sum()))
+        with np.errstate(divide="ignore"):
+            dim_cost = np.where(caps[:, active] > 0, price[:, None] / caps[:, active], np.inf)
+        for col in dim_cost.T:
+            pool += [int(j) for j in np.argsort(col, kind="stable")[:per_dim] if np.isfinite(col[j])]
+        pool = list(dict.fromkeys(pool))
+    if len(pool) >= 2 and active.any():
+        with np.errstate(divide="ignore"):
+            unit_cost = np.where(caps[pool][:, active] > 0, price[pool, None] / caps[pool][:, active], np.inf)
+        for a_pos, a in enumerate(pool):
+            for b_pos in range(a_pos + 1, len(pool)):
+                if deadline is not None and time.perf_counter() > deadline:
+                    info["truncated"] = True
+                    break
+                b = pool[b_pos]
+                bound = float((need_vec[active] * np.minimum(unit_cost[a_pos], unit_cost[b_pos])).max())
+                if bound >= kth():
+                    continue
+                # all splits: qa units of a, then the fewest units of b covering the rest
+                qa = np.arange(1, int(min(qty[a], max_units)), dtype=np.float64)
+                if qa.size == 0:
+                    continue
+                rest = np.maximum(need_vec[None, :] - qa[:, None] * caps[a][None, :], 0.0)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratio = np.where(rest > 0, rest / caps[b][None, :], 0.0)
+                qb = np.ceil(np.where(np.isnan(ratio), np.inf, ratio).max(axis=1) - 1e-9)
+                qb = np.maximum(qb, np.maximum(min_units - qa, 1))
+                total = qa * price[a] + qb * price[b]
+                total = np.where(qa + qb <= max_units, total, np.inf)
+                i = int(np.argmin(total))
+                if np.isfinite(total[i]) and total[i] < kth():
+                    na, nb = int(qa[i]), int(qb[i])
+                    offer(float(total[i]), [_line(idx, int(rows[a]), na, need_raw), _line(idx, int(rows[b]), nb, need_raw)], na + nb, caps[a] * na + caps[b] * nb)
+            if info["truncated"]:
+                break
+
+    options = [opt for _, _, opt in sorted(best, key=lambda t: (-t[0], t[1]))]
+    return options, info
+
+
+def k_best_combinations(option_lists: List[List[Dict[str, Any]]], k: int, budget: Optional[float] = None) -> List[Tuple[float, Tuple[int, ...]]]:
+    """k cheapest picks of one option per list (each list sorted by cost), via a
+    frontier heap over index tuples instead of the full cross product."""
+    if not option_lists or any(not ol for ol in option_lists):
+        return []
+    costs = [[o["cost"] for o in ol] for ol in option_lists]
+
+    def total(ix: Tuple[int, ...]) -> float:
+        return sum(c[i] for c, i in zip(costs, ix))
+
+    start = tuple(0 for _ in option_lists)
+    heap = [(total(start), start)]
+    seen = {start}
+    out: List[Tuple[float, Tuple[int, ...]]] = []
+    while heap and len(out) < k:
+        c, ix = heapq.heappop(heap)
+        if budget is not None and c > budget:
+            break
+        out.append((c, ix))
+        for pos in range(len(ix)):
+            if ix[pos] + 1 < len(costs[pos]):
+                nxt = ix[:pos] + (ix[pos] + 1,) + ix[pos + 1:]
+                if nxt not in seen:
+                    seen.add(nxt)
+                    heapq.heappush(heap, (total(nxt), nxt))
+    return out
+
+
+def match_plan(
+    plan: Dict[str, Any],
+    scenario: str,
+    index: Dict[str, CategoryIndex],
+    templates: Optional[TemplateIndex] = None,
+    focus: Optional[Sequence[str]] = None,
+    topk: int = 5,
+    min_units: int = 1,
+    max_units: int = 64,
+    budget: Optional[float] = None,
+    brand_prefer: Optional[Sequence[str]] = None,
+    latency_budget_ms: Optional[float] = 200,
+) -> Dict[str, Any]:
+    """Ranked bills of materials covering a plan.
+
+    Each BOM takes one option per required category; categories without a
+    priced, feasible SKU are filled with a matching capability template
+    (unpriced) so the result still says what to procure.
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + latency_budget_ms / 1000.0 if latency_budget_ms else None
+    scenario = (scenario or "").lower()
+    focus = focus if focus is not None else _scenario_focus(scenario)
+    cats = list(dict.fromkeys(FOCUS_CATEGORY[f] for f in focus if f in FOCUS_CATEGORY))
+    needs = plan_requirements(plan, cats)
+    query = plan_query(plan)
+
+    option_lists: List[List[Dict[str, Any]]] = []
+    template_lines: List[Dict[str, Any]] = []
+    infos: List[Dict[str, Any]] = []
+    for cat in cats:
+        idx = index.get(cat)
+        opts: List[Dict[str, Any]] = []
+        if idx is not None:
+            opts, info = category_options(idx, needs[cat], k=topk, min_units=min_units, max_units=max_units, brand_prefer=brand_prefer, deadline=deadline)
+            infos.append(info)
+        if opts:
+            option_lists.append(opts)
+            continue
+        matched = templates.match(query, scenario, cat) if templates is not None else []
+        if matched:
+            template_lines.append({**matched[0], "priced": False})
+        else:
+            template_lines.append({"category": cat, "template": None, "priced": False, "message": "no SKU or template covers this category"})
+
+    boms: List[Dict[str, Any]] = []
+    if option_lists:
+        for cost, ix in k_best_combinations(option_lists, topk, budget):
+            boms.append({"cost": round(cost, 2), "items": [ol[i] for ol, i in zip(option_lists, ix)] + template_lines})
+    elif template_lines:
+        boms.append({"cost": None, "items": template_lines})
+
+    return {
+        "boms": boms,
+        "requirements": needs,
+        "uncovered": {i["category"]: i["uncovered"] for i in infos if i["uncovered"]},
+        # SKUs per category and dimension whose spec does not state a needed capacity
+        "unknown_capacity": {i["category"]: i["unknown"] for i in infos if i["unknown"]},
+        "truncated": any(i["truncated"] for i in infos),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
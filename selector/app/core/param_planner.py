@@ -1,4 +1,8 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
+from functools import lru_cache
+import json
+
+import numpy as np
 
 
 def _ceil_div(a: float, b: float) -> int:
@@ -7,7 +11,48 @@ def _ceil_div(a: float, b: float) -> int:
     return int((a + b - 1) // b) if isinstance(a, int) and isinstance(b, int) else int(-(-a // b))
 
 
+_PLAN_KEYS = ("scenario", "current", "data", "constraints", "risk")
+
+
+def _canonical(req: Dict[str, Any]) -> Any:
+    """Stable, hashable key over the inputs the planner reads (extra request fields
+    such as evidence_query are ignored). Flat sections become sorted item tuples;
+    anything nested falls back to canonical JSON."""
+    try:
+        key = tuple(
+            (k, tuple(sorted(v.items())) if isinstance(v, dict) else v)
+            for k in _PLAN_KEYS
+            for v in [req.get(k)]
+        )
+        hash(key)
+        return key
+    except TypeError:
+        return json.dumps({k: req.get(k) for k in _PLAN_KEYS}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _copy(plan: Dict[str, Any]) -> Dict[str, Any]:
+    # plan sections hold scalars plus flat lists/dicts (ranges, alerting)
+    return {
+        k: {kk: (vv.copy() if isinstance(vv, (list, dict)) else vv) for kk, vv in sec.items()}
+        for k, sec in plan.items()
+    }
+
+
+@lru_cache(maxsize=4096)
+def _plan_memo(key: Any) -> Dict[str, Any]:
+    if isinstance(key, str):
+        req = json.loads(key)
+    else:
+        req = {k: (dict(v) if isinstance(v, tuple) else v) for k, v in key}
+    return _plan_parameters({k: v for k, v in req.items() if v is not None})
+
+
 def plan_parameters(req: Dict[str, Any]) -> Dict[str, Any]:
+    """Memoized on the canonicalized request; callers get their own copy to mutate."""
+    return _copy(_plan_memo(_canonical(req)))
+
+
+def _plan_parameters(req: Dict[str, Any]) -> Dict[str, Any]:
     # Extract inputs with defaults
     scenario = str(req.get("scenario", "generic")).lower()
     current = req.get("current", {})
@@ -134,6 +179,87 @@ def plan_parameters(req: Dict[str, Any]) -> Dict[str, Any]:
     return plan
 
 
+# current.* inputs that can be swept, with the planner's defaults
+SWEEP_AXES: Dict[str, float] = {
+    "qps_peak": 500,
+    "latency_p95_ms": 200,
+    "payload_kb": 8,
+    "growth_12m": 2.0,
+    "reads_per_request": 1.2,
+    "writes_per_request": 0.2,
+    "cache_hit_ratio": 0.6,
+    "hot_capacity_tb": 2.0,
+    "cold_capacity_tb": 10.0,
+}
+
+
+def _round_list(arr: np.ndarray, ndigits: int) -> List[float]:
+    # Python's round() (correctly rounded decimal) rather than np.round (scale and
+    # rint), which can differ on ties like 0.15 and would break scalar parity
+    return [round(x, ndigits) for x in arr.tolist()]
+
+
+def plan_sweep(req: Dict[str, Any], grid: Dict[str, List[float]], max_points: int = 200_000) -> Dict[str, Any]:
+    """Evaluate the sizing part of plan_parameters over the cartesian product of `grid`.
+
+    Axes are keys of SWEEP_AXES; non-swept inputs come from req["current"]. Every
+    formula mirrors the scalar planner operation for operation, so each point
+    equals plan_parameters() for the same inputs.
+    """
+    unknown = [k for k in grid if k not in SWEEP_AXES]
+    if unknown:
+        raise ValueError(f"unsupported sweep axes: {unknown}; allowed: {sorted(SWEEP_AXES)}")
+    axes = {k: np.asarray([float(v) for v in vals], dtype=np.float64) for k, vals in grid.items()}
+    n = int(np.prod([a.size for a in axes.values()])) if axes else 1
+    if n > max_points:
+        raise ValueError(f"grid has {n} points, limit is {max_points}")
+    current = req.get("current") or {}
+    mesh = np.meshgrid(*axes.values(), indexing="ij") if axes else []
+    cols: Dict[str, np.ndarray] = {}
+    for name, default in SWEEP_AXES.items():
+        cols[name] = np.full(n, float(current.get(name, default)), dtype=np.float64)
+    for name, m in zip(axes.keys(), mesh):
+        cols[name] = m.ravel()
+
+    qps_peak = cols["qps_peak"]
+    p95_ms = cols["latency_p95_ms"]
+    payload_kb = cols["payload_kb"]
+    growth_12m = cols["growth_12m"]
+    cache_hit_ratio = cols["cache_hit_ratio"]
+
+    concurrency = np.maximum(1.0, qps_peak * (p95_ms / 1000.0))
+    concurrency_12m = concurrency * growth_12m
+    vcpu_per_req = np.where(cache_hit_ratio >= 0.7, 0.02, 0.03)
+    vcpu_needed = np.maximum(2.0, concurrency_12m * vcpu_per_req)
+    mem_per_req_mb = 10.0 + payload_kb / 2.0
+    mem_needed_gb = np.maximum(2.0, (concurrency_12m * mem_per_req_mb) / 1024.0)
+
+    hot_tps = qps_peak * (cols["reads_per_request"] + cols["writes_per_request"])
+    iops = hot_tps * (0.7 / np.maximum(0.001, cache_hit_ratio) + 0.3)
+    throughput_mb_s = qps_peak * payload_kb / 1024.0
+    north_south_gbps = throughput_mb_s * 8 / 1024.0
+    east_west_gbps = north_south_gbps * 2.0
+
+    return {
+        "points": n,
+        "axes": {k: a.tolist() for k, a in axes.items()},
+        "inputs": {k: cols[k].tolist() for k in axes},
+        "outputs": {
+            "concurrency_12m": _round_list(concurrency_12m, 1),
+            "vcpu_min": np.trunc(vcpu_needed * 0.8).astype(np.int64).tolist(),
+            "vcpu_max": np.trunc(vcpu_needed * 1.2 + 1).astype(np.int64).tolist(),
+            "memory_gb_min": _round_list(mem_needed_gb * 0.8, 1),
+            "memory_gb_max": _round_list(mem_needed_gb * 1.2, 1),
+            "iops_required": np.trunc(iops).astype(np.int64).tolist(),
+            "throughput_mb_s": _round_list(throughput_mb_s, 2),
+            "north_south_gbps": _round_list(north_south_gbps, 2),
+            "east_west_gbps": _round_list(east_west_gbps, 2),
+            "max_connections": np.trunc(concurrency_12m * 5).astype(np.int64).tolist(),
+            "hot_capacity_tb": _round_list(cols["hot_capacity_tb"] * growth_12m, 1),
+        },
+    }
+
+
 def default_rag_rubric() -> Dict[str, Any]:
     return {
         "metrics": [
@@ -0,0 +1,92 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+from ..rag.aliases import aliases
+from ..rag.fingerprints import content_version
+
+
+def collection_version(collection: str) -> str:
+    """Version of a logical collection's content from persisted state: the live
+    physical collection plus the token its last changing index run recorded, so
+    every worker derives the same value, also after a restart."""
+    physical = aliases.resolve(collection)
+    return f"{physical}:{content_version(physical) or ''}"
+
+
+class RecommendationCache:
+    """LRU of recommendation results keyed by a content hash of the request.
+
+    The key covers the canonical request plus the evidence collections' versions
+    (collection_version), so re-indexing, switching or deleting a collection
+    makes earlier keys — and the ETags derived from them — unreachable in every
+    worker. bump() only frees this process's entries early.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[Tuple[str, ...], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self, collection: str) -> None:
+        """Drop cached results derived from `collection`."""
+        with self._lock:
+            for k in [k for k, (cs, _) in self._data.items() if collection in cs]:
+                del self._data[k]
+
+    def key(self, req: Dict[str, Any]) -> str:
+        collections = req.get("collections")
+        if collections:  # federated evidence
+            version: Any = {str(c): collection_version(str(c)) for c in collections}
+        else:
+            version = collection_version(str(req.get("collection") or ""))
+        canon = json.dumps(
+            {"req": req, "version": version},
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(canon.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, collection: str | Sequence[str], result: Dict[str, Any]) -> None:
+        """Store `result`; it is dropped when (any of) `collection` is bumped."""
+        with self._lock:
+            self._data[key] = ((collection,) if isinstance(collection, str) else tuple(collection), result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def etag_for(key: str, variant: str = "") -> str:
+    return f'"{key}{"." + variant if variant else ""}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+reco_cache = RecommendationCache(int(os.getenv("RECOMMEND_CACHE_SIZE", "1024")))
@@ -115,12 +115,15 @@ def generate_recommendation(customer_req: Dict[str, Any], evidence_hits: List[Di
         # keep only top-N and essential fields
         ev = []
         for h in (evidence_hits or [])[:5]:
-            ev.append({
+            item = {
                 "id": h.get("id"),
                 "score": h.get("score"),
                 "text": h.get("text"),
                 "source": ((h.get("payload") or {}).get("source")),
-            })
+            }
+            if h.get("collection"):  # federated evidence
+                item["collection"] = h["collection"]
+            ev.append(item)
         result["evidence"] = ev
 
     return result
@@ -0,0 +1,274 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+
+from .catalog import _safe_float, load_capabilities, load_products
+
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS products ("
+    " category TEXT NOT NULL, brand TEXT, model TEXT NOT NULL, price REAL, lifecycle_status TEXT,"
+    " updated_at TEXT, spec_json TEXT, metrics_json TEXT, PRIMARY KEY (category, brand, model))",
+    "CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category, price)",
+    "CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand)",
+    "CREATE INDEX IF NOT EXISTS idx_products_price ON products(price)",
+    "CREATE INDEX IF NOT EXISTS idx_products_lifecycle ON products(lifecycle_status)",
+    "CREATE TABLE IF NOT EXISTS capabilities ("
+    " category TEXT NOT NULL, template TEXT NOT NULL, params_json TEXT, notes TEXT, updated_at TEXT,"
+    " PRIMARY KEY (category, template))",
+    "CREATE INDEX IF NOT EXISTS idx_capabilities_category ON capabilities(category)",
+    "CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)",
+]
+_PRODUCT_COLS = "category, brand, model, price, lifecycle_status, updated_at, spec_json, metrics_json"
+
+
+def _default_url() -> str:
+    from ..rag.state import state_dir
+
+    return "sqlite:///" + os.path.join(state_dir(), "catalog.sqlite")
+
+
+def product_row(p: Dict[str, Any]) -> Tuple[Any, ...]:
+    """A load_products() dict as a products-table row (derived metrics kept as JSON)."""
+    metrics = {k: v for k, v in p.items() if k not in {"category", "brand", "model", "price", "lifecycle_status", "updated_at", "spec"}}
+    return (
+        p.get("category"), p.get("brand") or "", p.get("model"), _safe_float(p.get("price")),
+        p.get("lifecycle_status"), p.get("updated_at"),
+        json.dumps(p.get("spec") or {}, ensure_ascii=False), json.dumps(metrics),
+    )
+
+
+def _product(row: Sequence[Any]) -> Dict[str, Any]:
+    category, brand, model, price, lifecycle, updated_at, spec_json, metrics_json = row
+    p: Dict[str, Any] = {
+        "category": category,
+        "brand": brand or None,
+        "model": model,
+        "price": price,
+        "lifecycle_status": lifecycle,
+        "updated_at": updated_at,
+        "spec": json.loads(spec_json or "{}"),
+    }
+    p.update(json.loads(metrics_json or "{}"))
+    return p
+
+
+class CatalogRepository:
+    """Products, derived metrics and capability templates in SQL.
+
+    CATALOG_DB_URL selects the backend: sqlite:///path (default, under the local
+    state dir) or postgresql://... (needs the optional psycopg package). Reads
+    go through an in-process cache keyed by the catalog version, which every
+    write bumps, so other processes sharing the database see changes too.
+    """
+
+    def __init__(self, url: Optional[str] = None, cache_size: int = 256) -> None:
+        self.url = url or os.getenv("CATALOG_DB_URL") or _default_url()
+        self.is_pg = self.url.startswith(("postgres://", "postgresql://"))
+        self._conn: Any = None
+        self._lock = threading.RLock()
+        self._cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self.cache_size = cache_size
+
+    # -- connection ---------------------------------------------------------
+
+    def _db(self) -> Any:
+        if self._conn is None:
+            if self.is_pg:
+                try:
+                    import psycopg  # type: ignore
+                except ImportError as e:
+                    raise RuntimeError("CATALOG_DB_URL points to Postgres but psycopg is not installed") from e
+                conn = psycopg.connect(self.url, autocommit=True)
+            else:
+                path = self.url[len("sqlite:///"):] if self.url.startswith("sqlite:///") else self.url
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            if not self.is_pg:
+                conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _tx(self):
+        """One write transaction; clears the read cache once it commits."""
+        with self._lock:
+            conn = self._db()
+            if self.is_pg:
+                with conn.transaction():
+                    yield conn
+            else:
+                with conn:
+                    yield conn
+            self._cache.clear()
+
+    def _sql(self, sql: str) -> str:
+        return sql.replace("?", "%s") if self.is_pg else sql
+
+    def _fetch(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            return list(self._db().execute(self._sql(sql), list(params)).fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- versioning ---------------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        rows = self._fetch("SELECT value FROM catalog_meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def _set_meta(self, conn: Any, key: str, value: str) -> None:
+        conn.execute(self._sql("DELETE FROM catalog_meta WHERE key = ?"), [key])
+        conn.execute(self._sql("INSERT INTO catalog_meta (key, value) VALUES (?, ?)"), [key, value])
+
+    def version(self) -> int:
+        return int(self._meta("version") or 0)
+
+    def _bump(self, conn: Any) -> None:
+        rows = conn.execute(self._sql("SELECT value FROM catalog_meta WHERE key = ?"), ["version"]).fetchall()
+        self._set_meta(conn, "version", str(int(rows[0][0]) + 1 if rows else 1))
+
+    # -- writes -------------------------------------------------------------
+
+    def sync_from_csv(
+        self,
+        products_csv: str,
+        capabilities_csv: Optional[str] = None,
+        loader: Callable[[str], List[Dict[str, Any]]] = load_products,
+    ) -> bool:
+        """Reload both tables when the source files changed since the last sync.
+
+        loader reads the products; pass changelog.cached_products so pending
+        change-log entries survive a reload.
+        """
+        def sig(path: Optional[str]) -> str:
+            try:
+                st = os.stat(path or "")
+                return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+            except OSError:
+                return f"{path}:-"
+
+        source = sig(products_csv) + "|" + sig(capabilities_csv)
+        with self._lock:
+            if self._meta("source") == source:
+                return False
+            products = loader(products_csv)
+            caps = load_capabilities(capabilities_csv) if capabilities_csv else []
+            with self._tx() as conn:
+                conn.execute("DELETE FROM products")
+                conn.execute("DELETE FROM capabilities")
+                self._insert_products(conn, products)
+                conn.cursor().executemany(
+                    self._sql("INSERT INTO capabilities (category, template, params_json, notes, updated_at) VALUES (?, ?, ?, ?, ?)"),
+                    [(c["category"], c.get("template") or "", json.dumps(c.get("params") or {}, ensure_ascii=False), c.get("notes"), c.get("updated_at"))
+                     for c in caps if c.get("template")],
+                )
+                self._set_meta(conn, "source", source)
+                self._bump(conn)
+        return True
+
+    def _insert_products(self, conn: Any, products: List[Dict[str, Any]]) -> None:
+        # last row wins for duplicate (category, brand, model) keys, as in a CSV reload
+        rows = {(r[0], r[1], r[2]): r for r in map(product_row, products)}
+        conn.cursor().executemany(
+            self._sql(f"INSERT INTO products ({_PRODUCT_COLS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"),
+            list(rows.values()),
+        )
+
+    def upsert_products(self, products: List[Dict[str, Any]]) -> None:
+        with self._tx() as conn:
+            conn.cursor().executemany(
+                self._sql("DELETE FROM products WHERE category = ? AND brand = ? AND model = ?"),
+                [(p.get("category"), p.get("brand") or "", p.get("model")) for p in products],
+            )
+            self._insert_products(conn, products)
+            self._bump(conn)
+
+    def delete_products(self, keys: List[Tuple[str, Optional[str], str]]) -> None:
+        """keys: (category, brand, model)."""
+        with self._tx() as conn:
+            conn.cursor().executemany(
+                self._sql("DELETE FROM products WHERE category = ? AND brand = ? AND model = ?"),
+                [(c, b or "", m) for c, b, m in keys],
+            )
+            self._bump(conn)
+
+    # -- reads --------------------------------------------------------------
+
+    def query_products(
+        self,
+        categories: Optional[Sequence[str]] = None,
+        brands: Optional[Sequence[str]] = None,
+        max_price: Optional[float] = None,
+        lifecycle_status: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Products matching the filters, served from cache while the version holds.
+
+        Returned rows are shared with the cache; callers must not mutate them.
+        """
+        key = (
+            self.version(),
+            tuple(sorted(categories or ())), tuple(sorted(brands or ())),
+            max_price, tuple(sorted(lifecycle_status or ())), limit,
+        )
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+        where: List[str] = []
+        params: List[Any] = []
+        for col, values in (("category", categories), ("brand", brands), ("lifecycle_status", lifecycle_status)):
+            if values:
+                where.append(f"{col} IN ({','.join('?' * len(values))})")
+                params += list(values)
+        if max_price is not None:
+            # unpriced rows (0) stay eligible, as in hard_constraints_ok
+            where.append("price <= ?")
+            params.append(max_price)
+        sql = f"SELECT {_PRODUCT_COLS} FROM products"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY category, brand, model"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        rows = [_product(r) for r in self._fetch(sql, params)]
+        with self._lock:
+            self._cache[key] = rows
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def capabilities(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT category, template, params_json, notes, updated_at FROM capabilities"
+        rows = self._fetch(sql + " WHERE category = ?", (category,)) if category else self._fetch(sql)
+        return [
+            {"category": c, "template": t, "params": json.loads(pj or "{}"), "notes": n, "updated_at": u}
+            for c, t, pj, n, u in rows
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        return {c: int(n) for c, n in self._fetch("SELECT category, COUNT(*) FROM products GROUP BY category")}
+
+
+_repo: Optional[CatalogRepository] = None
+_repo_lock = threading.Lock()
+
+
+def catalog_repo() -> CatalogRepository:
+    global _repo
+    with _repo_lock:
+        if _repo is None:
+            _repo = CatalogRepository()
+        return _repo
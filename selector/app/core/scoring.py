@@ -1,4 +1,6 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+import numpy as np
 
 DEFAULT_WEIGHTS = {
     "cpu": 0.35,
@@ -22,3 +24,91 @@ def score_product(product: Dict[str, Any], weights: Dict[str, float] = None) ->
     for m, w in weights.items():
         s += w * normalize(m, product.get(m, 0))
     return s
+
+
+def pareto_front(values: np.ndarray, block: int = 1024, max_front: Optional[int] = None) -> np.ndarray:
+    """Indices of the non-dominated rows of `values` (every column maximized).
+
+    Two objectives use an O(n log n) sort-and-sweep. More objectives use a
+    sort-filter-skyline: rows are visited by descending column sum, so a row can
+    only be dominated by one visited before it. Rows are tested a block at a time
+    against the current front and against their own block with vectorized
+    comparisons, instead of all n^2 pairs.
+
+    With `max_front` at most that many members are returned, preferring the
+    highest column sums; the skyline stops scanning once the cap is reached, so
+    every returned row is still non-dominated.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    sums = values.sum(axis=1)
+    if values.shape[1] <= 2:
+        front_idx = _front_2d(values)
+        if max_front is not None and front_idx.size > max_front:
+            best = np.argsort(-sums[front_idx], kind="stable")[:max_front]
+            front_idx = np.sort(front_idx[best])
+        return front_idx
+    order = np.argsort(-sums, kind="stable")
+    front: List[int] = []
+    front_vals = np.empty((0, values.shape[1]))
+
+    def dominated(cand: np.ndarray, by: np.ndarray) -> np.ndarray:
+        # cand[i] is dominated if some row of `by` is >= everywhere and > somewhere;
+        # accumulated one column at a time to keep temporaries 2-D
+        ge = np.ones((cand.shape[0], by.shape[0]), dtype=bool)
+        eq = np.ones_like(ge)
+        for j in range(cand.shape[1]):
+            c, b = cand[:, j, None], by[None, :, j]
+            ge &= b >= c
+            eq &= b == c
+        return (ge & ~eq).any(axis=1)
+
+    for start in range(0, n, block):
+        if max_front is not None and len(front) >= max_front:
+            break
+        idx = order[start:start + block]
+        cand = values[idx]
+        # earlier (higher-sum) front rows eliminate most candidates, so test
+        # against the front in slices and carry only the survivors forward
+        for f in range(0, len(front), 128):
+            if not idx.size:
+                break
+            keep = ~dominated(cand, front_vals[f:f + 128])
+            idx, cand = idx[keep], cand[keep]
+        if idx.size:
+            keep = ~dominated(cand, cand)
+            idx, cand = idx[keep], cand[keep]
+            front.extend(idx.tolist())
+            front_vals = np.vstack([front_vals, cand])
+    if max_front is not None:
+        front = front[:max_front]
+    return np.array(sorted(front), dtype=np.int64)
+
+
+def _front_2d(values: np.ndarray) -> np.ndarray:
+    # sort by first column then second, both descending; a row survives if it
+    # tops its own first-column group and beats every strictly larger group.
+    # Equal rows do not dominate each other, so duplicates are all kept
+    if values.shape[1] == 1:
+        return np.flatnonzero(values[:, 0] == values[:, 0].max()).astype(np.int64)
+    x, y = values[:, 0], values[:, 1]
+    order = np.lexsort((-y, -x))
+    xs, ys = x[order], y[order]
+    starts = np.r_[True, xs[1:] != xs[:-1]]
+    group = np.cumsum(starts) - 1
+    group_max = ys[starts]
+    prev_best = np.r_[-np.inf, np.maximum.accumulate(group_max)[:-1]]
+    keep = (ys == group_max[group]) & (group_max[group] > prev_best[group])
+    return np.sort(order[keep]).astype(np.int64)
+
+
+def objective_ranks(values: np.ndarray) -> np.ndarray:
+    """Competition rank per column (1 = best, ties share a rank), columns maximized."""
+    values = np.asarray(values, dtype=np.float64)
+    ranks = np.empty(values.shape, dtype=np.int64)
+    for j in range(values.shape[1]):
+        col = np.sort(-values[:, j])
+        ranks[:, j] = np.searchsorted(col, -values[:, j], side="left") + 1
+    return ranks
@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, List, Optional
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+# heavy optional subsystems, imported on first use (or by prewarm) instead of at boot
+SUBSYSTEMS: Dict[str, str] = {
+    "crawl": ".rag.crawl",        # httpx, BeautifulSoup, lxml, readability
+    "bm25": ".rag.hybrid",        # rank_bm25
+    "embed": ".rag.embed",        # httpx
+    "qdrant": ".rag.indexer",     # httpx
+    "llm": ".core.llm_proxy",     # httpx
+    "rerank": ".rag.rerank",
+    "evaluate": ".rag.evaluate",
+}
+_PACKAGE = __name__.rsplit(".", 2)[0]
+
+_T0 = time.perf_counter()
+_log = logging.getLogger("uvicorn.error")
+_lock = threading.Lock()
+_report: Dict[str, Any] = {
+    "boot_ms": None,         # import of app.main (framework, core modules, app setup)
+    "ready_ms": None,        # startup event: the server accepts traffic from here
+    "imports_ms": {},        # subsystem -> import time (first import only)
+    "imported_by": {},       # subsystem -> "prewarm" | "request"
+    "steps_ms": {},          # catalog load and other prewarm steps
+    "errors": {},
+    "prewarm": "pending",
+}
+
+
+def _ms(t: float) -> float:
+    return round((time.perf_counter() - t) * 1000, 2)
+
+
+def subsystem(name: str, _by: str = "request") -> Any:
+    """The module behind a lazily-loaded subsystem; the first import is timed."""
+    path = SUBSYSTEMS[name]
+    with _lock:
+        if name in _report["imports_ms"]:
+            return importlib.import_module(path, _PACKAGE)
+    t = time.perf_counter()
+    mod = importlib.import_module(path, _PACKAGE)
+    with _lock:
+        if name not in _report["imports_ms"]:
+            _report["imports_ms"][name] = _ms(t)
+            _report["imported_by"][name] = _by
+    return mod
+
+
+def mark_booted() -> None:
+    _report["boot_ms"] = _ms(_T0)
+
+
+def _step(name: str, fn: Callable[[], Any]) -> None:
+    t = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        _report["errors"][name] = str(e)
+    _report["steps_ms"][name] = _ms(t)
+
+
+def prewarm_names() -> List[str]:
+    """PREWARM: comma-separated subsystems (default all), "none" to load on demand only."""
+    raw = os.getenv("PREWARM", "all").strip().lower()
+    if raw in {"", "none", "0", "false"}:
+        return []
+    if raw == "all":
+        return list(SUBSYSTEMS)
+    return [n.strip() for n in raw.split(",") if n.strip() in SUBSYSTEMS]
+
+
+def start_prewarm(steps: Optional[Dict[str, Callable[[], Any]]] = None) -> None:
+    """Record readiness, then import subsystems and run warm-up steps off the event loop."""
+    _report["ready_ms"] = _ms(_T0)
+    names = prewarm_names()
+
+    def run() -> None:
+        _report["prewarm"] = "running"
+        t = time.perf_counter()
+        for name, fn in (steps or {}).items():
+            _step(name, fn)
+        for name in names:
+            try:
+                subsystem(name, _by="prewarm")
+            except Exception as e:
+                _report["errors"][name] = str(e)
+        _report["prewarm"] = "done"
+        _report["prewarm_ms"] = _ms(t)
+        _log.info("startup report: %s", json.dumps(startup_report()))
+
+    if not names and not steps:
+        _report["prewarm"] = "disabled"
+        _log.info("startup report: %s", json.dumps(startup_report()))
+        return
+    threading.Thread(target=run, name="prewarm", daemon=True).start()
+
+
+def startup_report() -> Dict[str, Any]:
+    with _lock:
+        out = json.loads(json.dumps(_report))
+    out["uptime_ms"] = _ms(_T0)
+    out["pending"] = [n for n in SUBSYSTEMS if n not in out["imports_ms"]]
+    return out
@@ -0,0 +1,241 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+import math
+import os
+import re
+
+from .catalog import load_capabilities
+
+
+Interval = Tuple[float, float]
+
+_INF = math.inf
+_CMP = re.compile(r"^\s*(>=|<=|>|<|==|=)\s*([-+]?\d+(?:\.\d+)?)\s*$")
+_RANGE = re.compile(r"^\s*([-+]?\d+(?:\.\d+)?)\s*(?:-|~|\.\.|to)\s*([-+]?\d+(?:\.\d+)?)\s*$")
+_PORTS = re.compile(r"(\d+)\s*[x\*]\s*(\d+(?:\.\d+)?)\s*g", re.I)
+_NUM = re.compile(r"^\s*[-+]?\d+(?:\.\d+)?\s*$")
+
+
+def parse_constraint(key: str, value: Any) -> Optional[Interval]:
+    """Parse one template parameter into the closed interval of values it accepts.
+
+    ">=48" -> [48, inf), "<10" -> (-inf, 10), "8-32" / [8, 32] -> [8, 32],
+    "==4" -> [4, 4]. A bare number or port spec ("2x10G" = 20 Gbps) is what the
+    template provides at least, i.e. a floor: templates are baselines that scale
+    out, so {"hot_capacity_tb": 2} covers a 4 TB plan. Ceilings need "<=" / "<".
+    Booleans and free text are not intervals (None).
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        nums = [float(v) for v in value if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if len(nums) != 2:
+            return None
+        return (min(nums), max(nums))
+    if isinstance(value, (int, float)):
+        return (float(value), _INF)
+    text = str(value)
+    m = _CMP.match(text)
+    if m:
+        op, v = m.group(1), float(m.group(2))
+        if op == ">=":
+            return (v, _INF)
+        if op == ">":
+            return (math.nextafter(v, _INF), _INF)
+        if op == "<=":
+            return (-_INF, v)
+        if op == "<":
+            return (-_INF, math.nextafter(v, -_INF))
+        return (v, v)
+    m = _RANGE.match(text)
+    if m:
+        a, b = float(m.group(1)), float(m.group(2))
+        return (min(a, b), max(a, b))
+    ports = _PORTS.findall(text)
+    if ports:
+        return (float(sum(int(n) * float(g) for n, g in ports)), _INF)
+    if _NUM.match(text):
+        return parse_constraint(key, float(text))
+    return None
+
+
+def flatten_params(params: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """{"network": {"ports_ge": ">=48"}} -> {"network.ports_ge": ">=48"} (scenarios dropped)."""
+    out: Dict[str, Any] = {}
+    for k, v in (params or {}).items():
+        if not prefix and k == "scenarios":
+            continue
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten_params(v, key + "."))
+        else:
+            out[key] = v
+    return out
+
+
+class _ParamIndex:
+    """Templates constraining one parameter, sorted by each interval bound.
+
+    The templates a value rules out are a prefix of the upper bounds (hi < x)
+    and a suffix of the lower bounds (lo > x), found by bisection, so a lookup
+    costs O(log n + excluded) and never visits the templates that pass.
+    """
+
+    def __init__(self, items: List[Tuple[float, float, int]]) -> None:
+        by_lo = sorted(items, key=lambda it: it[0])
+        by_hi = sorted(items, key=lambda it: it[1])
+        self.los = [lo for lo, _, _ in by_lo]
+        self.lo_ids = [i for _, _, i in by_lo]
+        self.his = [hi for _, hi, _ in by_hi]
+        self.hi_ids = [i for _, _, i in by_hi]
+
+    def below(self, x: float) -> List[int]:
+        """Templates whose upper bound is under x (they cannot reach it)."""
+        return self.hi_ids[:bisect_left(self.his, x)]
+
+    def above(self, x: float) -> List[int]:
+        """Templates whose lower bound is over x."""
+        return self.lo_ids[bisect_right(self.los, x):]
+
+    def excluded(self, x: float, mode: str = "fit") -> List[int]:
+        return self.below(x) if mode != "within" else self.below(x) + self.above(x)
+
+
+class TemplateIndex:
+    """Capability templates compiled for matching.
+
+    Constraint strings are parsed once into intervals; templates are bucketed by
+    scenario and every numeric parameter and flag is indexed on its own, so a
+    query only touches the parameters it mentions and the templates they rule out.
+    """
+
+    def __init__(self, capabilities: List[Dict[str, Any]]) -> None:
+        self.templates = capabilities
+        self.intervals: List[Dict[str, Interval]] = []
+        self.flags: List[Dict[str, Any]] = []
+        self.by_scenario: Dict[str, Set[int]] = {}
+        self.open_scenario: Set[int] = set()
+        self.by_category: Dict[str, Set[int]] = {}
+        self.by_flag: Dict[Tuple[str, bool], List[int]] = {}
+        items: Dict[str, List[Tuple[float, float, int]]] = {}
+        for i, cap in enumerate(capabilities):
+            params = cap.get("params") or {}
+            self.by_category.setdefault(cap.get("category") or "", set()).add(i)
+            scenarios = params.get("scenarios") or []
+            if scenarios:
+                for s in scenarios:
+                    self.by_scenario.setdefault(str(s).lower(), set()).add(i)
+            else:
+                self.open_scenario.add(i)
+            ivs: Dict[str, Interval] = {}
+            flags: Dict[str, Any] = {}
+            for key, value in flatten_params(params).items():
+                iv = parse_constraint(key, value)
+                if iv is not None:
+                    ivs[key] = iv
+                    items.setdefault(key, []).append((iv[0], iv[1], i))
+                elif isinstance(value, bool):
+                    flags[key] = value
+                    self.by_flag.setdefault((key, value), []).append(i)
+            self.intervals.append(ivs)
+            self.flags.append(flags)
+        self.params = {k: _ParamIndex(v) for k, v in items.items()}
+
+    def candidates(self, scenario: Optional[str] = None, category: Optional[str] = None) -> Optional[Set[int]]:
+        """Templates bucketed under scenario (plus scenario-less ones) and category;
+        None when neither restricts the set."""
+        ids: Optional[Set[int]] = None
+        if scenario:
+            ids = self.by_scenario.get(scenario.lower(), set()) | self.open_scenario
+        if category:
+            cat = self.by_category.get(category, set())
+            ids = cat.copy() if ids is None else ids & cat
+        return ids
+
+    def match(
+        self,
+        query: Dict[str, Any],
+        scenario: Optional[str] = None,
+        category: Optional[str] = None,
+        mode: str = "fit",
+    ) -> List[Dict[str, Any]]:
+        """Templates satisfying every queried value they constrain.
+
+        query maps flattened keys (e.g. "compute.vcpu_range") to a number, a
+        [lo, hi] pair (its lower end is used) or a boolean flag. mode "fit"
+        accepts a template that can reach the value (x <= upper bound: a
+        ">=48" ports template fits a 24-port need); "within" requires the value
+        to lie inside the template's interval (it is sized for it). Results are
+        ordered by the number of queried parameters each template pins down.
+        """
+        excluded: Set[int] = set()
+        numeric: Set[str] = set()
+        flags: Set[str] = set()
+        for key, value in query.items():
+            if isinstance(value, bool):
+                flags.add(key)
+                excluded.update(self.by_flag.get((key, not value), ()))
+                continue
+            x = _query_value(value)
+            pix = self.params.get(key)
+            if x is None or pix is None:
+                continue
+            numeric.add(key)
+            excluded.update(pix.excluded(x, mode))
+        ids = self.candidates(scenario, category)
+        survivors: Iterable[int] = ids if ids is not None else range(len(self.templates))
+        hits = []
+        for i in survivors:
+            if i in excluded:
+                continue
+            matched = sum(1 for k in self.intervals[i] if k in numeric) + sum(1 for k in self.flags[i] if k in flags)
+            hits.append((-matched, i))
+        out = []
+        for neg, i in sorted(hits):
+            cap = self.templates[i]
+            out.append({
+                "category": cap.get("category"),
+                "template": cap.get("template"),
+                "matched": -neg,
+                "params": cap.get("params"),
+                "notes": cap.get("notes"),
+                "updated_at": cap.get("updated_at"),
+            })
+        return out
+
+
+def _query_value(value: Any) -> Optional[float]:
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        iv = parse_constraint("", value)
+        return iv[0] if iv and math.isfinite(iv[0]) else None
+
+
+def plan_query(plan: Dict[str, Any], keys: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Flattened plan values usable as a template query (numbers, ranges, flags)."""
+    flat = flatten_params({k: v for k, v in plan.items() if isinstance(v, dict)})
+    out = {}
+    for k, v in flat.items():
+        if keys is not None and k not in keys:
+            continue
+        if isinstance(v, bool) or isinstance(v, (int, float)) or (isinstance(v, list) and v and isinstance(v[0], (int, float))):
+            out[k] = v
+    return out
+
+
+@lru_cache(maxsize=4)
+def _index_for(path: str, mtime: float) -> TemplateIndex:
+    return TemplateIndex(load_capabilities(path))
+
+
+def template_index(path: str) -> TemplateIndex:
+    """Compiled templates of the capabilities CSV, rebuilt only when the file changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return TemplateIndex([])
+    return _index_for(path, mtime)
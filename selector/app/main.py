@@ -1,26 +1,41 @@
-from fastapi import FastAPI, Header, HTTPException, Depends
-import csv
+# first import: starts the boot clock of the startup report
+from .core.startup import mark_booted, start_prewarm, startup_report, subsystem
+from fastapi import FastAPI, Header, HTTPException, Depends, Request
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 import os
+import asyncio
+import time
+import uuid
+import orjson
+import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
-
-from .core.catalog import load_products
+from starlette.background import BackgroundTask
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from .core.changelog import cached_products, catalog_store
+from .core.repository import CatalogRepository, catalog_repo
+from .core.matching import catalog_index, match_plan
+from .core.templates import template_index, plan_query
 from .core.filters import hard_constraints_ok
-from .core.scoring import score_product, DEFAULT_WEIGHTS
-from .core.param_planner import plan_parameters, default_rag_rubric
-from .core.llm_proxy import llm_infer
-from .rag.embed import embed_texts
-from .rag.indexer import Qdrant
+from .core.scoring import score_product, DEFAULT_WEIGHTS, pareto_front, objective_ranks
+from .core.param_planner import plan_parameters, plan_sweep, default_rag_rubric
 from .core.recommend import generate_recommendation
-from .rag.evaluate import evaluate_retrieval
-from .rag.preprocess import filter_and_normalize
-from .rag.chunker import chunk_document
-from .rag.crawl import fetch_and_extract
-from .rag.hybrid import InMemoryBM25, fuse_scores, bm25_registry
+from .core.reco_cache import reco_cache, etag_for, etag_matches
+from .rag.eval_store import eval_store
+from .rag.preprocess import chunk_fingerprint, embedding_salt
+from .rag.ingest import normalize_docs, iter_chunks
+from .rag.neardup import dedup_chunks
+from .rag.fingerprints import FingerprintStore
+from .rag.chunk_store import chunk_store, drop_chunk_store
+from .rag.aliases import aliases, version_name
+from .rag.federated import gather_within, merge_ranked
+from .rag.semantic_cache import hit_ids, semantic_cache
+from .rag.snapshot import SnapshotError, prepare_export, restore_archive
+from .rag.pool import shutdown_pools
 
 app = FastAPI(title="ICT Selection API", version="0.1.0")
+app.add_event_handler("shutdown", shutdown_pools)
+mark_booted()
 
 app.add_middleware(
     CORSMiddleware,
@@ -49,49 +64,97 @@ class SelectRequest(BaseModel):
     scenario: str = Field(..., description="e.g., virtualization, olap, ai_infer, campus_access, sec_boundary")
     constraints: Constraints = Constraints()
     metrics_weight: Dict[str, float] = {}
+    # flattened template parameters, e.g. {"network.ports_ge": 24}; used for the
+    # capability-template fallback when no SKU matches
+    requirements: Dict[str, Any] = {}
+    # "weighted": single weighted score; "pareto": non-dominated set over the
+    # weighted metrics (sign of the weight = direction), with per-metric ranks
+    mode: str = "weighted"
+    limit: Optional[int] = None
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
-@app.post("/api/select")
-def select(req: SelectRequest, _=Depends(require_api_key)):
-    # Load catalog
-    env_path = os.getenv("CATALOG_CSV")
+
+@app.get("/api/startup")
+def startup(_=Depends(require_api_key)):
+    return startup_report()
+
+def _catalog_path(env_var: str = "CATALOG_CSV") -> str:
+    env_path = os.getenv(env_var)
     default_in_container = "/app/catalog/samples/products.csv"
     # compute repo-root based default (works when running `uvicorn app.main:app --reload` from `selector/`)
     file_dir = os.path.dirname(__file__)
     # /selector/app -> repo root is two levels up
     repo_root = os.path.abspath(os.path.join(file_dir, "..", ".."))
     default_local = os.path.join(repo_root, "catalog", "samples", "products.csv")
+    return env_path or (default_in_container if os.path.exists(default_in_container) else default_local)
 
-    chosen_path = env_path or (default_in_container if os.path.exists(default_in_container) else default_local)
-    products = load_products(chosen_path)
 
-    # Apply basic filtering
-    filtered: List[Dict[str, Any]] = []
-    for p in products:
-        if req.constraints.brand_prefer and p.get("brand") not in req.constraints.brand_prefer:
-            continue
-        if not hard_constraints_ok(req.model_dump(), p):
-            continue
-        filtered.append(p)
+def _catalog_repo() -> CatalogRepository:
+    repo = catalog_repo()
+    repo.sync_from_csv(_catalog_path(), _catalog_path("CAPABILITIES_CSV"), loader=cached_products)
+    return repo
 
+
+def _prewarm() -> None:
+    # runs once the server accepts traffic: /health is ready before the
+    # catalog and the RAG subsystems are loaded
+    start_prewarm({
+        "catalog_load": lambda: cached_products(_catalog_path()),
+        "catalog_index": lambda: catalog_index(_catalog_path()),
+        "template_index": lambda: template_index(_catalog_path("CAPABILITIES_CSV")),
+        "catalog_repo": _catalog_repo,
+    })
+
+
+app.add_event_handler("startup", _prewarm)
+
+
+@app.post("/api/select")
+def select(req: SelectRequest, _=Depends(require_api_key)):
     # Scenario based light heuristic (could map scenarios to categories)
     scenario = req.scenario.lower()
+    categories: Optional[List[str]] = None
     if scenario in {"virtualization", "olap", "ai_infer"}:
-        filtered = [p for p in filtered if p.get("category") == "server"]
+        categories = ["server"]
     elif scenario in {"campus_access", "datacenter_fabric"}:
-        filtered = [p for p in filtered if p.get("category") == "switch"]
+        categories = ["switch"]
     elif scenario in {"sec_boundary", "ngfw", "waf"}:
-        filtered = [p for p in filtered if p.get("category") == "security"]
+        categories = ["security"]
+
+    # Load catalog: category/brand/budget filters run as indexed SQL; the CSV
+    # is the fallback when the repository is unavailable
+    req_dict = req.model_dump()
+    budget = req.constraints.budget
+    try:
+        products = _catalog_repo().query_products(
+            categories=categories,
+            brands=req.constraints.brand_prefer,
+            max_price=budget * 1.2 if budget is not None else None,
+        )
+    except Exception:
+        products = [
+            p for p in cached_products(_catalog_path())
+            if (not categories or p.get("category") in categories)
+            and (not req.constraints.brand_prefer or p.get("brand") in req.constraints.brand_prefer)
+        ]
+
+    # Apply basic filtering
+    filtered: List[Dict[str, Any]] = [p for p in products if hard_constraints_ok(req_dict, p)]
 
     if not filtered:
+        templates = template_index(_catalog_path("CAPABILITIES_CSV")).match(req.requirements, scenario)
+        if templates:
+            return {"candidates": [], "templates": templates[:5], "message": "No SKU candidates; matched capability templates"}
         return {"candidates": [], "message": "No candidates after filtering"}
 
     # Scoring
     weights = DEFAULT_WEIGHTS.copy()
     weights.update(req.metrics_weight or {})
+    if req.mode == "pareto":
+        return _pareto_select(filtered, weights, req.limit)
 
     ranked = []
     for p in filtered:
@@ -107,10 +170,130 @@ def select(req: SelectRequest, _=Depends(require_api_key)):
         })
 
     ranked.sort(key=lambda x: x["score"], reverse=True)
-    topk = ranked[: min(5, len(ranked))]
+    topk = ranked[: min(req.limit or 5, len(ranked))]
     return {"candidates": topk}
 
 
+def _pareto_select(products: List[Dict[str, Any]], weights: Dict[str, float], limit: Optional[int]) -> Dict[str, Any]:
+    objectives = [m for m, w in weights.items() if w]
+    if not objectives:
+        raise HTTPException(status_code=400, detail="pareto mode needs at least one non-zero metric weight")
+    sign = np.array([1.0 if weights[m] > 0 else -1.0 for m in objectives])
+    vals = np.array([[float(p.get(m, 0) or 0) for m in objectives] for p in products], dtype=np.float64)
+    signed = vals * sign
+    # anti-correlated catalogs can put most rows on the front; cap how many are
+    # materialized so one request stays bounded
+    cap = int(os.getenv("PARETO_MAX_FRONT", "2000"))
+    front = pareto_front(signed, max_front=cap if cap > 0 else None)
+    ranks = objective_ranks(signed)
+    out = []
+    for i in front:
+        p = products[i]
+        out.append({
+            "brand": p.get("brand"),
+            "model": p.get("model"),
+            "category": p.get("category"),
+            "score": round(score_product(p, weights), 4),
+            "metrics": {m: float(vals[i, j]) for j, m in enumerate(objectives)},
+            "ranks": {m: int(ranks[i, j]) for j, m in enumerate(objectives)},
+            "lifecycle_status": p.get("lifecycle_status"),
+            "updated_at": p.get("updated_at"),
+            "key_specs": p.get("spec"),
+        })
+    # present the front by weighted score; every member is a valid trade-off
+    out.sort(key=lambda x: x["score"], reverse=True)
+    return {
+        "mode": "pareto",
+        "objectives": {m: ("max" if s > 0 else "min") for m, s in zip(objectives, sign)},
+        "front_size": len(out),
+        "front_truncated": cap > 0 and len(out) >= cap,
+        "total": len(products),
+        "candidates": out[:limit] if limit else out,
+    }
+
+
+@app.get("/api/catalog/items")
+def catalog_items(
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    max_price: Optional[float] = None,
+    limit: int = 100,
+    _=Depends(require_api_key),
+):
+    repo = _catalog_repo()
+    items = repo.query_products(
+        categories=[category] if category else None,
+        brands=[brand] if brand else None,
+        max_price=max_price,
+        limit=limit,
+    )
+    return {"version": repo.version(), "counts": repo.counts(), "items": items}
+
+
+class CatalogItemsRequest(BaseModel):
+    # each item: category, brand, model and, for upsert/patch, any of
+    # price, lifecycle_status, updated_at, spec (patch merges spec keys)
+    items: List[Dict[str, Any]]
+
+
+def _apply_catalog_ops(op: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if not items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    ops = []
+    for it in items:
+        fields = {k: v for k, v in it.items() if k not in {"category", "brand", "model"}}
+        ops.append({"op": op, "category": it.get("category"), "brand": it.get("brand"), "model": it.get("model"), "fields": fields})
+    # make sure the repository holds the pre-change catalog before applying the delta
+    try:
+        repo: Optional[CatalogRepository] = _catalog_repo()
+    except Exception:
+        repo = None
+    res = catalog_store(_catalog_path()).apply(ops)
+    out: Dict[str, Any] = {
+        "ok": True,
+        "version": res["version"],
+        "applied": len(res["written"]) + len(res["deleted"]),
+        "missing": [{"category": c, "brand": b or None, "model": m} for c, b, m in res["missing"]],
+    }
+    if repo is not None:
+        try:
+            if res["written"]:
+                repo.upsert_products(res["written"])
+            if res["deleted"]:
+                repo.delete_products(res["deleted"])
+            out["repo_version"] = repo.version()
+        except Exception as e:
+            out["repo_error"] = str(e)
+    return out
+
+
+@app.post("/api/catalog/items")
+def catalog_upsert(req: CatalogItemsRequest, _=Depends(require_api_key)):
+    return _apply_catalog_ops("upsert", req.items)
+
+
+@app.patch("/api/catalog/items")
+def catalog_patch(req: CatalogItemsRequest, _=Depends(require_api_key)):
+    return _apply_catalog_ops("patch", req.items)
+
+
+@app.delete("/api/catalog/items")
+def catalog_delete(req: CatalogItemsRequest, _=Depends(require_api_key)):
+    return _apply_catalog_ops("delete", req.items)
+
+
+@app.get("/api/catalog/changelog")
+def catalog_changelog(_=Depends(require_api_key)):
+    return catalog_store(_catalog_path()).stats()
+
+
+@app.post("/api/catalog/compact")
+def catalog_compact(_=Depends(require_api_key)):
+    store = catalog_store(_catalog_path())
+    store.compact()
+    return store.stats()
+
+
 class PlanRequest(BaseModel):
     scenario: str
     current: Dict[str, Any] = {}
@@ -125,7 +308,19 @@ def plan(req: PlanRequest, _=Depends(require_api_key)):
     return {"plan": result}
 
 
-@app.get("/api/rag/rubric")
+class PlanSweepRequest(PlanRequest):
+    grid: Dict[str, List[float]] = Field(..., description="current.* axis -> values, e.g. {qps_peak: [...], growth_12m: [...]}")
+
+
+@app.post("/api/plan/sweep")
+def plan_sweep_api(req: PlanSweepRequest, _=Depends(require_api_key)):
+    try:
+        return {"sweep": plan_sweep(req.model_dump(), req.grid)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/rag/rubric", response_class=ORJSONResponse)
 def rag_rubric(_=Depends(require_api_key)):
     return {"rubric": default_rag_rubric()}
 
@@ -139,10 +334,21 @@ class LLMInferRequest(BaseModel):
 
 @app.post("/api/llm/infer")
 async def llm_proxy(req: LLMInferRequest, _=Depends(require_api_key)):
-    res = await llm_infer(req.provider, req.model, req.messages, req.temperature)
+    res = await subsystem("llm").llm_infer(req.provider, req.model, req.messages, req.temperature)
     return res
 
 
+class CollectionProfile(BaseModel):
+    hnsw_m: int = 32
+    hnsw_ef_construct: int = 128
+    hnsw_on_disk: bool = False
+    on_disk: bool = Field(default=False, description="keep original vectors on disk (mmap)")
+    memmap_threshold: int = 20000
+    quantization: Optional[str] = Field(default=None, description="scalar (int8) | binary | none")
+    quantization_quantile: float = 0.99
+    quantization_always_ram: bool = True
+
+
 class RAGIndexRequest(BaseModel):
     collection: str = Field(default="ict_docs")
     provider: Optional[str] = Field(default="auto")
@@ -151,49 +357,56 @@ class RAGIndexRequest(BaseModel):
     chunk_strategy: Optional[str] = Field(default="sentence")
     chunk_max_chars: Optional[int] = Field(default=400)
     chunk_overlap: Optional[int] = Field(default=50)
+    chunk_max_tokens: Optional[int] = Field(default=None, description="token budget per chunk (embedding model window); overrides chunk_max_chars")
     urls: Optional[List[str]] = None
     url_source: Optional[str] = "web"
+    near_dup_threshold: Optional[float] = Field(default=None, description="MinHash Jaccard threshold (e.g. 0.9) for dropping near-duplicate docs; null (default) keeps them")
+    near_dup_chunks: bool = Field(default=False, description="also drop near-duplicate chunks across docs")
+    force_reembed: bool = Field(default=False, description="ignore stored fingerprints and re-embed every chunk")
+    profile: Optional[CollectionProfile] = Field(default=None, description="HNSW/on-disk/quantization settings used when the collection is created")
+    # "incremental": update the live collection in place; "blue_green": build a new
+    # version in the background, verify it, then switch the alias (see _run_reindex)
+    mode: str = Field(default="incremental", description="incremental | blue_green")
+    verify_samples: List[Dict[str, Any]] = Field(default_factory=list, description="blue_green: [{query, relevant_ids}] evaluated on the new version before the switch")
+    min_recall: Optional[float] = Field(default=None, description="blue_green: abort unless Recall@k on verify_samples reaches this")
+    verify_topk: int = 5
+    gc_grace_s: Optional[float] = Field(default=None, description="blue_green: seconds the previous version stays readable after the switch (RAG_REINDEX_GC_GRACE_S, default 30); negative keeps it")
 
 
-@app.post("/api/rag/index")
-async def rag_index(req: RAGIndexRequest, _=Depends(require_api_key)):
-    # Filter & normalize docs before indexing
-    kept, stats = filter_and_normalize(req.docs)
+async def _index_into(req: RAGIndexRequest, collection: str) -> Dict[str, Any]:
+    """Crawl, chunk, embed and upsert req's docs into the physical `collection`.
+
+    Caches keyed by the logical name are left to the caller.
+    """
     # optionally crawl URLs into docs
+    crawled: List[Dict[str, Any]] = []
     if req.urls:
-        crawled = await fetch_and_extract(req.urls, source=req.url_source or "web")
-        kept += crawled
+        crawled = await subsystem("crawl").fetch_and_extract(req.urls, source=req.url_source or "web")
+    # Filter & normalize docs (exact + near-duplicates) before indexing
+    kept, stats = await normalize_docs(req.docs + crawled, near_dup_threshold=req.near_dup_threshold)
 
     # build meta map for payload enrichment
     id_to_meta: Dict[str, Any] = {}
     for d in kept:
         id_to_meta[str(d.get("id"))] = (d.get("meta") or {})
+    # a re-sent doc now dropped as a near-duplicate loses its earlier chunks
+    dropped = [i for i in dict.fromkeys(map(str, stats["near_dup_ids"])) if i not in id_to_meta]
 
-    # chunking
+    # chunking (spread over the ingest process pool for large batches)
     chunks: List[Dict[str, Any]] = []
-    for d in kept:
-        chunks += chunk_document(
-            str(d.get("id")),
-            d.get("text", ""),
-            strategy=req.chunk_strategy or "sentence",
-            max_chars=int(req.chunk_max_chars or 400),
-            overlap=int(req.chunk_overlap or 50),
-        )
-    texts = [c.get("text", "") for c in chunks]
-    if not texts:
+    async for doc_chunks in iter_chunks(
+        kept,
+        strategy=req.chunk_strategy or "sentence",
+        max_chars=int(req.chunk_max_chars or 400),
+        overlap=int(req.chunk_overlap or 50),
+        max_tokens=req.chunk_max_tokens,
+        model=req.model,
+    ):
+        chunks += doc_chunks
+    if req.near_dup_chunks and req.near_dup_threshold:
+        chunks, stats["near_dup_chunks"] = dedup_chunks(chunks, threshold=req.near_dup_threshold)
+    if not chunks and not dropped:
         return {"ok": False, "reason": "no_texts_after_chunking", "filter_stats": stats, "crawled": len(req.urls or [])}
-    emb = await embed_texts(texts, provider=req.provider or "auto", model=req.model)
-    dim = emb.get("dim", 0)
-    if not dim:
-        # fallback to default dimension for fake provider
-        dim = 384
-    vecs = emb.get("vectors", [])
-    qdr = Qdrant()
-    qdrant_result: Dict[str, Any] | None = None
-    try:
-        await qdr.create_collection(req.collection, dim)
-    except Exception as e:
-        qdrant_result = {"error": f"create_collection_failed: {e}"}
     payloads = []
     for c in chunks:
         doc_id = str(c.get("doc_id"))
@@ -202,23 +415,347 @@ async def rag_index(req: RAGIndexRequest, _=Depends(require_api_key)):
             "doc_id": doc_id,
             "chunk_id": c.get("chunk_id"),
             "text": c.get("text"),
+            "start": c.get("start"),
+            "end": c.get("end"),
         }
         base.update(id_to_meta.get(doc_id, {}))
         payloads.append(base)
     # stable numeric ids for idempotent upserts
     from .rag.indexer import stable_id
     ids = [stable_id(str(p.get("id"))) for p in payloads]
+
+    # incremental: only embed chunks whose content (or embedding config) changed,
+    # and drop points of chunks that no longer exist in re-sent documents
+    fp_store = FingerprintStore(collection)
+    # fingerprints are salted with the config that actually produced the vectors
+    # ("auto" may resolve to any provider); the recorded one is expected to hold
+    # unless the request names another provider or model
+    recorded = fp_store.meta()
+    requested = (req.provider or "auto").lower()
+    same_config = bool(recorded.get("provider")) and requested in ("auto", recorded["provider"]) and req.model in (None, recorded.get("model"))
+    salt = embedding_salt(recorded) if same_config else None
+
+    def fingerprints(salt: str) -> List[str]:
+        # the doc-level fp is excluded so untouched chunks of an edited doc are skipped
+        return [chunk_fingerprint({k: v for k, v in p.items() if k != "fp"}, salt) for p in payloads]
+
+    chunk_fps = fingerprints(salt or "")
+    previous = fp_store.chunks_for_docs([*id_to_meta, *dropped])
+    todo = [
+        i for i, (pid, p) in enumerate(zip(ids, payloads))
+        if req.force_reembed or salt is None or previous.get(str(p["doc_id"]), {}).get(pid) != chunk_fps[i]
+    ]
+    current_ids = set(ids)
+    stale = [pid for doc_chunks in previous.values() for pid in doc_chunks if pid not in current_ids]
+
+    # chunk text lives in the local compressed store; Qdrant gets vectors and
+    # metadata only (RAG_TEXT_IN_QDRANT=1 keeps the text in the payload too)
+    store = chunk_store(collection)
+    unstored = set(await asyncio.to_thread(store.missing, [p["id"] for p in payloads]))
+    text_in_qdrant = os.getenv("RAG_TEXT_IN_QDRANT", "0") == "1"
+
+    qdr = subsystem("qdrant").Qdrant()
+    qdrant_result: Dict[str, Any] | None = None
+    provider = None
+    upserted = False
+    if todo:
+        embed = subsystem("embed")
+        emb = await embed.embed_texts([payloads[i].get("text", "") for i in todo], provider=req.provider or "auto", model=req.model)
+        # fallback to default dimension for fake provider
+        resolved = {"provider": emb.get("provider"), "model": emb.get("model"), "dim": emb.get("dim") or 384}
+        if len(todo) < len(payloads) and embedding_salt(resolved) != salt:
+            # resolved to another config than the skipped chunks were embedded
+            # with: embed them all, so the collection holds one kind of vector
+            todo = list(range(len(payloads)))
+            emb = await embed.embed_texts([p.get("text", "") for p in payloads], provider=resolved["provider"], model=resolved["model"])
+            resolved = {"provider": emb.get("provider"), "model": emb.get("model"), "dim": emb.get("dim") or 384}
+        chunk_fps = fingerprints(embedding_salt(resolved))
+        provider, dim = resolved["provider"], resolved["dim"]
+        vecs = emb.get("vectors", [])
+        try:
+            await qdr.create_collection(collection, dim, req.profile.model_dump() if req.profile else None)
+        except Exception as e:
+            qdrant_result = {"error": f"create_collection_failed: {e}"}
+        try:
+            points = [payloads[i] if text_in_qdrant else {k: v for k, v in payloads[i].items() if k != "text"} for i in todo]
+            r = await qdr.upsert(collection, vecs, points, ids=[ids[i] for i in todo])
+            qdrant_result = r
+            if isinstance(r, dict) and r.get("status") == "ok":
+                upserted = True
+                fp_store.record_chunks([(ids[i], str(payloads[i]["doc_id"]), payloads[i]["id"], chunk_fps[i]) for i in todo])
+                # queries must be embedded the same way; travels with collection snapshots.
+                # content_version feeds the recommendation ETags of every worker
+                fp_store.set_meta(**resolved, content_version=uuid.uuid4().hex)
+        except Exception as e:
+            qdrant_result = {"error": f"upsert_failed: {e}"}
+    # text (store and BM25) only for chunks whose points exist: the skipped ones,
+    # and the embedded ones once the upsert went through
+    embedded = set(todo)
+    live = [p for i, p in enumerate(payloads) if upserted or i not in embedded]
+    await asyncio.to_thread(store.put_many, [
+        (p["id"], p.get("text") or "") for i, p in enumerate(payloads)
+        if (upserted and i in embedded) or (i not in embedded and p["id"] in unstored)
+    ])
+    deleted = 0
+    stale_keys = fp_store.keys_for(stale) if stale else []
+    if stale:
+        try:
+            r = await qdr.delete_points(collection, stale)
+            if isinstance(r, dict) and r.get("status") == "ok":
+                fp_store.forget_chunks(stale)
+                fp_store.forget_docs(dropped)
+                fp_store.set_meta(content_version=uuid.uuid4().hex)
+                await asyncio.to_thread(store.delete, stale_keys)
+                deleted = len(stale)
+        except Exception as e:
+            qdrant_result = (qdrant_result or {}) | {"delete_error": f"delete_failed: {e}"}
+    doc_chunk_counts: Dict[str, int] = {}
+    for c in chunks:
+        doc_chunk_counts[str(c.get("doc_id"))] = doc_chunk_counts.get(str(c.get("doc_id")), 0) + 1
+    fp_store.record_docs({d: (id_to_meta[d].get("fp"), n) for d, n in doc_chunk_counts.items()})
+    fp_store.close()
+    # update BM25 registry for this collection
+    registry = subsystem("bm25").bm25_registry
+    await asyncio.to_thread(registry.add_docs, collection, [{"id": p.get("id"), "text": p.get("text", "")} for p in live])
+    await asyncio.to_thread(registry.remove_ids, collection, stale_keys)
+    return {
+        "ok": True,
+        "provider": provider,
+        "qdrant": qdrant_result,
+        "filter_stats": stats,
+        "embedded": len(todo),
+        "skipped": len(chunks) - len(todo),
+        "deleted": deleted,
+        "text_store": store.stats(),
+    }
+
+
+@app.post("/api/rag/index", response_class=ORJSONResponse)
+async def rag_index(req: RAGIndexRequest, _=Depends(require_api_key)):
+    if req.mode == "blue_green":
+        return _start_reindex(req)
+    busy = _busy_job(req.collection)
+    if busy:
+        # its build reads the live version's state; the switch would drop these changes
+        raise HTTPException(status_code=409, detail=f"{busy['kind']} {busy['job_id']} of {req.collection} is still running")
+    out = await _index_into(req, aliases.resolve(req.collection))
+    if out.get("embedded") or out.get("deleted"):
+        # cached rerank scores / recommendations may refer to replaced chunk text
+        subsystem("rerank").rerank_cache.clear(req.collection)
+        reco_cache.bump(req.collection)
+        semantic_cache.bump(req.collection)
+    return out
+
+
+# Blue/green reindex and snapshot restore jobs (in-process; status is lost on restart)
+_reindex_jobs: Dict[str, Dict[str, Any]] = {}
+_reindex_tasks: set = set()
+
+
+def _busy_job(collection: str) -> Optional[Dict[str, Any]]:
+    """A reindex or restore job of `collection` that has not switched yet."""
+    busy = [j for j in _reindex_jobs.values() if j["collection"] == collection and j["status"] in {"building", "verifying", "switching", "restoring"}]
+    return busy[0] if busy else None
+
+
+def _new_job(collection: str, status: str, kind: str = "reindex") -> Dict[str, Any]:
+    busy = _busy_job(collection)
+    if busy:
+        raise HTTPException(status_code=409, detail=f"{busy['kind']} {busy['job_id']} of {collection} is still running")
+    job: Dict[str, Any] = {
+        "job_id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "collection": collection,
+        "target": version_name(collection),
+        "previous": None,
+        "status": status,
+        "started_at": time.time(),
+        "timings_ms": {},
+    }
+    _reindex_jobs[job["job_id"]] = job
+    return job
+
+
+def _spawn(coro: Any) -> None:
+    task = asyncio.create_task(coro)
+    _reindex_tasks.add(task)
+    task.add_done_callback(_reindex_tasks.discard)
+
+
+def _start_reindex(req: RAGIndexRequest) -> Dict[str, Any]:
+    job = _new_job(req.collection, "building")
+    _spawn(_run_reindex(job, req))
+    return {"ok": True, "job": job}
+
+
+async def _drop_failed_target(job: Dict[str, Any]) -> None:
+    """Drop the version a failed job built, unless the alias map already serves it."""
+    if aliases.resolve(job["collection"]) == job["target"]:
+        # the switch got past the point of no return (the legacy collection is
+        # gone); the target is the only copy, the next job re-points the alias
+        job["live_in_app"] = True
+        await _drop_physical(job["collection"], qdrant=False)  # local state of the deleted legacy collection
+        return
+    await _drop_physical(job["target"])
+
+
+def _drop_local_state(name: str) -> None:
+    """BM25 index, fingerprints and chunk store of a physical collection; file
+    I/O, call it in a worker thread."""
+    subsystem("bm25").bm25_registry.reset(name)
+    FingerprintStore(name).drop()
+    drop_chunk_store(name)
+
+
+def _store_stats(names: List[str]) -> Dict[str, Any]:
+    return {n: chunk_store(n).stats() for n in names}
+
+
+async def _drop_physical(name: str, qdrant: bool = True) -> None:
+    """Delete a physical collection and all of its local state."""
+    await asyncio.to_thread(_drop_local_state, name)
+    if qdrant:
+        try:
+            await subsystem("qdrant").Qdrant().delete_collection(name)
+        except Exception:
+            pass
+
+
+async def _run_reindex(job: Dict[str, Any], req: RAGIndexRequest) -> None:
+    """Build -> verify -> switch -> garbage-collect.
+
+    The new version is built under its own physical name (Qdrant points, chunk
+    store, fingerprints and BM25 index), so searches keep reading the live
+    version untouched until the switch. The switch is one Qdrant alias-actions
+    request plus one atomic write of the local alias map; the previous version
+    stays readable for gc_grace_s so requests that resolved it just before the
+    switch still complete.
+    """
+    logical, target = job["collection"], job["target"]
+    qdr = subsystem("qdrant").Qdrant()
+    t = time.perf_counter()
     try:
-        r = await qdr.upsert(req.collection, vecs, payloads, ids=ids)
-        qdrant_result = r
+        out = await _index_into(req, target)
+        job["timings_ms"]["build"] = round((time.perf_counter() - t) * 1000, 1)
+        job["index"] = {k: out.get(k) for k in ("embedded", "filter_stats", "text_store")}
+        upsert = out.get("qdrant") or {}
+        if not out.get("ok") or upsert.get("status") != "ok":
+            raise RuntimeError(f"build failed: {out.get('reason') or upsert.get('error') or upsert.get('errors')}")
+
+        job["status"] = "verifying"
+        t = time.perf_counter()
+        expected = await asyncio.to_thread(lambda: len(chunk_store(target)))
+        points = await qdr.count(target)
+        job["verify"] = {"chunks": expected, "points": points}
+        if not points or points != expected:
+            raise RuntimeError(f"verify failed: {points} points in Qdrant, {expected} chunks stored")
+        if req.verify_samples:
+            ev = await subsystem("evaluate").evaluate_retrieval(req.verify_samples, target, req.provider or "auto", req.model, req.verify_topk)
+            job["verify"]["eval"] = ev["summary"]
+            recall = float(ev["summary"].get("Recall@k") or 0.0)
+            if req.min_recall is not None and recall < req.min_recall:
+                raise RuntimeError(f"verify failed: Recall@k {recall} < min_recall {req.min_recall}")
+        job["timings_ms"]["verify"] = round((time.perf_counter() - t) * 1000, 1)
+
+        job["status"] = "switching"
+        t = time.perf_counter()
+        job["previous"], job["alias"] = await _switch_live(logical, target, qdr)
+        job["timings_ms"]["switch"] = round((time.perf_counter() - t) * 1000, 1)
+        job["status"] = "live"
+        job["switched_at"] = time.time()
     except Exception as e:
-        qdrant_result = {"error": f"upsert_failed: {e}"}
-    # update BM25 registry for this collection
-    bm25_registry.add_docs(req.collection, [{"id": p.get("id"), "text": p.get("text", "")} for p in payloads])
-    return {"ok": True, "provider": emb.get("provider"), "qdrant": qdrant_result, "filter_stats": stats}
+        job["status"] = "failed"
+        job["error"] = str(e)
+        await _drop_failed_target(job)
+        return
+
+    await _collect_previous(job, req.gc_grace_s)
+
+
+def _ok(res: Any) -> bool:
+    return isinstance(res, dict) and res.get("status") == "ok"
+
+
+async def _switch_live(logical: str, target: str, qdr: Any) -> tuple[Optional[str], Dict[str, Any]]:
+    """Point `logical` at the physical `target` in Qdrant and in the local alias map.
+
+    Returns (previous physical collection or None, alias-actions response).
+    Raises RuntimeError on failure; every step is undone that can be, so the
+    alias map points at `target` afterwards only if the legacy collection was
+    already deleted (then `target` is all that is left and must be kept).
+    """
+    previous = aliases.resolve(logical)
+    listed = await qdr.list_collections()
+    if not _ok(listed):
+        raise RuntimeError(f"listing collections failed: {listed}")
+    legacy = previous == logical and logical in {c.get("name") for c in (listed.get("result") or {}).get("collections") or []}
+    if legacy:
+        # a plain collection holds the name and Qdrant refuses an alias named
+        # like a collection: move in-app traffic first, then free the name for
+        # the alias (external clients see a short gap here)
+        aliases.set(logical, target)
+        try:
+            dropped = await qdr.delete_collection(logical)
+            if not _ok(dropped):
+                raise RuntimeError(f"deleting legacy collection {logical} failed: {dropped}")
+        except Exception:
+            aliases.remove(logical)
+            raise
+        res = await qdr.switch_alias(logical, target)
+        if not _ok(res):
+            raise RuntimeError(f"alias switch failed after {logical} was deleted; {target} serves it in-app only: {res}")
+    else:
+        res = await qdr.switch_alias(logical, target)
+        if not _ok(res):
+            raise RuntimeError(f"alias switch failed: {res}")
+        try:
+            aliases.set(logical, target)
+        except Exception:
+            if previous != logical:
+                await qdr.switch_alias(logical, previous)
+            raise
+    subsystem("rerank").rerank_cache.clear(logical)
+    reco_cache.bump(logical)
+    semantic_cache.bump(logical)
+    return (previous if previous != target else None), res
+
+
+async def _collect_previous(job: Dict[str, Any], gc_grace_s: Optional[float]) -> None:
+    """Drop the version a job replaced once its grace period is over."""
+    grace = gc_grace_s if gc_grace_s is not None else float(os.getenv("RAG_REINDEX_GC_GRACE_S", "30"))
+    old, logical = job["previous"], job["collection"]
+    if old and grace >= 0:
+        await asyncio.sleep(grace)
+        # the legacy plain collection was already deleted from Qdrant at the switch
+        await _drop_physical(old, qdrant=old != logical)
+        job["collected"] = old
+    job["status"] = "done"
+    job["finished_at"] = time.time()
+
+
+@app.get("/api/rag/reindex", response_class=ORJSONResponse)
+def list_reindex_jobs(collection: Optional[str] = None, _=Depends(require_api_key)):
+    jobs = [j for j in _reindex_jobs.values() if not collection or j["collection"] == collection]
+    return {"jobs": sorted(jobs, key=lambda j: j["started_at"], reverse=True), "aliases": aliases.all()}
+
+
+@app.get("/api/rag/reindex/{job_id}", response_class=ORJSONResponse)
+def get_reindex_job(job_id: str, _=Depends(require_api_key)):
+    job = _reindex_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown reindex job")
+    return job
+
 
+class FederatedSearch(BaseModel):
+    # search several collections at once: one query embedding per embedding
+    # config, concurrent per-collection searches, hits merged by weighted score
+    collections: Optional[List[str]] = Field(default=None, description="search these collections instead of `collection`")
+    collection_weights: Dict[str, float] = Field(default_factory=dict, description="score multiplier per collection (default 1.0; <= 0 leaves it out)")
+    collection_timeout_ms: Optional[float] = Field(default=None, description="per-collection budget (RAG_FEDERATED_TIMEOUT_MS, default 2000); late collections are skipped and reported")
 
-class RAGSearchRequest(BaseModel):
+
+class RAGSearchRequest(FederatedSearch):
     collection: str = Field(default="ict_docs")
     provider: Optional[str] = Field(default="auto")
     model: Optional[str] = None
@@ -228,69 +765,296 @@ class RAGSearchRequest(BaseModel):
     where_any: Optional[Dict[str, List[Any]]] = None
     rerank: bool = True
     alpha: float = 0.7
+    hnsw_ef: Optional[int] = Field(default=None, description="search-time beam width; higher = better recall, slower")
+    exact: bool = Field(default=False, description="brute-force search (ground truth for recall checks)")
+    rescore: Optional[bool] = Field(default=None, description="rescore quantized candidates with original vectors")
+    oversampling: Optional[float] = None
+    rerank_model: Optional[str] = Field(default="lexical", description="lexical | onnx | none")
+    rerank_budget_ms: Optional[float] = Field(default=150, description="return fused order if reranking takes longer")
+    rerank_weight: float = Field(default=0.5, ge=0.0, le=1.0, description="share of the rerank score in the final order; the rest is the fused score")
+    # response shaping: only these payload keys (e.g. ["id", "source", "text"]),
+    # or all but these; text trimmed to snippet_chars
+    fields: Optional[List[str]] = None
+    exclude_fields: Optional[List[str]] = None
+    snippet_chars: Optional[int] = Field(default=None, ge=0)
+    # paraphrases of a recent query are answered from the semantic result cache
+    semantic_cache: bool = Field(default=True, description="serve/store results by query-vector similarity (RAG_SEMANTIC_CACHE)")
+    cache_threshold: Optional[float] = Field(default=None, description="min cosine to a cached query (RAG_SEMANTIC_CACHE_THRESHOLD, default 0.95)")
 
 
-@app.post("/api/rag/search")
-async def rag_search(req: RAGSearchRequest, _=Depends(require_api_key)):
-    emb = await embed_texts([req.query], provider=req.provider or "auto", model=req.model)
-    vec = emb.get("vectors", [[0.0]])[0]
-    qdr = Qdrant()
-    out: Dict[str, Any] = {}
+def _search_payload(req: RAGSearchRequest) -> Any:
+    """What to fetch from Qdrant: the projection plus the keys filtering and reranking read."""
+    needed = {"id"} | set(req.where or {}) | set(req.where_any or {})
+    if req.rerank:
+        needed.add("text")
+    if req.fields:
+        return subsystem("qdrant").payload_selector(include=list(needed | set(req.fields)))
+    return subsystem("qdrant").payload_selector(exclude=[f for f in req.exclude_fields or [] if f not in needed])
+
+
+def _attach_text(collection: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill payload text from the local chunk store for hits that came without it;
+    returns the hits the store has no text for."""
+    want: Dict[str, List[Dict[str, Any]]] = {}
+    for h in hits:
+        payload = h.get("payload")
+        if isinstance(payload, dict) and payload.get("text") is None and payload.get("id") is not None:
+            want.setdefault(str(payload["id"]), []).append(h)
+    if not want:
+        return []
+    for cid, text in chunk_store(collection).get_many(want).items():
+        for h in want.pop(cid):
+            h["payload"]["text"] = text
+    return [h for group in want.values() for h in group]
+
+
+async def _fill_text(collection: str, hits: List[Dict[str, Any]]) -> None:
+    """_attach_text, then the Qdrant payload for chunks the local store lost (a
+    wiped state dir, a collection indexed with RAG_TEXT_IN_QDRANT=1); recovered
+    text is written back to the store. Hits with no text anywhere are flagged
+    text_missing: re-indexing their documents restores it."""
+    missing = await asyncio.to_thread(_attach_text, collection, hits)
+    if not missing:
+        return
+    from .rag.indexer import stable_id
+    texts: Dict[str, str] = {}
+    try:
+        ids = list(dict.fromkeys(stable_id(str(h["payload"]["id"])) for h in missing))
+        out = await subsystem("qdrant").Qdrant().retrieve(collection, ids, with_payload={"include": ["id", "text"]})
+        if out.get("status") == "ok":
+            for point in out.get("result") or []:
+                payload = point.get("payload") or {}
+                if payload.get("id") is not None and isinstance(payload.get("text"), str):
+                    texts[str(payload["id"])] = payload["text"]
+    except Exception:
+        pass
+    for h in missing:
+        text = texts.get(str(h["payload"]["id"]))
+        if text is None:
+            h["payload"]["text_missing"] = True
+        else:
+            h["payload"]["text"] = text
+    if texts:
+        await asyncio.to_thread(chunk_store(collection).put_many, texts.items())
+
+
+def _project_hits(hits: List[Dict[str, Any]], req: RAGSearchRequest) -> None:
+    if not (req.fields or req.exclude_fields or req.snippet_chars is not None):
+        return
+    keep = set(req.fields or ())
+    drop = set(req.exclude_fields or ())
+    n = req.snippet_chars
+    for h in hits:
+        payload = h.get("payload")
+        if not isinstance(payload, dict):
+            continue
+        if keep:
+            payload = {k: v for k, v in payload.items() if k in keep}
+        elif drop:
+            payload = {k: v for k, v in payload.items() if k not in drop}
+        text = payload.get("text")
+        if n is not None and isinstance(text, str) and len(text) > n:
+            payload["text"] = text[:n].rstrip() + "…"
+        h["payload"] = payload
+
+
+async def _fill_text_federated(hits: List[Dict[str, Any]], physical: Dict[str, str]) -> None:
+    """_fill_text for merged hits; each carries the logical name of its collection."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for h in hits:
+        groups.setdefault(physical[h["collection"]], []).append(h)
+    await asyncio.gather(*(_fill_text(collection, part) for collection, part in groups.items()))
+
+
+def _embedding_config(collection: str, provider: Optional[str], model: Optional[str]) -> tuple[tuple[str, Optional[str]], Optional[int]]:
+    """((provider, model), dim) a physical collection was indexed with; the request's
+    provider/model when nothing is recorded."""
+    fp = FingerprintStore(collection)
+    meta = fp.meta() if os.path.exists(fp.path) else {}
+    fp.close()
+    if meta.get("provider"):
+        return (meta["provider"], meta.get("model")), meta.get("dim")
+    return (provider or "auto", model), None
+
+
+async def _federated_hits(
+    collections: List[str],
+    query: str,
+    provider: Optional[str],
+    model: Optional[str],
+    weights: Dict[str, float],
+    timeout_ms: Optional[float],
+    limit: int,
+    search: Any,
+) -> tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """Fan `query` out to several collections and merge their hits by weighted score.
+
+    The query is embedded once per embedding config among the collections; then
+    `search(physical, vector)` runs for every collection concurrently, each within
+    timeout_ms. Collections that time out or fail are left out of the merge and
+    reported. Returns (merged hits, per-collection report, logical -> physical).
+    """
+    physical = {c: aliases.resolve(c) for c in dict.fromkeys(collections)}
+    configs = {c: _embedding_config(p, provider, model) for c, p in physical.items()}
+    embed = subsystem("embed")
+    vectors = {
+        cfg: asyncio.ensure_future(embed.embed_texts([query], provider=cfg[0], model=cfg[1]))
+        for cfg in {cfg for cfg, _ in configs.values()}
+    }
+
+    async def one(name: str) -> List[Dict[str, Any]]:
+        cfg, dim = configs[name]
+        # shielded: a timeout here must not cancel the embedding other collections share
+        emb = await asyncio.shield(vectors[cfg])
+        if dim and emb.get("dim") and emb["dim"] != dim:
+            raise RuntimeError(f"query embedding has dim {emb['dim']}, {name} was indexed with {dim}")
+        return await search(physical[name], emb["vectors"][0])
+
+    timeout = (timeout_ms if timeout_ms is not None else float(os.getenv("RAG_FEDERATED_TIMEOUT_MS", "2000"))) / 1000
+    results = await gather_within({c: one(c) for c in physical}, timeout)
+    for task in vectors.values():
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()  # retrieved, so a failed embedding is not logged as unhandled
+    ranked = {c: r["result"] for c, r in results.items() if "result" in r}
+    merged = merge_ranked(ranked, weights, limit)
+    report: Dict[str, Dict[str, Any]] = {}
+    for c, r in results.items():
+        report[c] = {"physical": physical[c], "provider": configs[c][0][0], "model": configs[c][0][1], "ms": r["ms"], "weight": weights.get(c, 1.0)}
+        if "result" in r:
+            report[c]["hits"] = len(r["result"])
+        else:
+            report[c].update({k: r[k] for k in ("timeout", "error") if k in r})
+    return merged, report, physical
+
+
+def _where_ok(req: RAGSearchRequest, payload: Optional[Dict[str, Any]]) -> bool:
+    meta = payload or {}
+    if req.where:
+        for k, v in req.where.items():
+            if meta.get(k) != v:
+                return False
+    if req.where_any:
+        for k, vals in req.where_any.items():
+            if meta.get(k) not in set(vals):
+                return False
+    return True
+
+
+async def _search_candidates(req: RAGSearchRequest, collection: str, vec: Any) -> tuple[List[Dict[str, Any]], bool]:
+    """Candidates from one physical collection, best first: vector hits (BM25 if
+    Qdrant is unreachable or failing), filtered by where/where_any, fused with BM25 when
+    reranking. The flag is set when the BM25 fallback answered."""
+    qdr = subsystem("qdrant").Qdrant()
     hits: List[Dict[str, Any]] = []
+    degraded = False
     try:
-        out = await qdr.search(req.collection, vec, max(20, req.topk))
+        params = subsystem("qdrant").search_params(req.hnsw_ef, req.exact, req.rescore, req.oversampling)
+        out = await qdr.search(collection, vec, max(20, req.topk), params=params, with_payload=_search_payload(req))
+        if out.get("status") != "ok":
+            raise RuntimeError(f"qdrant search failed: {out.get('status')}")
         hits = out.get("result") or out.get("hits") or []
     except Exception:
-        # Fallback to BM25-only search if vector DB unreachable
-        bm25_hits = bm25_registry.search(req.collection, req.query, topk=max(20, req.topk))
+        # Fallback to BM25-only search if vector DB unreachable or failing
+        degraded = True
+        bm25_hits = await asyncio.to_thread(subsystem("bm25").bm25_registry.search, collection, req.query, max(20, req.topk))
         for s, d in bm25_hits:
             hits.append({
                 "id": d.get("id"),
                 "score": float(s),
-                "payload": {"id": d.get("id"), "text": d.get("text", "")},
+                "payload": {"id": d.get("id")},
             })
     if req.where or req.where_any:
-        def ok(p: Dict[str, Any]) -> bool:
-            meta = p or {}
-            if req.where:
-                for k, v in req.where.items():
-                    if meta.get(k) != v:
-                        return False
-            if req.where_any:
-                for k, vals in req.where_any.items():
-                    if meta.get(k) not in set(vals):
-                        return False
-            return True
-        hits = [h for h in hits if ok(h.get("payload", {}))]
-    # Hybrid: fuse vector similarity with BM25 lexical score, then fallback to keyword rerank
+        hits = [h for h in hits if _where_ok(req, h.get("payload", {}))]
+    if not (req.rerank and hits):
+        return hits, degraded
+    # Hybrid: fuse vector similarity with BM25 lexical score
+    hybrid = subsystem("bm25")
+    bm25_hits = await asyncio.to_thread(hybrid.bm25_registry.search, collection, req.query, max(20, req.topk))
+    if not bm25_hits:
+        # fallback to ad-hoc if registry empty
+        await _fill_text(collection, hits)
+        docs = []
+        for h in hits:
+            payload = h.get("payload") or {}
+            docs.append({"id": payload.get("id") or h.get("id"), "text": payload.get("text", "")})
+        bm25 = hybrid.InMemoryBM25(docs)
+        bm25_hits = bm25.search(req.query, topk=max(20, req.topk))
+    # keep every candidate through fusion so the reranker can promote from the tail
+    return hybrid.fuse_scores(hits, bm25_hits, alpha=req.alpha, topk=len(hits)), degraded
+
+
+async def _finish_search(req: RAGSearchRequest, hits: List[Dict[str, Any]], attach: Any) -> Dict[str, Any]:
+    """Second-stage rerank, cut to topk, chunk text via `await attach(hits)`, projection."""
+    rerank_info: Dict[str, Any] | None = None
     if req.rerank and hits:
         import re
         query_terms = [t for t in re.split(r"\W+", req.query) if t]
         def kw_score(text: str) -> float:
             t = (text or "").lower()
             return sum(t.count(term.lower()) for term in query_terms)
-        # Prepare docs for BM25
-        docs = []
-        for h in hits:
-            payload = h.get("payload") or {}
-            docs.append({"id": payload.get("id") or h.get("id"), "text": payload.get("text", "")})
-        bm25_hits = bm25_registry.search(req.collection, req.query, topk=max(20, req.topk))
-        if not bm25_hits:
-            # fallback to ad-hoc if registry empty
-            bm25 = InMemoryBM25(docs)
-            bm25_hits = bm25.search(req.query, topk=max(20, req.topk))
-        fused = fuse_scores(hits, bm25_hits, alpha=req.alpha, topk=req.topk)
+        if req.rerank_model and req.rerank_model != "none":
+            # the reranker reads every candidate's text
+            await attach(hits)
+            hits, rerank_info = await subsystem("rerank").rerank_hits(
+                req.query, hits, model=req.rerank_model, budget_ms=req.rerank_budget_ms, collection=req.collection, weight=req.rerank_weight,
+            )
+        hits = hits[: req.topk]
+        await attach(hits)
         # Add keyword score as auxiliary
-        for f in fused:
+        for f in hits:
             payload = f.get("payload") or {}
             f["kw_score"] = kw_score(payload.get("text", ""))
-        hits = fused
     else:
         hits = hits[: req.topk]
-    return {"ok": True, "hits": hits}
+        if (not req.fields or "text" in req.fields) and "text" not in (req.exclude_fields or []):
+            await attach(hits)
+    _project_hits(hits, req)
+    out_body: Dict[str, Any] = {"ok": True, "hits": hits}
+    if rerank_info is not None:
+        out_body["rerank"] = rerank_info
+    return out_body
+
+
+def _search_variant(req: RAGSearchRequest) -> str:
+    """Semantic-cache variant of a search: every request parameter but the query text."""
+    return semantic_cache.variant(req.model_dump(exclude={"query", "semantic_cache", "cache_threshold"}))
+
+
+@app.post("/api/rag/search", response_class=ORJSONResponse)
+async def rag_search(req: RAGSearchRequest, _=Depends(require_api_key)):
+    if req.collections:
+        async def candidates(collection: str, vec: Any) -> List[Dict[str, Any]]:
+            return (await _search_candidates(req, collection, vec))[0]
+
+        hits, report, physical = await _federated_hits(
+            req.collections, req.query, req.provider, req.model, req.collection_weights, req.collection_timeout_ms,
+            max(20, req.topk), candidates,
+        )
+        out_body = await _finish_search(req, hits, lambda hs: _fill_text_federated(hs, physical))
+        out_body["collections"] = report
+        return ORJSONResponse(out_body)
+    # resolve the alias once so every read of this request hits the same version
+    collection = aliases.resolve(req.collection)
+    emb = await subsystem("embed").embed_texts([req.query], provider=req.provider or "auto", model=req.model)
+    vec = emb.get("vectors", [[0.0]])[0]
+    variant: Optional[str] = None
+    if req.semantic_cache and semantic_cache.enabled:
+        variant = _search_variant(req)
+        version = semantic_cache.version(req.collection)
+        cached = semantic_cache.lookup(req.collection, variant, vec, req.cache_threshold)
+        if cached is not None:
+            body, info = cached
+            return ORJSONResponse({**body, "cache": info})
+    hits, degraded = await _search_candidates(req, collection, vec)
+    out_body = await _finish_search(req, hits, lambda hs: _fill_text(collection, hs))
+    if variant is not None and not degraded:
+        semantic_cache.put(req.collection, variant, vec, req.query, out_body, hit_ids(out_body["hits"]), version)
+    return ORJSONResponse(out_body)
 
 
-class RecommendRequest(BaseModel):
+class RecommendRequest(FederatedSearch):
     scenario: str
     current: Dict[str, Any] = {}
     data: Dict[str, Any] = {}
@@ -304,47 +1068,128 @@ class RecommendRequest(BaseModel):
     model: Optional[str] = None
 
 
-@app.post("/api/recommend")
-async def recommend(req: RecommendRequest, _=Depends(require_api_key)):
-    req_dict = req.model_dump()
-    evidence = None
+def _evidence_query(req: RecommendRequest) -> str:
+    if req.evidence_query:
+        return req.evidence_query
     # Build a default evidence query from template if not provided
-    default_query = None
-    if not req.evidence_query:
-        cur = req.current or {}
-        default_query = (
-            f"场景:{req.scenario} QPS:{cur.get('qps_peak')} P95:{cur.get('latency_p95_ms')}ms "
-            f"请求:{cur.get('payload_kb')}KB 合规:{(req.constraints or {}).get('compliance','')} "
-            f"预算:{req.budget_tier} 安全:{req.security_level}"
+    cur = req.current or {}
+    return (
+        f"场景:{req.scenario} QPS:{cur.get('qps_peak')} P95:{cur.get('latency_p95_ms')}ms "
+        f"请求:{cur.get('payload_kb')}KB 合规:{(req.constraints or {}).get('compliance','')} "
+        f"预算:{req.budget_tier} 安全:{req.security_level}"
+    )
+
+
+def _bm25_hits(collection: str, query_text: str) -> List[Dict[str, Any]]:
+    """Top 5 BM25 hits with text; blocking, call it in a worker thread."""
+    bm = subsystem("bm25").bm25_registry.search(collection, query_text, topk=5)
+    hits = [{
+        "id": d.get("id"),
+        "score": float(s),
+        "payload": {"id": d.get("id")},
+    } for (s, d) in bm]
+    _attach_text(collection, hits)
+    return hits
+
+
+def _normalize_evidence(hits: List[Dict[str, Any]] | None) -> List[Dict[str, Any]]:
+    evidence = []
+    for h in hits or []:
+        item = {
+            "id": h.get("id"),
+            "score": h.get("score"),
+            "payload": h.get("payload"),
+            "text": (h.get("payload") or {}).get("text"),
+        }
+        if h.get("collection"):
+            item["collection"] = h["collection"]
+        evidence.append(item)
+    return evidence
+
+
+def _evidence_variant(provider: Optional[str], model: Optional[str]) -> Optional[str]:
+    """Semantic-cache variant of evidence retrieval (top 5 vector hits), None when disabled."""
+    if not semantic_cache.enabled:
+        return None
+    return semantic_cache.variant({"kind": "evidence", "limit": 5, "provider": provider, "model": model})
+
+
+async def _build_recommendation(req: RecommendRequest) -> tuple[Dict[str, Any], bool]:
+    req_dict = req.model_dump()
+    cacheable = True
+    query_text = _evidence_query(req)
+    qdr = subsystem("qdrant").Qdrant()
+    if req.collections:
+        degraded: List[str] = []
+
+        async def search(collection: str, vec: Any) -> List[Dict[str, Any]]:
+            try:
+                out = await qdr.search(collection, vec, 5)
+                if out.get("status") != "ok":
+                    raise RuntimeError(f"qdrant search failed: {out.get('status')}")
+                found = out.get("result") or []
+            except Exception:
+                degraded.append(collection)
+                return await asyncio.to_thread(_bm25_hits, collection, query_text)
+            await _fill_text(collection, found)
+            return found
+
+        merged, report, _ = await _federated_hits(
+            req.collections, query_text, req.provider, req.model, req.collection_weights, req.collection_timeout_ms, 5, search,
         )
-    query_text = req.evidence_query or default_query
-    if query_text:
-        emb = await embed_texts([query_text], provider=req.provider or "auto", model=req.model)
-        vec = emb.get("vectors", [[0.0]])[0]
-        qdr = Qdrant()
-        hits: List[Dict[str, Any]] | None = None
-        try:
-            out = await qdr.search(req.collection, vec, 5)
-            hits = out.get("result")
-        except Exception:
-            # BM25 fallback if Qdrant not available
-            bm = bm25_registry.search(req.collection, query_text, topk=5)
-            hits = [{
-                "id": d.get("id"),
-                "score": float(s),
-                "payload": {"id": d.get("id"), "text": d.get("text", "")},
-            } for (s, d) in bm]
-        # Normalize evidence items
-        evidence = []
-        for h in hits or []:
-            item = {
-                "id": h.get("id"),
-                "score": h.get("score"),
-                "payload": h.get("payload"),
-                "text": (h.get("payload") or {}).get("text"),
-            }
-            evidence.append(item)
-    result = generate_recommendation(req_dict, evidence)
+        # evidence missing a collection (timeout, error, BM25 fallback) is not cached
+        cacheable = not degraded and all("hits" in r for r in report.values())
+        return generate_recommendation(req_dict, _normalize_evidence(merged)), cacheable
+    emb = await subsystem("embed").embed_texts([query_text], provider=req.provider or "auto", model=req.model)
+    vec = emb.get("vectors", [[0.0]])[0]
+    collection = aliases.resolve(req.collection)
+    variant = _evidence_variant(req.provider, req.model)
+    version = semantic_cache.version(req.collection)
+    cached = semantic_cache.lookup(req.collection, variant, vec) if variant else None
+    if cached is not None:
+        return generate_recommendation(req_dict, _normalize_evidence(cached[0])), cacheable
+    hits: List[Dict[str, Any]] | None = None
+    try:
+        out = await qdr.search(collection, vec, 5)
+        if out.get("status") != "ok":
+            raise RuntimeError(f"qdrant search failed: {out.get('status')}")
+        hits = out.get("result") or []
+        await _fill_text(collection, hits)
+        if variant:
+            semantic_cache.put(req.collection, variant, vec, query_text, hits, hit_ids(hits), version)
+    except Exception:
+        # BM25 fallback if Qdrant is unavailable or fails; degraded evidence is not cached
+        cacheable = False
+        hits = await asyncio.to_thread(_bm25_hits, collection, query_text)
+    return generate_recommendation(req_dict, _normalize_evidence(hits)), cacheable
+
+
+async def _cached_recommendation(req: RecommendRequest, key: str) -> tuple[Dict[str, Any], bool]:
+    """Cached result for `key`, else build it; the flag says whether it may carry an ETag."""
+    result = reco_cache.get(key)
+    if result is not None:
+        return result, True
+    result, cacheable = await _build_recommendation(req)
+    if cacheable:
+        reco_cache.put(key, req.collections or req.collection, result)
+    return result, cacheable
+
+
+@app.post("/api/recommend")
+async def recommend(
+    req: RecommendRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    _=Depends(require_api_key),
+):
+    # the ETag is derived from the request and collection version alone, so a
+    # revalidation is answered without planning or searching
+    key = reco_cache.key(req.model_dump())
+    if etag_matches(if_none_match, etag_for(key)):
+        return Response(status_code=304, headers={"ETag": etag_for(key)})
+    result, cacheable = await _cached_recommendation(req, key)
+    if cacheable:
+        response.headers["ETag"] = etag_for(key)
     return {"recommendation": result}
 
 
@@ -375,10 +1220,214 @@ def _recommend_to_markdown(rec: Dict[str, Any]) -> str:
 
 
 @app.post("/api/recommend/export", response_class=PlainTextResponse)
-async def recommend_export(req: RecommendRequest, _=Depends(require_api_key)):
-    res = await recommend(req)
-    md = _recommend_to_markdown(res["recommendation"])  # type: ignore[index]
-    return md
+async def recommend_export(
+    req: RecommendRequest,
+    if_none_match: Optional[str] = Header(None),
+    _=Depends(require_api_key),
+):
+    key = reco_cache.key(req.model_dump())
+    etag = etag_for(key, "md")
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # a recommendation the client just fetched as JSON is rendered from cache
+    result, cacheable = await _cached_recommendation(req, key)
+    return PlainTextResponse(_recommend_to_markdown(result), headers={"ETag": etag} if cacheable else None)
+
+
+class RecommendBatchRequest(BaseModel):
+    items: List[RecommendRequest]
+    aggregate: bool = True
+
+
+def _recommend_totals(recs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum the sizing targets of several recommendations (multi-site totals)."""
+    tot = {
+        "count": len(recs),
+        "vcpu_min": 0, "vcpu_max": 0,
+        "memory_gb_min": 0.0, "memory_gb_max": 0.0,
+        "iops_required": 0,
+        "north_south_gbps": 0.0, "east_west_gbps": 0.0,
+    }
+    for rec in recs:
+        compute = {e["item"]: e for e in rec["compute"]["expand"]}
+        storage = {e["item"]: e for e in rec["storage"]["expand"]}
+        network = {e["item"]: e for e in rec["network"]["expand"]}
+        tot["vcpu_min"] += compute["cpu"]["range"][0]
+        tot["vcpu_max"] += compute["cpu"]["range"][1]
+        tot["memory_gb_min"] += compute["memory"]["range"][0]
+        tot["memory_gb_max"] += compute["memory"]["range"][1]
+        tot["iops_required"] += storage["iops"]["target"]
+        tot["north_south_gbps"] += network["north_south_gbps"]["target"]
+        tot["east_west_gbps"] += network["east_west_gbps"]["target"]
+    for k in ("memory_gb_min", "memory_gb_max", "north_south_gbps", "east_west_gbps"):
+        tot[k] = round(tot[k], 2)
+    return tot
+
+
+async def _recommend_group(
+    collection: str,
+    provider: Optional[str],
+    model: Optional[str],
+    members: List[tuple[str, RecommendRequest]],
+) -> List[tuple[str, Dict[str, Any], bool]]:
+    """Recommendations for requests sharing a collection and embedding config: each
+    distinct evidence query is embedded once and all are searched in one batch."""
+    queries = list(dict.fromkeys(_evidence_query(r) for _, r in members))
+    emb = await subsystem("embed").embed_texts(queries, provider=provider or "auto", model=model)
+    physical = aliases.resolve(collection)
+    cacheable = True
+    # paraphrases of recent evidence queries come from the semantic cache; the rest go in one batch
+    variant = _evidence_variant(provider, model)
+    version = semantic_cache.version(collection)
+    hits_by_query: Dict[str, Any] = {}
+    todo: List[int] = []
+    for i, (q, vec) in enumerate(zip(queries, emb["vectors"])):
+        cached = semantic_cache.lookup(collection, variant, vec) if variant else None
+        if cached is not None:
+            hits_by_query[q] = cached[0]
+        else:
+            todo.append(i)
+    try:
+        if todo:
+            out = await subsystem("qdrant").Qdrant().search_batch(physical, emb["vectors"][todo], 5)
+            if out.get("status") != "ok":
+                raise RuntimeError(f"qdrant search failed: {out.get('status')}")
+            found = dict(zip([queries[i] for i in todo], out.get("result") or []))
+            # one chunk-store lookup for the evidence of every query in the group
+            await _fill_text(physical, [h for hits in found.values() for h in hits or []])
+            hits_by_query.update(found)
+            if variant:
+                for i in todo:
+                    if found.get(queries[i]) is not None:
+                        semantic_cache.put(collection, variant, emb["vectors"][i], queries[i], found[queries[i]], hit_ids(found[queries[i]]), version)
+    except Exception:
+        # BM25 fallback if Qdrant is unavailable or fails; degraded evidence is not cached
+        cacheable = False
+        hits_by_query = {q: await asyncio.to_thread(_bm25_hits, physical, q) for q in queries}
+    results = []
+    for key, r in members:
+        result = generate_recommendation(r.model_dump(), _normalize_evidence(hits_by_query.get(_evidence_query(r))))
+        if cacheable:
+            reco_cache.put(key, collection, result)
+        results.append((key, result, cacheable))
+    return results
+
+
+@app.post("/api/recommend/batch")
+async def recommend_batch(req: RecommendBatchRequest, _=Depends(require_api_key)):
+    """Stream one NDJSON line per item ({index, etag, recommendation} or {index, error})
+    as it completes, then an {"aggregate": ...} line when requested."""
+    keys = [reco_cache.key(r.model_dump()) for r in req.items]
+    cached = {k: reco_cache.get(k) for k in set(keys)}
+    groups: Dict[tuple, List[tuple[str, RecommendRequest]]] = {}
+    seen = set()
+    federated: List[tuple[str, RecommendRequest]] = []
+    for k, r in zip(keys, req.items):
+        if cached[k] is None and k not in seen:
+            seen.add(k)
+            if r.collections:
+                federated.append((k, r))
+            else:
+                groups.setdefault((r.collection, r.provider, r.model), []).append((k, r))
+    indices: Dict[str, List[int]] = {}
+    for i, k in enumerate(keys):
+        indices.setdefault(k, []).append(i)
+
+    async def lines():
+        done: List[Dict[str, Any]] = []
+
+        def emit(key: str, result: Dict[str, Any], cacheable: bool) -> List[bytes]:
+            out = []
+            for i in indices[key]:
+                line: Dict[str, Any] = {"index": i, "recommendation": result}
+                if cacheable:
+                    line["etag"] = etag_for(key)
+                done.append(result)
+                out.append(orjson.dumps(line) + b"\n")
+            return out
+
+        for k, result in cached.items():
+            if result is not None:
+                for b in emit(k, result, True):
+                    yield b
+        async def run(group: tuple, members: List[tuple[str, RecommendRequest]]):
+            try:
+                return members, await _recommend_group(*group, members), None
+            except Exception as e:
+                return members, [], f"{type(e).__name__}: {e}"
+
+        async def run_federated(key: str, r: RecommendRequest):
+            try:
+                result, cacheable = await _cached_recommendation(r, key)
+                return [(key, r)], [(key, result, cacheable)], None
+            except Exception as e:
+                return [(key, r)], [], f"{type(e).__name__}: {e}"
+
+        pending = [run(g, m) for g, m in groups.items()] + [run_federated(k, r) for k, r in federated]
+        for fut in asyncio.as_completed(pending):
+            members, results, error = await fut
+            if error:
+                for k, _r in members:
+                    for i in indices[k]:
+                        yield orjson.dumps({"index": i, "error": error}) + b"\n"
+                continue
+            for k, result, cacheable in results:
+                for b in emit(k, result, cacheable):
+                    yield b
+        if req.aggregate:
+            yield orjson.dumps({"aggregate": _recommend_totals(done)}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+class BOMRequest(PlanRequest):
+    budget_tier: str | None = None
+    topk: int = 5
+    min_units: int = 1
+    max_units: int = 64
+    budget: Optional[float] = None
+    brand_prefer: Optional[List[str]] = None
+    latency_budget_ms: float = 200
+
+
+@app.post("/api/recommend/bom")
+def recommend_bom(req: BOMRequest, _=Depends(require_api_key)):
+    """Cheapest bills of materials (catalog SKUs, capability templates as fallback)
+    that cover the planned minimums."""
+    req_dict = req.model_dump()
+    plan = plan_parameters(req_dict)
+    budget = req.budget if req.budget is not None else (req.constraints or {}).get("budget")
+    result = match_plan(
+        plan,
+        req.scenario,
+        catalog_index(_catalog_path()),
+        template_index(_catalog_path("CAPABILITIES_CSV")),
+        topk=req.topk,
+        min_units=req.min_units,
+        max_units=req.max_units,
+        budget=budget,
+        brand_prefer=req.brand_prefer,
+        latency_budget_ms=req.latency_budget_ms,
+    )
+    return {"ok": True, **result}
+
+
+class TemplateMatchRequest(PlanRequest):
+    scenario: Optional[str] = None  # type: ignore[assignment]
+    category: Optional[str] = None
+    params: Dict[str, Any] = {}
+    mode: str = "fit"
+
+
+@app.post("/api/templates/match")
+def templates_match(req: TemplateMatchRequest, _=Depends(require_api_key)):
+    """Capability templates satisfying explicit params (flattened keys), or the
+    planner output for the request when no params are given."""
+    query = req.params
+    if not query and req.scenario:
+        query = plan_query(plan_parameters(req.model_dump()))
+    idx = template_index(_catalog_path("CAPABILITIES_CSV"))
+    return {"ok": True, "query": query, "templates": idx.match(query, req.scenario, req.category, mode=req.mode)}
 
 
 class RAGEvalRequest(BaseModel):
@@ -387,39 +1436,44 @@ class RAGEvalRequest(BaseModel):
     model: Optional[str] = None
     topk: int = 5
     samples: List[Dict[str, Any]] = []
+    hnsw_ef: Optional[int] = None
+    exact: bool = False
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = None
+    cache_threshold: Optional[float] = Field(default=None, description="score the semantic cache at this similarity (default: the live threshold)")
 
 
-@app.post("/api/rag/evaluate")
+@app.post("/api/rag/evaluate", response_class=ORJSONResponse)
 async def rag_evaluate(req: RAGEvalRequest, _=Depends(require_api_key)):
-    out = await evaluate_retrieval(req.samples, req.collection, req.provider or "auto", req.model, req.topk)
-    # persist csv for dashboarding
-    out_dir = os.getenv("EVAL_OUT_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "eval_out"))
+    """Recall/precision of vector search; `semantic_cache` compares it with what the
+    semantic result cache would have served for the same samples, plus live hit rates."""
+    params = subsystem("qdrant").search_params(req.hnsw_ef, req.exact, req.rescore, req.oversampling)
+    # cached answers of the search request that does what evaluation measures:
+    # plain vector search (no filters, fusion or rerank) with this provider/model
+    plain = RAGSearchRequest(
+        collection=req.collection, provider=req.provider or "auto", model=req.model, query="", topk=req.topk, rerank=False,
+        hnsw_ef=req.hnsw_ef, exact=req.exact, rescore=req.rescore, oversampling=req.oversampling,
+    )
+    out = await subsystem("evaluate").evaluate_retrieval(
+        req.samples, aliases.resolve(req.collection), req.provider or "auto", req.model, req.topk, search_params=params,
+        cache=semantic_cache if semantic_cache.enabled else None, cache_key=req.collection, cache_variant=_search_variant(plain),
+        cache_threshold=req.cache_threshold,
+    )
+    if semantic_cache.enabled:
+        live = semantic_cache.stats(req.collection)
+        out["semantic_cache"]["live"] = live["collections"][req.collection]
+    # append to the evaluation history (per-query rows + run summary)
     try:
-        os.makedirs(out_dir, exist_ok=True)
-        csv_path = os.path.join(out_dir, f"{req.collection}_eval.csv")
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["query", "relevant_ids", "hit_ids", "recall@k", "precision@k", "latency_ms"])
-            for r in out.get("results", []):
-                writer.writerow([
-                    r.get("query"),
-                    ",".join(map(str, r.get("relevant_ids", []))),
-                    ",".join(map(str, r.get("hit_ids", []))),
-                    r.get("recall@k"), r.get("precision@k"), r.get("latency_ms")
-                ])
-            # summary as last row
-            s = out.get("summary", {})
-            writer.writerow(["SUMMARY", "", "", s.get("Recall@k"), s.get("Precision@k"), s.get("Latency P95 (ms)")])
-        out["csv_path"] = csv_path
-    except Exception as _:
-        pass
+        out["run_id"] = await asyncio.to_thread(eval_store.record_run, req.collection, out, topk=req.topk, provider=req.provider, model=req.model)
+    except Exception as e:
+        out["store_error"] = str(e)
     return out
 
 
 # Collections management
-@app.get("/api/rag/collections")
+@app.get("/api/rag/collections", response_class=ORJSONResponse)
 async def list_collections(_=Depends(require_api_key)):
-    qdr = Qdrant()
+    qdr = subsystem("qdrant").Qdrant()
     qdrant: Dict[str, Any] = {}
     try:
         qdrant = await qdr.list_collections()
@@ -433,72 +1487,129 @@ async def list_collections(_=Depends(require_api_key)):
                 names.append(n)
     except Exception:
         pass
-    bm25_tracked = list(getattr(bm25_registry, "_collection_to_docs", {}).keys())
-    return {"collections": names, "bm25_tracked": bm25_tracked, "raw": qdrant}
+    bm25_tracked = subsystem("bm25").bm25_registry.collections()
+    text_store = await asyncio.to_thread(_store_stats, names)
+    return {"collections": names, "aliases": aliases.all(), "bm25_tracked": bm25_tracked, "text_store": text_store, "raw": qdrant}
 
 
-@app.delete("/api/rag/collections/{name}")
+@app.delete("/api/rag/collections/{name}", response_class=ORJSONResponse)
 async def delete_collection(name: str, _=Depends(require_api_key)):
-    qdr = Qdrant()
-    bm25_registry.reset(name)
+    qdr = subsystem("qdrant").Qdrant()
+    # an alias takes its live version with it (Qdrant drops the alias too)
+    physical = aliases.resolve(name)
+    aliases.remove(name)
+    await asyncio.to_thread(_drop_local_state, physical)
+    subsystem("rerank").rerank_cache.clear(name)
+    reco_cache.bump(name)
+    semantic_cache.bump(name)
     res: Dict[str, Any] | None = None
     try:
-        res = await qdr.delete_collection(name)
+        res = await qdr.delete_collection(physical)
     except Exception as e:
         res = {"error": f"delete_failed: {e}"}
-    return {"ok": True, "qdrant": res}
+    return {"ok": True, "physical": physical, "qdrant": res}
+
+
+@app.get("/api/rag/collections/{name}", response_class=ORJSONResponse)
+async def get_collection(name: str, _=Depends(require_api_key)):
+    qdr = subsystem("qdrant").Qdrant()
+    physical = aliases.resolve(name)
+    try:
+        info = await qdr.collection_info(physical)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"qdrant_unreachable: {e}")
+    return {"collection": name, "physical": physical, "info": info.get("result", info), "text_store": (await asyncio.to_thread(_store_stats, [physical]))[physical]}
+
+
+@app.patch("/api/rag/collections/{name}", response_class=ORJSONResponse)
+async def update_collection_profile(name: str, profile: CollectionProfile, _=Depends(require_api_key)):
+    """Switch an existing collection's HNSW/on-disk/quantization profile in place;
+    compare before/after with /api/rag/evaluate (exact=true gives the recall baseline)."""
+    qdr = subsystem("qdrant").Qdrant()
+    try:
+        res = await qdr.update_collection(aliases.resolve(name), profile.model_dump())
+    except Exception as e:
+        res = {"error": f"update_failed: {e}"}
+    return {"ok": "error" not in res and res.get("status") == "ok", "qdrant": res}
 
 
-@app.post("/api/rag/collections/{name}/reset-bm25")
+@app.post("/api/rag/collections/{name}/reset-bm25", response_class=ORJSONResponse)
 def reset_bm25(name: str, _=Depends(require_api_key)):
-    bm25_registry.reset(name)
+    subsystem("bm25").bm25_registry.reset(aliases.resolve(name))
     return {"ok": True}
 
 
-# Evaluation files and summaries
-@app.get("/api/rag/evals")
+@app.post("/api/rag/collections/{name}/snapshot")
+async def snapshot_collection(name: str, _=Depends(require_api_key)):
+    """Stream the collection as a tar archive: Qdrant snapshot (vectors, payloads,
+    config), chunk store (text and BM25 source), fingerprints and embedding
+    provider/model/dim. Restore it with POST .../restore instead of re-embedding."""
+    qdr = subsystem("qdrant").Qdrant()
+    physical = aliases.resolve(name)
+    try:
+        info = await qdr.collection_info(physical)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"qdrant_unreachable: {e}")
+    if info.get("status") != "ok":
+        raise HTTPException(status_code=404, detail=f"unknown collection {name}")
+    try:
+        export = await prepare_export(name, physical, qdr, info)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"snapshot_failed: {e}")
+    filename = f"{name}.{time.strftime('%Y%m%dT%H%M%S')}.snapshot.tar"
+    return StreamingResponse(
+        export.stream(),
+        media_type="application/x-tar",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Content-Length": str(export.size)},
+        background=BackgroundTask(export.close),
+    )
+
+
+@app.post("/api/rag/collections/{name}/restore", response_class=ORJSONResponse)
+async def restore_collection(name: str, request: Request, gc_grace_s: Optional[float] = None, _=Depends(require_api_key)):
+    """Restore an archive from /snapshot (raw tar request body, streamed to disk)
+    as a new version of `name`, then switch the alias to it like a blue/green
+    reindex; the replaced version is dropped after gc_grace_s."""
+    job = _new_job(name, "restoring", kind="restore")
+    qdr = subsystem("qdrant").Qdrant()
+    try:
+        out = await restore_archive(request.stream(), job["target"], qdr)
+        job["timings_ms"].update(out.pop("timings_ms"))
+        if out["warnings"]:
+            job["warnings"] = out["warnings"]
+        job["status"] = "switching"
+        t = time.perf_counter()
+        job["previous"], job["alias"] = await _switch_live(name, job["target"], qdr)
+        job["timings_ms"]["switch"] = round((time.perf_counter() - t) * 1000, 1)
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        await _drop_failed_target(job)
+        raise HTTPException(status_code=400 if isinstance(e, SnapshotError) else 502, detail=f"restore_failed: {e}")
+    manifest = out["manifest"]
+    job["status"] = "live"
+    job["switched_at"] = time.time()
+    job["restored"] = {k: manifest.get(k) for k in ("collection", "physical", "created_at", "points", "chunks", "embedding")}
+    _spawn(_collect_previous(job, gc_grace_s))
+    # search/index requests for this collection must use the same embedding provider/model
+    return {"ok": True, "job": job, "embedding": manifest.get("embedding"), "qdrant": out["qdrant"]}
+
+
+# Evaluation history and summaries
+@app.get("/api/rag/evals", response_class=ORJSONResponse)
 def list_evals(collection: Optional[str] = None, _=Depends(require_api_key)):
-    out_dir = os.getenv("EVAL_OUT_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "eval_out"))
-    os.makedirs(out_dir, exist_ok=True)
-    import glob, json
-    def parse_summary(csv_path: str) -> Dict[str, Any]:
-        try:
-            with open(csv_path, encoding="utf-8") as f:
-                lines = [l.strip() for l in f.readlines() if l.strip()]
-            # last row expected SUMMARY
-            if not lines:
-                return {}
-            header = [h.strip() for h in lines[0].split(",")]
-            last = [c.strip() for c in lines[-1].split(",")]
-            if last and last[0] == "SUMMARY":
-                # map by known columns
-                return {
-                    "Recall@k": float(last[3]) if len(last) > 3 else None,
-                    "Precision@k": float(last[4]) if len(last) > 4 else None,
-                    "Latency P95 (ms)": float(last[5]) if len(last) > 5 else None,
-                }
-            return {}
-        except Exception:
-            return {}
-
-    results: List[Dict[str, Any]] = []
-    pattern = os.path.join(out_dir, f"{collection}_eval.csv" if collection else "*_eval.csv")
-    for path in glob.glob(pattern):
-        base = os.path.basename(path)
-        cname = base.replace("_eval.csv", "")
-        results.append({
-            "collection": cname,
-            "csv_path": path,
-            "summary": parse_summary(path),
-        })
-    return {"evals": results}
+    return {"evals": eval_store.latest(collection)}
+
+
+@app.get("/api/rag/evals/{collection}/runs", response_class=ORJSONResponse)
+def list_eval_runs(collection: str, limit: int = 50, _=Depends(require_api_key)):
+    return {"collection": collection, "runs": eval_store.history(collection, limit)}
 
 
-@app.get("/api/rag/evals/{collection}.csv", response_class=PlainTextResponse)
-def get_eval_csv(collection: str, _=Depends(require_api_key)):
-    out_dir = os.getenv("EVAL_OUT_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "eval_out"))
-    path = os.path.join(out_dir, f"{collection}_eval.csv")
-    if not os.path.exists(path):
+@app.get("/api/rag/evals/{collection}.csv")
+def get_eval_csv(collection: str, run_id: Optional[str] = None, _=Depends(require_api_key)):
+    """Per-query rows of a run (latest by default) in the legacy CSV layout, streamed."""
+    rid = eval_store.run_for(collection, run_id)
+    if not rid:
         raise HTTPException(status_code=404, detail="not found")
-    with open(path, encoding="utf-8") as f:
-        return f.read()
+    return StreamingResponse(eval_store.iter_csv(rid), media_type="text/csv; charset=utf-8")
@@ -0,0 +1,100 @@
+from typing import Dict, Optional
+import json
+import os
+import re
+import threading
+import time
+
+from .state import state_dir
+
+
+_VERSION = re.compile(r"^(?P<name>.+)__v(?P<ts>\d+)$")
+
+
+def version_name(collection: str, ts: Optional[float] = None) -> str:
+    """Physical collection for a blue/green build, e.g. ict_docs__v1760870400123."""
+    return f"{collection}__v{int((ts or time.time()) * 1000)}"
+
+
+def logical_name(physical: str) -> str:
+    m = _VERSION.match(physical)
+    return m.group("name") if m else physical
+
+
+class AliasMap:
+    """Logical collection name -> live physical collection, shared by all workers.
+
+    Mirrors the Qdrant aliases so local per-collection state (chunk store, BM25
+    index, fingerprints) follows the same switch. Persisted as JSON in the state
+    dir and re-read when the file changes, so a swap made by one worker is seen
+    by the others on their next request.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._map: Dict[str, str] = {}
+        self._sig: Optional[tuple] = None
+
+    @property
+    def path(self) -> str:
+        return self._path or os.path.join(state_dir(), "aliases.json")
+
+    def _refresh(self) -> None:
+        try:
+            st = os.stat(self.path)
+            sig = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            sig = None
+        if sig == self._sig:
+            return
+        data: Dict[str, str] = {}
+        if sig is not None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return  # keep the last good map
+        self._map, self._sig = data, sig
+
+    def resolve(self, name: str) -> str:
+        """Physical collection behind `name` (itself when it is not an alias)."""
+        with self._lock:
+            self._refresh()
+            return self._map.get(name, name)
+
+    def all(self) -> Dict[str, str]:
+        with self._lock:
+            self._refresh()
+            return dict(self._map)
+
+    def _write(self, data: Dict[str, str]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._map, self._sig = data, None
+
+    def set(self, name: str, physical: str) -> Optional[str]:
+        """Point `name` at `physical`; returns the previous target."""
+        with self._lock:
+            self._refresh()
+            data = dict(self._map)
+            previous = data.get(name)
+            data[name] = physical
+            self._write(data)
+            return previous
+
+    def remove(self, name: str) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            data = dict(self._map)
+            previous = data.pop(name, None)
+            if previous is not None:
+                self._write(data)
+            return previous
+
+
+aliases = AliasMap()
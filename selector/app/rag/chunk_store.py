@@ -0,0 +1,340 @@
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+
+import orjson
+
+from .state import collection_path
+
+try:  # optional: better ratio and much faster decompression than zlib
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+def _codec() -> str:
+    want = os.getenv("CHUNK_STORE_CODEC", "zstd" if zstandard is not None else "zlib").lower()
+    return "zstd" if want == "zstd" and zstandard is not None else "zlib"
+
+
+def _compress(codec: str, raw: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(raw)
+    return zlib.compress(raw, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("chunk store block is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class ChunkStore:
+    """Chunk text of one collection, block-compressed on local disk.
+
+    <collection>.chunks.<gen>.dat  append-only blocks; each block is a compressed
+                                   JSON list of texts (~CHUNK_STORE_BLOCK_KB raw)
+    <collection>.chunks.sqlite     chunk id -> (block, position); block -> (offset, length, codec)
+
+    Reads go through an mmap of the data file and a small LRU of decompressed
+    blocks. Replaced or deleted chunks leave dead bytes behind; once more than
+    half of the file is dead, live chunks are copied into the next generation's
+    file and the index switches to it in one transaction.
+    """
+
+    def __init__(self, collection: str, base_dir: Optional[str] = None, block_bytes: Optional[int] = None) -> None:
+        self.collection = collection
+        self.base_dir = base_dir
+        self.index_path = collection_path(collection, ".chunks.sqlite", base_dir)
+        self.block_bytes = block_bytes or int(os.getenv("CHUNK_STORE_BLOCK_KB", "64")) * 1024
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._mm_size = 0
+        self._blocks: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._cache_blocks = 64
+
+    # -- files --------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, block INTEGER, pos INTEGER, raw_len INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_block ON chunks(block)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                "block INTEGER PRIMARY KEY, offset INTEGER, length INTEGER, codec TEXT, n INTEGER, live INTEGER)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _gen(self) -> int:
+        row = self._db().execute("SELECT value FROM meta WHERE key = 'gen'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _data_path(self, gen: int) -> str:
+        return collection_path(self.collection, f".chunks.{gen}.dat", self.base_dir)
+
+    @property
+    def data_path(self) -> str:
+        with self._lock:
+            return self._data_path(self._gen())
+
+    def _view(self, end: int) -> mmap.mmap:
+        """mmap covering at least `end` bytes of the data file (remapped after appends)."""
+        if self._mm is None or self._mm_size < end:
+            if self._mm is not None:
+                self._mm.close()
+            with open(self.data_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mm_size = len(self._mm)
+        return self._mm
+
+    def _unmap(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            self._mm_size = 0
+        self._blocks.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._unmap()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- writes -------------------------------------------------------------
+
+    def _pack(self, items: List[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+        block: List[Tuple[str, str]] = []
+        size = 0
+        for cid, text in items:
+            block.append((cid, text))
+            size += len(text.encode("utf-8"))
+            if size >= self.block_bytes:
+                yield block
+                block, size = [], 0
+        if block:
+            yield block
+
+    def _append(self, path: str, items: List[Tuple[str, str]], first_block: int) -> Tuple[List[tuple], List[tuple]]:
+        """Compress items into blocks appended to path; returns (block rows, chunk rows)."""
+        codec = _codec()
+        blocks: List[tuple] = []
+        rows: List[tuple] = []
+        block_id = first_block
+        with open(path, "ab") as f:
+            offset = f.tell()
+            for block in self._pack(items):
+                data = _compress(codec, orjson.dumps([t for _, t in block]))
+                f.write(data)
+                blocks.append((block_id, offset, len(data), codec, len(block), len(block)))
+                rows += [(cid, block_id, i, len(t.encode("utf-8"))) for i, (cid, t) in enumerate(block)]
+                offset += len(data)
+                block_id += 1
+            f.flush()
+            os.fsync(f.fileno())
+        return blocks, rows
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Store (chunk id, text) pairs, replacing earlier text under the same ids."""
+        latest = {str(cid): text or "" for cid, text in items}
+        if not latest:
+            return 0
+        with self._lock:
+            db = self._db()
+            next_block = (db.execute("SELECT MAX(block) FROM blocks").fetchone()[0] or 0) + 1
+            blocks, rows = self._append(self.data_path, list(latest.items()), next_block)
+            with db:
+                self._release(db, list(latest))
+                db.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?)", blocks)
+                db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", rows)
+            self._maybe_compact()
+        return len(latest)
+
+    def _release(self, db: sqlite3.Connection, ids: List[str]) -> int:
+        """Drop index rows of ids, decrementing the live count of their blocks."""
+        dead: Dict[int, int] = {}
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            for (block,) in db.execute(f"SELECT block FROM chunks WHERE id IN ({','.join('?' * len(part))})", part):
+                dead[block] = dead.get(block, 0) + 1
+            db.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+        db.executemany("UPDATE blocks SET live = live - ? WHERE block = ?", [(n, b) for b, n in dead.items()])
+        return sum(dead.values())
+
+    def delete(self, ids: Iterable[str]) -> int:
+        ids = [str(i) for i in ids]
+        if not ids:
+            return 0
+        with self._lock:
+            db = self._db()
+            with db:
+                n = self._release(db, ids)
+            self._maybe_compact()
+        return n
+
+    def _maybe_compact(self) -> None:
+        db = self._db()
+        total, dead = db.execute(
+            "SELECT COALESCE(SUM(length), 0), COALESCE(SUM(CASE WHEN live <= 0 THEN length ELSE 0 END), 0) FROM blocks"
+        ).fetchone()
+        if total and dead * 2 > total:
+            self.compact()
+
+    def compact(self) -> None:
+        """Copy live chunks into the next generation's data file and switch to it."""
+        with self._lock:
+            items = list(self.items())
+            db = self._db()
+            old = self._gen()
+            new_path = self._data_path(old + 1)
+            if os.path.exists(new_path):
+                os.remove(new_path)  # leftover of an interrupted compaction
+            blocks, rows = self._append(new_path, items, 1)
+            with db:
+                db.execute("DELETE FROM chunks")
+                db.execute("DELETE FROM blocks")
+                db.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?)", blocks)
+                db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('gen', ?)", (str(old + 1),))
+            self._unmap()
+            if os.path.exists(self._data_path(old)):
+                os.remove(self._data_path(old))
+
+    def drop(self) -> None:
+        """Remove the store's files (the collection was deleted)."""
+        with self._lock:
+            data = self.data_path if os.path.exists(self.index_path) else None
+            self.close()
+            for path in (data, self.index_path, self.index_path + "-wal", self.index_path + "-shm"):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def backup(self, index_dest: str) -> Tuple[Optional[BinaryIO], int]:
+        """Copy the index to `index_dest`; returns the open data file and its length.
+
+        Both are taken under the lock, so the copied index only refers to bytes
+        below the returned length; later appends or a compaction (which unlinks
+        the file) do not affect what the caller reads through the handle.
+        """
+        with self._lock:
+            with sqlite3.connect(index_dest) as out:
+                self._db().backup(out)
+            out.close()
+            path = self.data_path
+            if not os.path.exists(path):
+                return None, 0
+            f = open(path, "rb")
+            return f, os.fstat(f.fileno()).st_size
+
+    # -- reads --------------------------------------------------------------
+
+    def _block(self, block: int, offset: int, length: int, codec: str) -> List[str]:
+        texts = self._blocks.get(block)
+        if texts is None:
+            view = self._view(offset + length)
+            texts = orjson.loads(_decompress(codec, view[offset:offset + length]))
+            self._blocks[block] = texts
+            while len(self._blocks) > self._cache_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block)
+        return texts
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, str]:
+        """Text of each stored id (unknown ids are left out)."""
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        out: Dict[str, str] = {}
+        if not ids:
+            return out
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                q = (
+                    "SELECT c.id, c.pos, b.block, b.offset, b.length, b.codec FROM chunks c JOIN blocks b ON c.block = b.block "
+                    f"WHERE c.id IN ({','.join('?' * len(part))}) ORDER BY b.block"
+                )
+                for cid, pos, block, offset, length, codec in db.execute(q, part):
+                    out[cid] = self._block(block, offset, length, codec)[pos]
+        return out
+
+    def get(self, cid: str) -> Optional[str]:
+        return self.get_many([cid]).get(str(cid))
+
+    def missing(self, ids: Iterable[str]) -> List[str]:
+        ids = [str(i) for i in ids]
+        have: set = set()
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                have.update(r[0] for r in db.execute(f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(part))})", part))
+        return [i for i in ids if i not in have]
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Every live (chunk id, text), block by block."""
+        with self._lock:
+            db = self._db()
+            rows = db.execute(
+                "SELECT c.id, c.pos, b.block, b.offset, b.length, b.codec FROM chunks c JOIN blocks b ON c.block = b.block "
+                "ORDER BY b.block, c.pos"
+            ).fetchall()
+            for cid, pos, block, offset, length, codec in rows:
+                yield cid, self._block(block, offset, length, codec)[pos]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._db().execute("SELECT COUNT(*) FROM chunks").fetchone()[0])
+
+    def stats(self) -> Dict[str, object]:
+        """Storage report: raw text bytes vs. bytes on disk for the live chunks."""
+        if self._conn is None and not os.path.exists(self.index_path):
+            return {"chunks": 0, "text_bytes": 0, "stored_bytes": 0, "dead_bytes": 0, "saved_bytes": 0, "ratio": None, "codec": []}
+        with self._lock:
+            db = self._db()
+            n, raw = db.execute("SELECT COUNT(*), COALESCE(SUM(raw_len), 0) FROM chunks").fetchone()
+            total, dead = db.execute(
+                "SELECT COALESCE(SUM(length), 0), COALESCE(SUM(CASE WHEN live <= 0 THEN length ELSE 0 END), 0) FROM blocks"
+            ).fetchone()
+            codecs = sorted(r[0] for r in db.execute("SELECT DISTINCT codec FROM blocks WHERE live > 0"))
+        stored = int(total) - int(dead)
+        return {
+            "chunks": int(n),
+            "text_bytes": int(raw),
+            "stored_bytes": stored,
+            "dead_bytes": int(dead),
+            "saved_bytes": int(raw) - stored,
+            "ratio": round(raw / stored, 2) if stored else None,
+            "codec": codecs,
+        }
+
+
+_stores: Dict[str, ChunkStore] = {}
+_stores_lock = threading.Lock()
+
+
+def chunk_store(collection: str) -> ChunkStore:
+    """Process-wide store per collection (shares its mmap and block cache)."""
+    with _stores_lock:
+        store = _stores.get(collection)
+        if store is None:
+            store = _stores[collection] = ChunkStore(collection)
+        return store
+
+
+def drop_chunk_store(collection: str) -> None:
+    with _stores_lock:
+        store = _stores.pop(collection, None)
+    (store or ChunkStore(collection)).drop()
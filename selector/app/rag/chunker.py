@@ -1,21 +1,150 @@
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from functools import lru_cache
+import re
+
+
+# a sentence runs up to and including a CN/EN terminator or newline
+_SENTENCE = re.compile(r"[^。！？!?\n]*[。！？!?\n]|[^。！？!?\n]+")
+# a paragraph is a run of text not containing a blank line ("\n\n")
+_PARAGRAPH = re.compile(r"(?:[^\n]|\n(?!\n))+")
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_WORD = re.compile(r"[^\s\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]+")
+
+TokenLen = Callable[[str], int]
+Span = Tuple[int, int]
+
+
+def approx_token_len(text: str) -> int:
+    """Tokenizer-free estimate: one token per CJK char, ~4 chars per token otherwise."""
+    words = _WORD.findall(text)
+    return len(_CJK.findall(text)) + (sum(map(len, words)) + 3 * len(words)) // 4
+
+
+@lru_cache(maxsize=8)
+def get_token_len(model: Optional[str] = None) -> TokenLen:
+    """Exact counter for OpenAI-style models when tiktoken is installed, else the estimate."""
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return approx_token_len
+    try:
+        enc = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        enc = tiktoken.get_encoding("cl100k_base")
+    return lambda t: len(enc.encode(t, disallowed_special=()))
+
+
+def _trimmed_spans(text: str, pattern: "re.Pattern[str]") -> List[Span]:
+    spans: List[Span] = []
+    for m in pattern.finditer(text):
+        seg = m.group()
+        s = m.start() + (len(seg) - len(seg.lstrip()))
+        e = m.end() - (len(seg) - len(seg.rstrip()))
+        if e > s:
+            spans.append((s, e))
+    return spans
+
+
+def sentence_spans(text: str) -> List[Span]:
+    return _trimmed_spans(text or "", _SENTENCE)
+
+
+def paragraph_spans(text: str) -> List[Span]:
+    return _trimmed_spans(text or "", _PARAGRAPH)
 
 
 def split_sentences(text: str) -> List[str]:
     # naive sentence split for CN/EN punctuation
-    if not text:
+    return [text[s:e] for s, e in sentence_spans(text)]
+
+
+def _fit_prefix(text: str, s: int, e: int, budget: int, token_len: TokenLen) -> int:
+    """Largest end in (s, e] with token_len(text[s:end]) <= budget (at least one char)."""
+    lo, hi = s + 1, e
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if token_len(text[s:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _overlap_start(text: str, start: int, end: int, overlap: int) -> int:
+    o = max(start, end - overlap)
+    while o < end and text[o].isspace():
+        o += 1
+    return o
+
+
+def chunk_spans(
+    text: str,
+    spans: List[Span],
+    max_chars: int = 400,
+    overlap: int = 50,
+    max_tokens: Optional[int] = None,
+    token_len: Optional[TokenLen] = None,
+) -> List[Span]:
+    """Pack segment spans into windows over `text`, returned as (start, end) offsets.
+
+    Char mode: a window grows while its slice fits max_chars (a single oversized
+    segment still becomes its own chunk). Token mode (max_tokens set): segment
+    token counts are summed, each emitted window is checked against the exact
+    counter and cut to fit, so no chunk exceeds the embedding window.
+    Consecutive windows share the last `overlap` chars of the previous one.
+    """
+    if not spans:
         return []
-    seps = set("。！？!?\n")
-    buf: List[str] = []
-    cur = []
-    for ch in text:
-        cur.append(ch)
-        if ch in seps:
-            buf.append("".join(cur).strip())
-            cur = []
-    if cur:
-        buf.append("".join(cur).strip())
-    return [s for s in buf if s]
+    out: List[Span] = []
+
+    if not max_tokens:
+        ws, we = spans[0]
+        for s, e in spans[1:]:
+            if e - ws <= max_chars:
+                we = e
+                continue
+            out.append((ws, we))
+            ws = _overlap_start(text, ws, we, overlap) if overlap > 0 else s
+            we = e
+        out.append((ws, we))
+        return out
+
+    tl = token_len or approx_token_len
+    budget = max(1, int(max_tokens))
+    # split segments that alone exceed the budget
+    pieces: List[Tuple[int, int, int]] = []
+    for s, e in spans:
+        n = tl(text[s:e])
+        while n > budget and e - s > 1:
+            cut = _fit_prefix(text, s, e, budget, tl)
+            pieces.append((s, cut, tl(text[s:cut])))
+            s = cut
+            n = tl(text[s:e])
+        pieces.append((s, e, n))
+
+    def emit(ws: int, we: int) -> int:
+        # the sum of segment counts is an estimate; cut on the exact count
+        while tl(text[ws:we]) > budget:
+            cut = _fit_prefix(text, ws, we, budget, tl)
+            out.append((ws, cut))
+            ws = cut
+        if ws < we:
+            out.append((ws, we))
+        return we
+
+    ws, we, used = pieces[0]
+    for s, e, n in pieces[1:]:
+        if used + n <= budget:
+            we, used = e, used + n
+            continue
+        emit(ws, we)
+        ov = _overlap_start(text, ws, we, overlap) if overlap > 0 else s
+        ov_n = tl(text[ov:we]) if ov < we else 0
+        if ov_n + n > budget:
+            ov, ov_n = s, 0
+        ws, we, used = ov, e, ov_n + n
+    emit(ws, we)
+    return out
 
 
 def chunk_document(
@@ -24,36 +153,18 @@ def chunk_document(
     strategy: str = "sentence",
     max_chars: int = 400,
     overlap: int = 50,
+    max_tokens: Optional[int] = None,
+    token_len: Optional[TokenLen] = None,
 ) -> List[Dict[str, Any]]:
     if not text:
         return []
     if strategy == "paragraph":
-        parts = [p.strip() for p in text.split("\n\n") if p.strip()]
+        spans = paragraph_spans(text)
     else:
-        parts = split_sentences(text)
+        spans = sentence_spans(text)
 
-    # pack into windows up to max_chars with overlap
     chunks: List[Dict[str, Any]] = []
-    buf: List[str] = []
-    buf_len = 0
-    idx = 0
-    for sent in parts:
-        if buf_len + len(sent) <= max_chars or not buf:
-            buf.append(sent)
-            buf_len += len(sent)
-        else:
-            text_chunk = "".join(buf).strip()
-            if text_chunk:
-                chunks.append({"doc_id": doc_id, "chunk_id": idx, "text": text_chunk})
-                idx += 1
-            # overlap: keep tail of buffer
-            tail = text_chunk[-overlap:] if overlap > 0 else ""
-            buf = [tail, sent] if tail else [sent]
-            buf_len = len("".join(buf))
-    if buf:
-        text_chunk = "".join(buf).strip()
-        if text_chunk:
-            chunks.append({"doc_id": doc_id, "chunk_id": idx, "text": text_chunk})
+    windows = chunk_spans(text, spans, max_chars=max_chars, overlap=overlap, max_tokens=max_tokens, token_len=token_len)
+    for idx, (s, e) in enumerate(windows):
+        chunks.append({"doc_id": doc_id, "chunk_id": idx, "text": text[s:e], "start": s, "end": e})
     return chunks
-
-
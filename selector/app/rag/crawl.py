@@ -1,9 +1,15 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import asyncio
+import os
 import re
+import signal
+from concurrent.futures.process import BrokenProcessPool
 import httpx
 from bs4 import BeautifulSoup
 from readability import Document
 
+from .pool import pool_size, get_process_pool, discard_pool
+
 
 def _clean_html(html: str) -> str:
     doc = Document(html)
@@ -17,18 +23,113 @@ def _clean_html(html: str) -> str:
     return text.strip()
 
 
-async def fetch_and_extract(urls: List[str], source: str = "web") -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
+class _ExtractTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise _ExtractTimeout()
+
+
+def _clean_html_limited(html: str, timeout_s: float) -> str:
+    """Run in a pool worker: enforce the per-document limit inside the child so a
+    pathological page frees its worker instead of occupying it forever."""
+    if timeout_s <= 0 or not hasattr(signal, "setitimer"):
+        return _clean_html(html)
+    prev = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout_s)
+    try:
+        return _clean_html(html)
+    except Exception:
+        # readability re-wraps errors raised mid-parse, so check the timer
+        # rather than the exception type
+        if signal.getitimer(signal.ITIMER_REAL)[0] == 0:
+            return ""
+        raise
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev)
+
+
+def extract_timeout_s() -> float:
+    try:
+        return float(os.getenv("CRAWL_EXTRACT_TIMEOUT_S", "10"))
+    except ValueError:
+        return 10.0
+
+
+async def _run_limited(pool: Any, html: str, limit: float) -> str:
+    cf = pool.submit(_clean_html_limited, html, limit)
+    fut = asyncio.wrap_future(cf)
+    if limit <= 0:
+        return await fut
+    # the deadline starts once the page leaves the executor queue, so waiting
+    # behind other pages does not count; a started task can still sit in the
+    # call queue behind one page per worker, itself bounded by the in-worker alarm
+    while not cf.running() and not cf.done():
+        await asyncio.wait({fut}, timeout=0.05)
+    done, _ = await asyncio.wait({fut}, timeout=2 * limit + 5.0)
+    if done:
+        return fut.result()
+    # the child ignored its alarm (stuck in C code): kill the pool's workers;
+    # other pages in flight there fail with BrokenProcessPool and are resubmitted
+    discard_pool("crawl", pool, terminate=True)
+    return ""
+
+
+async def extract_text(html: str, workers: Optional[int] = None, timeout_s: Optional[float] = None) -> str:
+    """Extract readable text off the event loop.
+
+    Uses the shared "crawl" process pool (CRAWL_EXTRACT_WORKERS, 0 = worker thread)
+    with a per-document time limit (CRAWL_EXTRACT_TIMEOUT_S) on execution time
+    only; a timed-out page yields "". With 0 workers the limit bounds the wait.
+    """
+    n = pool_size("CRAWL_EXTRACT_WORKERS") if workers is None else max(0, workers)
+    limit = extract_timeout_s() if timeout_s is None else timeout_s
+    if n == 0:
+        if limit <= 0:
+            return await asyncio.to_thread(_clean_html, html)
+        # a thread cannot be stopped: the caller stops waiting and the page's
+        # thread finishes (or not) on its own
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(_clean_html, html), limit)
+        except asyncio.TimeoutError:
+            return ""
+    for attempt in range(2):
+        try:
+            return await _run_limited(get_process_pool("crawl", n), html, limit)
+        except RuntimeError as e:
+            # the pool was recycled under us (a hung page elsewhere): retry once
+            # on a fresh one. BrokenProcessPool is a RuntimeError, as is submit()
+            # racing the shutdown
+            if attempt or not (isinstance(e, BrokenProcessPool) or "shutdown" in str(e)):
+                raise
+    raise AssertionError("unreachable")
+
+
+async def fetch_and_extract(
+    urls: List[str],
+    source: str = "web",
+    workers: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    # Fetch sequentially but hand each page to the extraction pool immediately,
+    # so parsing of earlier pages overlaps with downloading later ones.
+    pending: List[tuple[str, asyncio.Task]] = []
     async with httpx.AsyncClient(timeout=30, headers={"User-Agent": "ict-selection-assistant/1.0"}) as client:
         for u in urls:
             try:
                 r = await client.get(u)
                 r.raise_for_status()
-                text = _clean_html(r.text)
-                if text:
-                    out.append({"id": u, "text": text, "meta": {"source": source, "url": u}})
             except Exception:
                 continue
+            pending.append((u, asyncio.ensure_future(extract_text(r.text, workers=workers, timeout_s=timeout_s))))
+    out: List[Dict[str, Any]] = []
+    for u, task in pending:
+        try:
+            text = await task
+        except Exception:
+            continue
+        if text:
+            out.append({"id": u, "text": text, "meta": {"source": source, "url": u}})
     return out
-
-
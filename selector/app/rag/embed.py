@@ -1,30 +1,117 @@
 # Placeholder for embedding and retrieval integration
 from typing import List, Sequence, Dict, Any
+import base64
 import os
+import re
 import httpx
 import hashlib
-import math
-
-
-def _fake_embed(texts: Sequence[str], dim: int = 384) -> List[List[float]]:
-    vecs: List[List[float]] = []
-    for t in texts:
-        h = hashlib.sha256(t.encode("utf-8")).digest()
-        # repeat bytes to reach dim
-        arr = []
-        while len(arr) < dim:
-            for b in h:
-                arr.append((b / 255.0) * 2 - 1)
-                if len(arr) >= dim:
-                    break
-        # L2 normalize
-        norm = math.sqrt(sum(x * x for x in arr)) or 1.0
-        vecs.append([x / norm for x in arr])
-    return vecs
+
+import numpy as np
+import orjson
+
+
+_WS = re.compile(r"\s+")
+
+
+def fake_dim() -> int:
+    """Dimension of the offline embedders; set FAKE_EMBED_DIM to match the real provider."""
+    try:
+        return int(os.getenv("FAKE_EMBED_DIM", "384"))
+    except ValueError:
+        return 384
+
+
+def _fake_embed(texts: Sequence[str], dim: int | None = None) -> np.ndarray:
+    """Deterministic sha256-derived unit vectors, as a (len(texts), dim) float32 matrix.
+
+    Carries no semantics; identical texts map to identical vectors.
+    """
+    dim = dim or fake_dim()
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    digests = np.frombuffer(b"".join(hashlib.sha256(t.encode("utf-8")).digest() for t in texts), dtype=np.uint8)
+    # repeat the 32 digest bytes to reach dim
+    reps = -(-dim // 32)
+    arr = np.tile(digests.reshape(len(texts), 32), (1, reps))[:, :dim] / 255.0 * 2 - 1
+    # L2 normalize
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (arr / norms).astype(np.float32)
+
+
+def _ngram_hashes(text: str, n: int) -> np.ndarray:
+    cps = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if cps.size < n:
+        return np.zeros(0, dtype=np.uint64)
+    m = cps.size - n + 1
+    h = np.full(m, np.uint64(n), dtype=np.uint64)
+    for j in range(n):
+        h = h * np.uint64(0x100000001B3) + cps[j:j + m]
+    return h
+
+
+def _hash_embed(texts: Sequence[str], dim: int | None = None, ngrams: Sequence[int] = (1, 2, 3)) -> np.ndarray:
+    """Hashing-trick embedding over character 1-3 grams (CJK and Latin alike).
+
+    Each n-gram lands in one of `dim` signed buckets, counts are log-damped and
+    rows L2-normalized, so cosine similarity tracks lexical overlap — good enough
+    for meaningful offline retrieval benchmarks without a model.
+    """
+    dim = dim or fake_dim()
+    rows: List[np.ndarray] = []
+    feats: List[np.ndarray] = []
+    for i, t in enumerate(texts):
+        norm = _WS.sub(" ", (t or "").lower()).strip()
+        for n in ngrams:
+            h = _ngram_hashes(norm, n)
+            feats.append(h)
+            rows.append(np.full(h.size, i, dtype=np.int64))
+    mat = np.zeros((len(texts), dim), dtype=np.float64)
+    if feats:
+        h = np.concatenate(feats)
+        r = np.concatenate(rows)
+        # splitmix64 finalizer so buckets and signs are well mixed
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+        bucket = (h % np.uint64(dim)).astype(np.int64)
+        sign = np.where(h >> np.uint64(63), -1.0, 1.0)
+        mat = np.bincount(r * dim + bucket, weights=sign, minlength=len(texts) * dim).reshape(len(texts), dim)
+        mat = np.sign(mat) * np.log1p(np.abs(mat))
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (mat / norms).astype(np.float32)
+
+
+def _offline_embed(texts: Sequence[str], provider: str) -> Dict[str, Any]:
+    if provider == "hash":
+        vecs = _hash_embed(texts)
+    else:
+        provider = "fake"
+        vecs = _fake_embed(texts)
+    return {"vectors": vecs, "dim": vecs.shape[1] if len(vecs) else 0, "provider": provider, "model": None}
+
+
+def _to_matrix(items: Sequence[Any]) -> np.ndarray:
+    """Stack embeddings (float lists or base64 little-endian float32) into a float32 matrix."""
+    if not items:
+        return np.zeros((0, 0), dtype=np.float32)
+    if isinstance(items[0], str):
+        return np.vstack([np.frombuffer(base64.b64decode(e), dtype="<f4") for e in items]).astype(np.float32, copy=False)
+    return np.asarray(items, dtype=np.float32)
+
+
+def _result(vecs: np.ndarray, provider: str, model: str) -> Dict[str, Any]:
+    return {"vectors": vecs, "dim": vecs.shape[1] if vecs.ndim == 2 and len(vecs) else 0, "provider": provider, "model": model}
 
 
 async def embed_texts(texts: Sequence[str], provider: str = "auto", model: str | None = None) -> Dict[str, Any]:
+    """Returns {"vectors": float32 ndarray (n, dim), "dim", "provider", "model"} (the resolved ones)."""
     provider = (provider or "auto").lower()
+    if provider in ("fake", "hash"):
+        return _offline_embed(texts, provider)
     if provider in ("auto", "openai"):
         key = os.getenv("OPENAI_API_KEY")
         base = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
@@ -35,12 +122,13 @@ async def embed_texts(texts: Sequence[str], provider: str = "auto", model: str |
                     r = await client.post(
                         f"{base}/embeddings",
                         headers={"Authorization": f"Bearer {key}"},
-                        json={"model": mdl, "input": list(texts)},
+                        # base64 float32 is ~4x smaller on the wire than JSON floats
+                        json={"model": mdl, "input": list(texts), "encoding_format": "base64"},
                     )
                     if r.status_code < 400:
-                        data = r.json()
-                        vecs = [d["embedding"] for d in data.get("data", [])]
-                        return {"vectors": vecs, "dim": len(vecs[0]) if vecs else 0, "provider": "openai"}
+                        data = orjson.loads(r.content)
+                        vecs = _to_matrix([d["embedding"] for d in data.get("data", [])])
+                        return _result(vecs, "openai", mdl)
             except Exception:
                 pass
     if provider in ("auto", "qwen"):
@@ -56,9 +144,9 @@ async def embed_texts(texts: Sequence[str], provider: str = "auto", model: str |
                         json={"model": mdl, "input": list(texts)},
                     )
                     if r.status_code < 400:
-                        data = r.json()
-                        vecs = [d["embedding"] for d in data.get("data", [])]
-                        return {"vectors": vecs, "dim": len(vecs[0]) if vecs else 0, "provider": "qwen"}
+                        data = orjson.loads(r.content)
+                        vecs = _to_matrix([d["embedding"] for d in data.get("data", [])])
+                        return _result(vecs, "qwen", mdl)
             except Exception:
                 pass
     if provider in ("auto", "ollama"):
@@ -71,14 +159,13 @@ async def embed_texts(texts: Sequence[str], provider: str = "auto", model: str |
                     json={"model": mdl, "input": list(texts)},
                 )
                 if r.status_code < 400:
-                    data = r.json()
+                    data = orjson.loads(r.content)
                     # Ollama returns {'embeddings': [[...], [...]]}
                     vecs = data.get("embeddings") or data.get("data")
                     if vecs:
-                        return {"vectors": vecs, "dim": len(vecs[0]) if vecs else 0, "provider": "ollama"}
+                        return _result(_to_matrix(vecs), "ollama", mdl)
         except Exception:
             pass
-    # Fallback
-    vecs = _fake_embed(texts)
-    return {"vectors": vecs, "dim": len(vecs[0]) if vecs else 0, "provider": "fake"}
+    # Fallback: EMBED_FALLBACK=hash gives lexically meaningful offline vectors
+    return _offline_embed(texts, provider if provider == "hash" else os.getenv("EMBED_FALLBACK", "fake").lower())
 
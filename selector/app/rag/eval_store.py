@@ -0,0 +1,282 @@
+from typing import Any, Dict, Iterator, List, Optional, Set
+import csv
+import glob
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+CSV_HEADER = ["query", "relevant_ids", "hit_ids", "recall@k", "precision@k", "latency_ms"]
+_WEEK = 7 * 86400.0
+
+
+def eval_out_dir() -> str:
+    path = os.getenv("EVAL_OUT_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "eval_out"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _std(values: List[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    m = sum(values) / len(values)
+    return math.sqrt(sum((v - m) ** 2 for v in values) / (len(values) - 1))
+
+
+def _ci95(mean: Optional[float], std: Optional[float], n: int) -> Optional[List[float]]:
+    if mean is None or std is None or n <= 0:
+        return None
+    half = 1.96 * std / math.sqrt(n)
+    return [round(max(0.0, mean - half), 4), round(min(1.0, mean + half), 4)]
+
+
+class EvalStore:
+    """Append-only history of retrieval evaluations (SQLite).
+
+    runs:    one row per evaluation with its summary metrics, indexed on
+             (collection, created_at) so listings and 7-day trends are index scans
+    results: the per-query rows of each run, for the CSV export
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+        # sqlite3 connections must not be shared between threads (request
+        # threadpool, to_thread writers), so each thread gets its own
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ready: Set[str] = set()
+
+    @property
+    def path(self) -> str:
+        return self._path or os.getenv("EVAL_DB") or os.path.join(eval_out_dir(), "evals.sqlite")
+
+    def _connect(self, path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _db(self) -> sqlite3.Connection:
+        """The calling thread's connection (schema created on first use)."""
+        path = self.path
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.path != path:
+            if conn is not None:
+                conn.close()
+            conn = self._connect(path)
+            self._local.conn, self._local.path = conn, path
+        if path not in self._ready:
+            self._init_schema(conn, path)
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection, path: str) -> None:
+        with self._lock:
+            if path in self._ready:
+                return
+            fresh = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='runs'").fetchone() is None
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS runs ("
+                    "run_id TEXT PRIMARY KEY, collection TEXT, created_at REAL, topk INTEGER, provider TEXT, model TEXT, "
+                    "n INTEGER, recall REAL, precision REAL, latency_p95 REAL, latency_avg REAL, "
+                    "recall_std REAL, precision_std REAL, search_params TEXT)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_collection_time ON runs(collection, created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_time ON runs(created_at)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "run_id TEXT, seq INTEGER, query TEXT, relevant_ids TEXT, hit_ids TEXT, "
+                    "recall REAL, precision REAL, latency_ms REAL, PRIMARY KEY (run_id, seq))"
+                )
+            self._ready.add(path)
+            if fresh:
+                self._import_legacy_csv(os.path.dirname(path))
+
+    def close(self) -> None:
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def record_run(
+        self,
+        collection: str,
+        out: Dict[str, Any],
+        topk: Optional[int] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> str:
+        """Append an evaluate_retrieval() result; returns the new run id."""
+        run_id = uuid.uuid4().hex
+        results = out.get("results") or []
+        s = out.get("summary") or {}
+        recalls = [float(r.get("recall@k") or 0.0) for r in results]
+        precisions = [float(r.get("precision@k") or 0.0) for r in results]
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, collection, created_at or time.time(), topk, provider, model, len(results),
+                    s.get("Recall@k"), s.get("Precision@k"), s.get("Latency P95 (ms)"), s.get("Latency Avg (ms)"),
+                    _std(recalls), _std(precisions),
+                    json.dumps(s.get("search_params")) if s.get("search_params") else None,
+                ),
+            )
+            db.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id, i, r.get("query"),
+                        json.dumps([str(x) for x in r.get("relevant_ids", [])], ensure_ascii=False),
+                        json.dumps([str(x) for x in r.get("hit_ids", [])], ensure_ascii=False),
+                        r.get("recall@k"), r.get("precision@k"), r.get("latency_ms"),
+                    )
+                    for i, r in enumerate(results)
+                ],
+            )
+        return run_id
+
+    def _summary(self, row: sqlite3.Row) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "Recall@k": row["recall"],
+            "Precision@k": row["precision"],
+            "Latency P95 (ms)": row["latency_p95"],
+        }
+        if row["latency_avg"] is not None:
+            summary["Latency Avg (ms)"] = row["latency_avg"]
+        if row["search_params"]:
+            summary["search_params"] = json.loads(row["search_params"])
+        return summary
+
+    def _trend_7d(self, collection: str, now: float) -> Dict[str, Optional[float]]:
+        """Mean of the last 7 days minus the mean of the 7 days before (week over week)."""
+        db = self._db()
+        row = db.execute(
+            "SELECT "
+            "AVG(CASE WHEN created_at >= ? THEN recall END), AVG(CASE WHEN created_at < ? THEN recall END), "
+            "AVG(CASE WHEN created_at >= ? THEN precision END), AVG(CASE WHEN created_at < ? THEN precision END), "
+            "AVG(CASE WHEN created_at >= ? THEN latency_p95 END), AVG(CASE WHEN created_at < ? THEN latency_p95 END) "
+            "FROM runs WHERE collection = ? AND created_at >= ?",
+            (now - _WEEK, now - _WEEK) * 3 + (collection, now - 2 * _WEEK),
+        ).fetchone()
+
+        def delta(cur: Optional[float], prev: Optional[float]) -> Optional[float]:
+            return round(cur - prev, 4) if cur is not None and prev is not None else None
+
+        return {
+            "Recall@k": delta(row[0], row[1]),
+            "Precision@k": delta(row[2], row[3]),
+            "Latency P95 (ms)": delta(row[4], row[5]),
+        }
+
+    def latest(self, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent run per collection with its summary, trend_7d and conf_int."""
+        db = self._db()
+        q = (
+            "SELECT r.* FROM runs r JOIN ("
+            "  SELECT collection, MAX(created_at) AS t FROM runs {where} GROUP BY collection"
+            ") m ON r.collection = m.collection AND r.created_at = m.t ORDER BY r.collection"
+        )
+        rows = db.execute(q.format(where="WHERE collection = ?"), (collection,)).fetchall() if collection else db.execute(q.format(where="")).fetchall()
+        now = time.time()
+        out = []
+        for row in rows:
+            out.append({
+                "collection": row["collection"],
+                "run_id": row["run_id"],
+                "created_at": row["created_at"],
+                "n": row["n"],
+                "summary": self._summary(row),
+                "trend_7d": self._trend_7d(row["collection"], now),
+                "conf_int": {
+                    "Recall@k": _ci95(row["recall"], row["recall_std"], row["n"]),
+                    "Precision@k": _ci95(row["precision"], row["precision_std"], row["n"]),
+                },
+            })
+        return out
+
+    def history(self, collection: str, limit: int = 50) -> List[Dict[str, Any]]:
+        rows = self._db().execute(
+            "SELECT * FROM runs WHERE collection = ? ORDER BY created_at DESC LIMIT ?", (collection, limit)
+        ).fetchall()
+        return [{"run_id": r["run_id"], "created_at": r["created_at"], "n": r["n"], "summary": self._summary(r)} for r in rows]
+
+    def run_for(self, collection: str, run_id: Optional[str] = None) -> Optional[str]:
+        db = self._db()
+        if run_id:
+            row = db.execute("SELECT run_id FROM runs WHERE run_id = ? AND collection = ?", (run_id, collection)).fetchone()
+        else:
+            row = db.execute("SELECT run_id FROM runs WHERE collection = ? ORDER BY created_at DESC LIMIT 1", (collection,)).fetchone()
+        return row[0] if row else None
+
+    def iter_csv(self, run_id: str, batch: int = 500) -> Iterator[str]:
+        """The run in the legacy {collection}_eval.csv layout, streamed in row batches.
+
+        Uses a connection of its own: a streaming response resumes the generator
+        on whichever worker thread is free, and the cursor stays open between batches.
+        """
+        self._db()
+        db = self._connect(self.path, check_same_thread=False)
+        try:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(CSV_HEADER)
+            cur = db.execute(
+                "SELECT query, relevant_ids, hit_ids, recall, precision, latency_ms FROM results WHERE run_id = ? ORDER BY seq",
+                (run_id,),
+            )
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                for q, rel, hits, rec, prec, lat in rows:
+                    writer.writerow([q, ",".join(json.loads(rel)), ",".join(json.loads(hits)), rec, prec, lat])
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            s = db.execute("SELECT recall, precision, latency_p95 FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            writer.writerow(["SUMMARY", "", "", *(tuple(s) if s else ("", "", ""))])
+            yield buf.getvalue()
+        finally:
+            db.close()
+
+    def _import_legacy_csv(self, out_dir: str) -> None:
+        """One-time import of {collection}_eval.csv files written before the store existed."""
+        for path in glob.glob(os.path.join(out_dir, "*_eval.csv")):
+            try:
+                with open(path, newline="", encoding="utf-8") as f:
+                    rows = list(csv.reader(f))
+            except Exception:
+                continue
+            results: List[Dict[str, Any]] = []
+            summary: Dict[str, Any] = {}
+            for r in rows[1:]:
+                if len(r) < 6:
+                    continue
+                if r[0] == "SUMMARY":
+                    summary = {
+                        "Recall@k": float(r[3]) if r[3] else None,
+                        "Precision@k": float(r[4]) if r[4] else None,
+                        "Latency P95 (ms)": float(r[5]) if r[5] else None,
+                    }
+                    continue
+                results.append({
+                    "query": r[0],
+                    "relevant_ids": [x for x in r[1].split(",") if x],
+                    "hit_ids": [x for x in r[2].split(",") if x],
+                    "recall@k": float(r[3] or 0),
+                    "precision@k": float(r[4] or 0),
+                    "latency_ms": float(r[5] or 0),
+                })
+            collection = os.path.basename(path)[: -len("_eval.csv")]
+            self.record_run(collection, {"summary": summary, "results": results}, created_at=os.path.getmtime(path))
+
+
+eval_store = EvalStore()
@@ -2,7 +2,7 @@ from typing import List, Dict, Any, Tuple
 import time
 
 from .embed import embed_texts
-from .indexer import Qdrant
+from .indexer import Qdrant, payload_selector
 
 
 async def evaluate_retrieval(
@@ -11,12 +11,30 @@ async def evaluate_retrieval(
     provider: str = "auto",
     model: str | None = None,
     topk: int = 5,
+    search_params: Dict[str, Any] | None = None,
+    cache: Any = None,
+    cache_key: str | None = None,
+    cache_variant: str = "",
+    cache_threshold: float | None = None,
 ) -> Dict[str, Any]:
+    """Recall/precision@k of plain vector search over labelled samples.
+
+    With a semantic `cache`, each sample is also matched against the cached
+    queries of `cache_key` under `cache_variant`, the variant of a search
+    request doing this same plain vector search; where the nearest one reaches
+    the threshold, the cached hit ids are scored too, giving the hit rate on
+    these samples and the recall a cache-served answer would have had.
+    """
     qdr = Qdrant()
+    # only the ids are scored; leave chunk text on the server
+    with_payload = payload_selector(include=["id", "doc_id"])
     total_recall = 0.0
     total_precision = 0.0
     latencies_ms: List[float] = []
     results: List[Dict[str, Any]] = []
+    threshold = cache_threshold if cache_threshold is not None else getattr(cache, "threshold", 1.0)
+    served: List[Tuple[float, float, float]] = []  # (fresh recall, cached recall, overlap@k)
+    recall_with_cache = 0.0
 
     for s in samples:
         query = s.get("query", "")
@@ -24,7 +42,7 @@ async def evaluate_retrieval(
         t0 = time.time()
         emb = await embed_texts([query], provider=provider, model=model)
         vec = emb.get("vectors", [[0.0]])[0]
-        out = await qdr.search(collection, vec, topk)
+        out = await qdr.search(collection, vec, topk, params=search_params, with_payload=with_payload)
         latency_ms = (time.time() - t0) * 1000.0
         latencies_ms.append(latency_ms)
 
@@ -45,14 +63,26 @@ async def evaluate_retrieval(
         total_recall += recall
         total_precision += precision
 
-        results.append({
+        row = {
             "query": query,
             "relevant_ids": list(relevant_ids),
             "hit_ids": hit_ids,
             "recall@k": round(recall, 4),
             "precision@k": round(precision, 4),
             "latency_ms": round(latency_ms, 2),
-        })
+        }
+        if cache is not None:
+            near = cache.nearest(cache_key or collection, cache_variant, vec)
+            row["cache_similarity"] = near["similarity"] if near else None
+            if near and near["similarity"] >= threshold:
+                cached_k = set(near["ids"][:topk])
+                cached_recall = len(cached_k & set(map(str, relevant_ids))) / max(1, len(relevant_ids))
+                overlap = len(cached_k & retrieved_k) / max(1, len(retrieved_k))
+                served.append((recall, cached_recall, overlap))
+                row.update({"cache_query": near["query"], "cached_recall@k": round(cached_recall, 4), "cache_overlap@k": round(overlap, 4)})
+                recall = cached_recall
+            recall_with_cache += recall
+        results.append(row)
 
     n = max(1, len(samples))
     summary = {
@@ -61,6 +91,21 @@ async def evaluate_retrieval(
         "Latency P95 (ms)": round(sorted(latencies_ms)[int(0.95 * (n - 1))], 2) if latencies_ms else 0.0,
         "Latency Avg (ms)": round(sum(latencies_ms) / n, 2) if latencies_ms else 0.0,
     }
-    return {"summary": summary, "results": results}
+    if search_params:
+        summary["search_params"] = search_params
+    out: Dict[str, Any] = {"summary": summary, "results": results}
+    if cache is not None:
+        m = max(1, len(served))
+        out["semantic_cache"] = {
+            "threshold": threshold,
+            "served": len(served),
+            "sample_hit_rate": round(len(served) / n, 4),
+            "Recall@k": summary["Recall@k"],
+            "Recall@k with cache": round(recall_with_cache / n, 4),
+            "served Recall@k fresh": round(sum(r[0] for r in served) / m, 4) if served else None,
+            "served Recall@k cached": round(sum(r[1] for r in served) / m, 4) if served else None,
+            "served overlap@k": round(sum(r[2] for r in served) / m, 4) if served else None,
+        }
+    return out
 
 
@@ -0,0 +1,46 @@
+from typing import Any, Awaitable, Dict, List, Mapping
+from itertools import islice
+from operator import itemgetter
+import asyncio
+import heapq
+import time
+
+
+def rank_score(hit: Dict[str, Any]) -> float:
+    """The score a collection's result list is ordered by (fused when BM25 fusion ran)."""
+    return float(hit.get("combo_score", hit.get("score")) or 0.0)
+
+
+async def gather_within(tasks: Mapping[str, Awaitable[Any]], timeout_s: float) -> Dict[str, Dict[str, Any]]:
+    """Await all tasks concurrently, each bounded by timeout_s.
+
+    Returns name -> {"result", "ms"} | {"timeout": True, "ms"} | {"error", "ms"};
+    the whole call takes at most about timeout_s.
+    """
+    async def run(name: str, aw: Awaitable[Any]) -> tuple:
+        t = time.perf_counter()
+        try:
+            out: Dict[str, Any] = {"result": await asyncio.wait_for(aw, timeout_s)}
+        except asyncio.TimeoutError:
+            out = {"timeout": True}
+        except Exception as e:
+            out = {"error": f"{type(e).__name__}: {e}"}
+        out["ms"] = round((time.perf_counter() - t) * 1000, 1)
+        return name, out
+
+    return dict(await asyncio.gather(*(run(n, aw) for n, aw in tasks.items())))
+
+
+def merge_ranked(ranked: Mapping[str, List[Dict[str, Any]]], weights: Mapping[str, float], limit: int) -> List[Dict[str, Any]]:
+    """k-way heap merge of per-collection hit lists (each best-first) by weighted score.
+
+    Hits are copied with `collection` and `weighted_score` added; a weight <= 0
+    leaves that collection out.
+    """
+    streams = []
+    for name, hits in ranked.items():
+        w = float(weights.get(name, 1.0))
+        if w <= 0 or not hits:
+            continue
+        streams.append([dict(h, collection=name, weighted_score=w * rank_score(h)) for h in hits])
+    return list(islice(heapq.merge(*streams, key=itemgetter("weighted_score"), reverse=True), limit))
@@ -0,0 +1,121 @@
+from typing import Any, Dict, Iterable, List, Optional
+import json
+import os
+import sqlite3
+import time
+
+from .state import collection_path
+
+
+class FingerprintStore:
+    """Persistent per-collection record of what has been embedded.
+
+    docs:   doc_id -> document fingerprint (sha256 of normalized text)
+    chunks: point_id -> (doc_id, chunk key "doc_id::chunk_id", chunk fingerprint)
+    meta:   embedding provider/model/dim the vectors were made with, and the
+            content_version token of the last run that changed points
+
+    `rag_index` compares freshly chunked content against this to embed only new
+    or changed chunks and to delete points for chunks that disappeared.
+    """
+
+    def __init__(self, collection: str, base_dir: Optional[str] = None) -> None:
+        self.collection = collection
+        self.path = collection_path(collection, ".fp.sqlite", base_dir)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, fp TEXT, n_chunks INTEGER, updated_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS chunks (point_id INTEGER PRIMARY KEY, doc_id TEXT, key TEXT, fp TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def chunks_for_docs(self, doc_ids: Iterable[str]) -> Dict[str, Dict[int, str]]:
+        out: Dict[str, Dict[int, str]] = {}
+        ids = list(dict.fromkeys(doc_ids))
+        db = self._db()
+        # stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            q = f"SELECT doc_id, point_id, fp FROM chunks WHERE doc_id IN ({','.join('?' * len(part))})"
+            for doc_id, point_id, fp in db.execute(q, part):
+                out.setdefault(doc_id, {})[int(point_id)] = fp
+        return out
+
+    def record_docs(self, docs: Dict[str, tuple]) -> None:
+        """docs: doc_id -> (fp, n_chunks)."""
+        now = time.time()
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO docs (doc_id, fp, n_chunks, updated_at) VALUES (?, ?, ?, ?)",
+                [(d, fp, n, now) for d, (fp, n) in docs.items()],
+            )
+
+    def keys_for(self, point_ids: List[int]) -> List[str]:
+        db = self._db()
+        out: List[str] = []
+        for i in range(0, len(point_ids), 500):
+            part = point_ids[i:i + 500]
+            q = f"SELECT key FROM chunks WHERE point_id IN ({','.join('?' * len(part))})"
+            out += [k for (k,) in db.execute(q, part)]
+        return out
+
+    def record_chunks(self, rows: List[tuple]) -> None:
+        """rows: (point_id, doc_id, key, chunk_fp) for chunks now present in the collection."""
+        with self._db() as db:
+            db.executemany("INSERT OR REPLACE INTO chunks (point_id, doc_id, key, fp) VALUES (?, ?, ?, ?)", rows)
+
+    def forget_chunks(self, point_ids: List[int]) -> None:
+        with self._db() as db:
+            db.executemany("DELETE FROM chunks WHERE point_id = ?", [(p,) for p in point_ids])
+
+    def forget_docs(self, doc_ids: Iterable[str]) -> None:
+        with self._db() as db:
+            db.executemany("DELETE FROM docs WHERE doc_id = ?", [(d,) for d in doc_ids])
+
+    def set_meta(self, **values: Any) -> None:
+        with self._db() as db:
+            db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, json.dumps(v)) for k, v in values.items()])
+
+    def meta(self) -> Dict[str, Any]:
+        return {k: json.loads(v) for k, v in self._db().execute("SELECT key, value FROM meta")}
+
+    def backup(self, dest: str) -> None:
+        """Consistent copy of the database to `dest` (SQLite online backup)."""
+        with sqlite3.connect(dest) as out:
+            self._db().backup(out)
+        out.close()
+
+    def counts(self) -> Dict[str, int]:
+        db = self._db()
+        return {
+            "docs": db.execute("SELECT COUNT(*) FROM docs").fetchone()[0],
+            "chunks": db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+        }
+
+    def drop(self) -> None:
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def content_version(collection: str) -> Optional[str]:
+    """Token of the last index run that changed `collection`'s points (None if never indexed)."""
+    store = FingerprintStore(collection)
+    try:
+        return store.meta().get("content_version") if os.path.exists(store.path) else None
+    finally:
+        store.close()
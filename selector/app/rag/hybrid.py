@@ -1,17 +1,22 @@
 from typing import List, Dict, Any, Tuple, DefaultDict
+import os
 import re
+import threading
 from rank_bm25 import BM25Okapi
 from collections import defaultdict
 
+from .chunk_store import chunk_store
+
 
 def tokenize(text: str) -> List[str]:
     return [t for t in re.split(r"\W+", (text or "").lower()) if t]
 
 
 class InMemoryBM25:
-    def __init__(self, docs: List[Dict[str, Any]]):
+    def __init__(self, docs: List[Dict[str, Any]], keep_text: bool = True):
         corpus = [tokenize(d.get("text", "")) for d in docs]
-        self.docs = docs
+        # without keep_text only ids are retained; text lives in the chunk store
+        self.docs = docs if keep_text else [{"id": d.get("id")} for d in docs]
         self.bm25 = BM25Okapi(corpus)
 
     def search(self, query: str, topk: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
@@ -50,24 +55,84 @@ def fuse_scores(vec_hits: List[Dict[str, Any]], bm25_hits: List[Tuple[float, Dic
 
 
 class BM25Registry:
-    """Process-wide simple registry of BM25 indices per collection."""
+    """Process-wide registry of BM25 indices per collection.
+
+    Only chunk ids and the BM25 term statistics stay in memory; rebuilding after
+    a change reads the unchanged chunks' text back from the collection's chunk
+    store, which also seeds the index on the first search after a restart.
+    Hits carry {"id"} only; fetch their text from the chunk store.
+    Every method reads disk on a cold collection: call them off the event loop.
+    """
 
     def __init__(self) -> None:
-        self._collection_to_docs: DefaultDict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._collection_to_docs: DefaultDict[str, List[str]] = defaultdict(list)
         self._collection_to_index: Dict[str, InMemoryBM25] = {}
+        self._loaded: set = set()
+        self._lock = threading.RLock()  # indices are replaced whole, searched outside it
+
+    def _build(self, collection: str, ids: List[str], fresh: Dict[str, str]) -> None:
+        stored = chunk_store(collection).get_many([i for i in ids if i not in fresh])
+        docs = [{"id": i, "text": fresh[i] if i in fresh else stored.get(i, "")} for i in ids]
+        self._collection_to_docs[collection] = ids
+        if ids:
+            self._collection_to_index[collection] = InMemoryBM25(docs, keep_text=False)
+        else:
+            self._collection_to_index.pop(collection, None)
+        self._loaded.add(collection)
+
+    def _ensure(self, collection: str) -> None:
+        if collection in self._loaded:
+            return
+        store = chunk_store(collection)
+        if os.path.exists(store.index_path):
+            items = list(store.items())
+            if items:
+                self._build(collection, [i for i, _ in items], dict(items))
+        self._loaded.add(collection)
 
     def add_docs(self, collection: str, docs: List[Dict[str, Any]]) -> None:
+        """Add docs, replacing any already registered under the same id."""
         if not docs:
             return
-        self._collection_to_docs[collection].extend(docs)
-        self._collection_to_index[collection] = InMemoryBM25(self._collection_to_docs[collection])
+        with self._lock:
+            self._ensure(collection)
+            current = list(self._collection_to_docs[collection])
+            known = set(current)
+            fresh: Dict[str, str] = {}
+            for d in docs:
+                i = str(d.get("id"))
+                fresh[i] = d.get("text", "")
+                if i not in known:
+                    known.add(i)
+                    current.append(i)
+            self._build(collection, current, fresh)
+
+    def remove_ids(self, collection: str, ids: List[str]) -> None:
+        drop = set(map(str, ids))
+        with self._lock:
+            self._ensure(collection)
+            current = self._collection_to_docs.get(collection)
+            if not drop or not current:
+                return
+            kept = [i for i in current if i not in drop]
+            if len(kept) == len(current):
+                return
+            self._build(collection, kept, {})
 
     def reset(self, collection: str) -> None:
-        self._collection_to_docs.pop(collection, None)
-        self._collection_to_index.pop(collection, None)
+        """Forget the in-memory index; the next search reloads it from the chunk store."""
+        with self._lock:
+            self._collection_to_docs.pop(collection, None)
+            self._collection_to_index.pop(collection, None)
+            self._loaded.discard(collection)
+
+    def collections(self) -> List[str]:
+        return list(self._collection_to_index)
 
     def search(self, collection: str, query: str, topk: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
-        idx = self._collection_to_index.get(collection)
+        with self._lock:
+            self._ensure(collection)
+            idx = self._collection_to_index.get(collection)
         if not idx:
             return []
         return idx.search(query, topk)
@@ -75,5 +140,3 @@ class BM25Registry:
 
 # Global registry instance
 bm25_registry = BM25Registry()
-
-
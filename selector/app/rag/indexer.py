@@ -1,8 +1,13 @@
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence
+from urllib.parse import urlparse
+import asyncio
 import os
 import httpx
 import hashlib
 
+import numpy as np
+import orjson
+
 
 def stable_id(key: str) -> int:
     """Create a deterministic 63-bit integer id from an arbitrary key string."""
@@ -12,36 +17,294 @@ def stable_id(key: str) -> int:
     return val & ((1 << 63) - 1)
 
 
+def collection_schema(dim: Optional[int], profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Qdrant collection body for a memory/recall profile.
+
+    profile keys (all optional): hnsw_m, hnsw_ef_construct, hnsw_on_disk,
+    on_disk (mmap the original vectors), memmap_threshold, quantization
+    ("scalar" int8 | "binary" | none), quantization_quantile, quantization_always_ram.
+    With quantization and on_disk, searches scan the compact in-RAM copy and
+    rescore against the originals from disk.
+    """
+    p = profile or {}
+    schema: Dict[str, Any] = {
+        "hnsw_config": {
+            "m": int(p.get("hnsw_m") or 32),
+            "ef_construct": int(p.get("hnsw_ef_construct") or 128),
+            "on_disk": bool(p.get("hnsw_on_disk", False)),
+        },
+        "optimizers_config": {"memmap_threshold": int(p.get("memmap_threshold") or 20000)},
+        "on_disk_payload": True,
+    }
+    if dim is not None:
+        schema["vectors"] = {"size": dim, "distance": "Cosine", "on_disk": bool(p.get("on_disk", False))}
+    quant = (p.get("quantization") or "none").lower()
+    always_ram = bool(p.get("quantization_always_ram", True))
+    if quant == "scalar":
+        schema["quantization_config"] = {"scalar": {
+            "type": "int8",
+            "quantile": float(p.get("quantization_quantile") or 0.99),
+            "always_ram": always_ram,
+        }}
+    elif quant == "binary":
+        schema["quantization_config"] = {"binary": {"always_ram": always_ram}}
+    return schema
+
+
+def search_params(
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False,
+    rescore: Optional[bool] = None,
+    oversampling: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Qdrant per-request search params; None when everything is left at defaults."""
+    params: Dict[str, Any] = {}
+    if hnsw_ef:
+        params["hnsw_ef"] = int(hnsw_ef)
+    if exact:
+        params["exact"] = True
+    if rescore is not None or oversampling:
+        q: Dict[str, Any] = {}
+        if rescore is not None:
+            q["rescore"] = bool(rescore)
+        if oversampling:
+            q["oversampling"] = float(oversampling)
+        params["quantization"] = q
+    return params or None
+
+
+def payload_selector(include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> Any:
+    """Qdrant with_payload value: only `include` keys, or everything but `exclude` (default: all)."""
+    if include:
+        return {"include": sorted(set(include))}
+    if exclude:
+        return {"exclude": sorted(set(exclude))}
+    return True
+
+
+def _dumps(body: Any) -> bytes:
+    # orjson writes float32 ndarrays directly, without building Python float lists
+    return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+_JSON = {"Content-Type": "application/json"}
+
+
 class Qdrant:
-    def __init__(self, url: str | None = None) -> None:
+    def __init__(
+        self,
+        url: str | None = None,
+        upsert_batch: int | None = None,
+        upsert_concurrency: int | None = None,
+        prefer_grpc: bool | None = None,
+    ) -> None:
         self.url = url or os.getenv("QDRANT_URL", "http://localhost:6333")
+        self.upsert_batch = upsert_batch or int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+        self.upsert_concurrency = upsert_concurrency or int(os.getenv("QDRANT_UPSERT_CONCURRENCY", "4"))
+        if prefer_grpc is None:
+            prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "").lower() in ("1", "true", "yes")
+        self.prefer_grpc = prefer_grpc
 
-    async def create_collection(self, name: str, dim: int) -> Dict[str, Any]:
-        schema = {
-            "vectors": {"size": dim, "distance": "Cosine"},
-            "hnsw_config": {"m": 32, "ef_construct": 128},
-            "optimizers_config": {"memmap_threshold": 20000},
-            "on_disk_payload": True,
-        }
+    async def create_collection(self, name: str, dim: int, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        schema = collection_schema(dim, profile)
         async with httpx.AsyncClient(timeout=30) as client:
             r = await client.put(f"{self.url}/collections/{name}?wait=true", json=schema)
             return r.json()
 
-    async def upsert(self, name: str, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: Optional[List[int]] = None):
-        points = []
-        for i, (v, p) in enumerate(zip(vectors, payloads)):
-            pid = ids[i] if ids is not None and i < len(ids) else i
-            points.append({"id": pid, "vector": v, "payload": p})
+    async def update_collection(self, name: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a profile to an existing collection (Qdrant re-optimizes in the background)."""
+        schema = collection_schema(None, profile)
+        body: Dict[str, Any] = {k: schema[k] for k in ("hnsw_config", "optimizers_config", "quantization_config") if k in schema}
+        if "quantization_config" not in body and profile.get("quantization") in (None, "", "none"):
+            body["quantization_config"] = "Disabled"
+        body["vectors"] = {"": {"on_disk": bool(profile.get("on_disk"))}}
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.patch(f"{self.url}/collections/{name}", json=body)
+            return r.json()
+
+    async def collection_info(self, name: str) -> Dict[str, Any]:
         async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.put(f"{self.url}/collections/{name}/points?wait=true", json={"points": points})
+            r = await client.get(f"{self.url}/collections/{name}")
             return r.json()
 
-    async def search(self, name: str, vector: List[float], limit: int = 5) -> Dict[str, Any]:
+    async def count(self, name: str, exact: bool = True) -> int:
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.post(f"{self.url}/collections/{name}/points/count", json={"exact": exact})
+            return int(((r.json() or {}).get("result") or {}).get("count") or 0)
+
+    async def switch_alias(self, alias: str, collection: str) -> Dict[str, Any]:
+        """Atomically (re)point `alias` at `collection` (one alias-actions request)."""
+        actions = [
+            {"delete_alias": {"alias_name": alias}},
+            {"create_alias": {"collection_name": collection, "alias_name": alias}},
+        ]
         async with httpx.AsyncClient(timeout=30) as client:
-            payload = {"vector": vector, "limit": limit, "with_payload": True}
-            r = await client.post(f"{self.url}/collections/{name}/points/search", json=payload)
+            r = await client.post(f"{self.url}/collections/aliases?timeout=30", json={"actions": actions})
+            body = r.json()
+            if r.status_code == 404 or (isinstance(body, dict) and body.get("status") != "ok"):
+                # no alias yet: delete_alias of a missing alias fails the whole batch
+                r = await client.post(f"{self.url}/collections/aliases?timeout=30", json={"actions": actions[1:]})
+                body = r.json()
+            return body
+
+    async def list_aliases(self) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.get(f"{self.url}/aliases")
+            return r.json()
+
+    @property
+    def _snapshot_timeout(self) -> httpx.Timeout:
+        # snapshot creation and transfer of large collections take minutes
+        return httpx.Timeout(float(os.getenv("QDRANT_SNAPSHOT_TIMEOUT", "3600")), connect=30)
+
+    async def create_snapshot(self, name: str) -> Dict[str, Any]:
+        """Create a collection snapshot on the Qdrant node; result has name, size, checksum."""
+        async with httpx.AsyncClient(timeout=self._snapshot_timeout) as client:
+            r = await client.post(f"{self.url}/collections/{name}/snapshots?wait=true")
             return r.json()
 
+    async def stream_snapshot(self, name: str, snapshot: str, chunk_bytes: int = 1 << 20) -> AsyncIterator[bytes]:
+        async with httpx.AsyncClient(timeout=self._snapshot_timeout) as client:
+            async with client.stream("GET", f"{self.url}/collections/{name}/snapshots/{snapshot}") as r:
+                r.raise_for_status()
+                async for chunk in r.aiter_bytes(chunk_bytes):
+                    yield chunk
+
+    async def delete_snapshot(self, name: str, snapshot: str) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.delete(f"{self.url}/collections/{name}/snapshots/{snapshot}")
+            return r.json()
+
+    async def upload_snapshot(self, name: str, path: str) -> Dict[str, Any]:
+        """Recover collection `name` from a local snapshot file (multipart body streamed from disk)."""
+        async with httpx.AsyncClient(timeout=self._snapshot_timeout) as client:
+            with open(path, "rb") as f:
+                r = await client.post(
+                    f"{self.url}/collections/{name}/snapshots/upload?priority=snapshot&wait=true",
+                    files={"snapshot": (os.path.basename(path), f, "application/octet-stream")},
+                )
+            return r.json()
+
+    async def upsert(
+        self,
+        name: str,
+        vectors: np.ndarray | Sequence[Sequence[float]],
+        payloads: List[Dict[str, Any]],
+        ids: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        """Upsert in batches of `upsert_batch`, up to `upsert_concurrency` in flight.
+
+        Vectors stay a float32 matrix; REST bodies are serialized by orjson, or
+        with prefer_grpc (QDRANT_PREFER_GRPC=1, needs qdrant-client) points go
+        as protobuf over the gRPC port (QDRANT_GRPC_PORT, default 6334).
+        """
+        vecs = np.asarray(vectors, dtype=np.float32)
+        n = min(len(vecs), len(payloads))
+        pids = [ids[i] if ids is not None and i < len(ids) else i for i in range(n)]
+        spans = [(i, min(i + self.upsert_batch, n)) for i in range(0, n, self.upsert_batch)]
+        if self.prefer_grpc:
+            grpc_result = await self._upsert_grpc(name, vecs, payloads, pids, spans)
+            if grpc_result is not None:
+                return grpc_result
+        sem = asyncio.Semaphore(self.upsert_concurrency)
+
+        async def send(client: httpx.AsyncClient, lo: int, hi: int) -> Dict[str, Any]:
+            points = [{"id": pids[i], "vector": vecs[i], "payload": payloads[i]} for i in range(lo, hi)]
+            async with sem:
+                r = await client.put(
+                    f"{self.url}/collections/{name}/points?wait=true",
+                    content=_dumps({"points": points}),
+                    headers=_JSON,
+                )
+                return r.json()
+
+        async with httpx.AsyncClient(timeout=60) as client:
+            results = await asyncio.gather(*(send(client, lo, hi) for lo, hi in spans))
+        return self._merge_upserts(results, n)
+
+    @staticmethod
+    def _merge_upserts(results: List[Dict[str, Any]], n: int) -> Dict[str, Any]:
+        failed = [r for r in results if not (isinstance(r, dict) and r.get("status") == "ok")]
+        out: Dict[str, Any] = {
+            "status": "ok" if not failed else "error",
+            "result": {"points": n, "batches": len(results)},
+            "time": sum(float(r.get("time") or 0.0) for r in results if isinstance(r, dict)),
+        }
+        if failed:
+            out["errors"] = failed[:3]
+        return out
+
+    async def _upsert_grpc(self, name: str, vecs: np.ndarray, payloads: List[Dict[str, Any]], pids: List[int], spans: List[tuple]) -> Dict[str, Any] | None:
+        try:
+            from qdrant_client import AsyncQdrantClient, models  # type: ignore
+        except ImportError:
+            return None
+        host = urlparse(self.url).hostname or "localhost"
+        client = AsyncQdrantClient(host=host, grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")), prefer_grpc=True)
+        sem = asyncio.Semaphore(self.upsert_concurrency)
+
+        async def send(lo: int, hi: int) -> Dict[str, Any]:
+            batch = models.Batch(ids=pids[lo:hi], vectors=vecs[lo:hi].tolist(), payloads=payloads[lo:hi])
+            async with sem:
+                try:
+                    res = await client.upsert(collection_name=name, points=batch, wait=True)
+                    return {"status": "ok", "result": {"status": str(getattr(res, "status", ""))}}
+                except Exception as e:
+                    return {"status": {"error": str(e)}}
+
+        try:
+            results = await asyncio.gather(*(send(lo, hi) for lo, hi in spans))
+        finally:
+            await client.close()
+        merged = self._merge_upserts(results, len(pids))
+        merged["transport"] = "grpc"
+        return merged
+
+    async def delete_points(self, name: str, ids: List[int]) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.post(f"{self.url}/collections/{name}/points/delete?wait=true", json={"points": ids})
+            return r.json()
+
+    async def retrieve(self, name: str, ids: List[int], with_payload: Any = True) -> Dict[str, Any]:
+        """Points by id, without vectors."""
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.post(f"{self.url}/collections/{name}/points", content=_dumps({"ids": ids, "with_payload": with_payload, "with_vector": False}), headers=_JSON)
+            return orjson.loads(r.content)
+
+    async def search(
+        self,
+        name: str,
+        vector: np.ndarray | List[float],
+        limit: int = 5,
+        params: Optional[Dict[str, Any]] = None,
+        with_payload: Any = True,
+    ) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=30) as client:
+            payload: Dict[str, Any] = {"vector": np.asarray(vector, dtype=np.float32), "limit": limit, "with_payload": with_payload}
+            if params:
+                payload["params"] = params
+            r = await client.post(f"{self.url}/collections/{name}/points/search", content=_dumps(payload), headers=_JSON)
+            return orjson.loads(r.content)
+
+    async def search_batch(
+        self,
+        name: str,
+        vectors: np.ndarray | List[List[float]],
+        limit: int = 5,
+        params: Optional[Dict[str, Any]] = None,
+        with_payload: Any = True,
+    ) -> Dict[str, Any]:
+        """One /points/search/batch round-trip; result[i] holds the hits for vectors[i]."""
+        searches = []
+        for v in np.asarray(vectors, dtype=np.float32):
+            q: Dict[str, Any] = {"vector": v, "limit": limit, "with_payload": with_payload}
+            if params:
+                q["params"] = params
+            searches.append(q)
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.post(f"{self.url}/collections/{name}/points/search/batch", content=_dumps({"searches": searches}), headers=_JSON)
+            return orjson.loads(r.content)
+
     async def list_collections(self) -> Dict[str, Any]:
         async with httpx.AsyncClient(timeout=30) as client:
             r = await client.get(f"{self.url}/collections")
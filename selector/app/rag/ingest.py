@@ -0,0 +1,95 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import os
+
+from .chunker import chunk_document, get_token_len
+from .pool import pool_size, get_process_pool
+from .preprocess import Prepared, prepare_docs, select_docs
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _batches(docs: List[Dict[str, Any]], size: int) -> List[List[Dict[str, Any]]]:
+    return [docs[i:i + size] for i in range(0, len(docs), size)]
+
+
+def _use_pool(docs: List[Dict[str, Any]], workers: int) -> bool:
+    """Below INGEST_PARALLEL_MIN_CHARS the pickling/IPC round-trip costs more than it saves."""
+    if workers <= 0 or len(docs) < 2:
+        return False
+    total = sum(len(d.get("text") or "") for d in docs)
+    return total >= _int_env("INGEST_PARALLEL_MIN_CHARS", 1_000_000)
+
+
+def _chunk_batch(docs: List[Dict[str, Any]], params: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+    token_len = get_token_len(params.get("model")) if params.get("max_tokens") else None
+    return [
+        chunk_document(
+            str(d.get("id")),
+            d.get("text", ""),
+            strategy=params.get("strategy") or "sentence",
+            max_chars=int(params.get("max_chars") or 400),
+            overlap=int(params.get("overlap") or 0),
+            max_tokens=params.get("max_tokens"),
+            token_len=token_len,
+        )
+        for d in docs
+    ]
+
+
+async def _map_ordered(fn, batches: List[List[Dict[str, Any]]], *args: Any, workers: int) -> AsyncIterator[Any]:
+    """Submit every batch to the ingest pool and yield results in submission order."""
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool("ingest", workers)
+    futures = [loop.run_in_executor(pool, fn, b, *args) for b in batches]
+    try:
+        for fut in futures:
+            yield await fut
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+
+async def normalize_docs(
+    docs: List[Dict[str, Any]],
+    min_chars: int = 20,
+    near_dup_threshold: Optional[float] = None,
+    workers: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """filter_and_normalize with the per-doc work (cleaning, sha256, MinHash) spread
+    over INGEST_WORKERS processes; duplicate selection stays sequential and ordered."""
+    n = pool_size("INGEST_WORKERS") if workers is None else workers
+    near = bool(near_dup_threshold)
+    if not _use_pool(docs, n):
+        return select_docs(prepare_docs(docs, min_chars, near), near_dup_threshold)
+    prepared: List[Prepared] = []
+    async for part in _map_ordered(prepare_docs, _batches(docs, _int_env("INGEST_BATCH_DOCS", 32)), min_chars, near, workers=n):
+        prepared += part
+    return select_docs(prepared, near_dup_threshold)
+
+
+async def iter_chunks(
+    docs: List[Dict[str, Any]],
+    strategy: str = "sentence",
+    max_chars: int = 400,
+    overlap: int = 50,
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield each doc's chunks in input order, chunking batches on INGEST_WORKERS
+    processes (falls back to inline chunking for small inputs)."""
+    params = {"strategy": strategy, "max_chars": max_chars, "overlap": overlap, "max_tokens": max_tokens, "model": model}
+    n = pool_size("INGEST_WORKERS") if workers is None else workers
+    if not _use_pool(docs, n):
+        for doc_chunks in _chunk_batch(docs, params):
+            yield doc_chunks
+        return
+    async for part in _map_ordered(_chunk_batch, _batches(docs, _int_env("INGEST_BATCH_DOCS", 32)), params, workers=n):
+        for doc_chunks in part:
+            yield doc_chunks
@@ -0,0 +1,126 @@
+from typing import Dict, Any, List, Optional, Tuple
+from functools import lru_cache
+import re
+
+import numpy as np
+
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WS = re.compile(r"\s+")
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    """Unique 64-bit hashes of character k-grams (whitespace-collapsed, lowercased).
+
+    Character shingles work for both CJK and Latin text without a tokenizer; the
+    rolling polynomial hash is computed over all positions at once.
+    """
+    norm = _WS.sub(" ", (text or "").lower()).strip()
+    cps = np.frombuffer(norm.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if cps.size == 0:
+        return np.zeros(1, dtype=np.uint64)
+    if cps.size < k:
+        k = int(cps.size)
+    n = cps.size - k + 1
+    h = np.zeros(n, dtype=np.uint64)
+    base = np.uint64(1099511628211)
+    for j in range(k):
+        h = h * base + cps[j:j + n]
+    return np.unique(h)
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str, k: int = 5) -> np.ndarray:
+        h = shingle_hashes(text, k) & _MAX_HASH
+        sig = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # (a*x + b) mod p for every permutation x shingle, in blocks to bound memory
+        for i in range(0, h.size, 4096):
+            block = h[None, i:i + 4096]
+            perm = (self.a[:, None] * block + self.b[:, None]) % _MERSENNE & _MAX_HASH
+            np.minimum(sig, perm.min(axis=1), out=sig)
+        return sig.astype(np.uint32)
+
+
+@lru_cache(maxsize=32)
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Pick (bands, rows) minimizing false-positive + false-negative mass of the
+    LSH S-curve 1-(1-s^r)^b around the threshold (same criterion as datasketch)."""
+    xs = np.linspace(0.0, 1.0, 201)
+    dx = xs[1] - xs[0]
+    best = (1, num_perm)
+    best_err = float("inf")
+    for b in range(1, num_perm + 1):
+        for r in range(1, num_perm // b + 1):
+            p = 1.0 - (1.0 - xs ** r) ** b
+            fp = float(np.sum(np.where(xs < threshold, p, 0.0))) * dx
+            fn = float(np.sum(np.where(xs >= threshold, 1.0 - p, 0.0))) * dx
+            if fp + fn < best_err:
+                best, best_err = (b, r), fp + fn
+    return best
+
+
+class NearDupIndex:
+    """MinHash-LSH index: banded bucket lookup, then verification by estimated Jaccard.
+
+    Each insert/query touches only `bands` hash buckets, so cost stays linear in
+    the number of documents instead of pairwise.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle: int = 5, seed: int = 1) -> None:
+        self.threshold = threshold
+        self.shingle = shingle
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._sigs: List[np.ndarray] = []
+        self._keys: List[Any] = []
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        r = self.rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def find(self, sig: np.ndarray) -> Optional[Any]:
+        seen = set()
+        for band, key in zip(self._buckets, self._band_keys(sig)):
+            for j in band.get(key, ()):
+                if j in seen:
+                    continue
+                seen.add(j)
+                if float(np.mean(self._sigs[j] == sig)) >= self.threshold:
+                    return self._keys[j]
+        return None
+
+    def add(self, key: Any, sig: np.ndarray) -> None:
+        j = len(self._sigs)
+        self._sigs.append(sig)
+        self._keys.append(key)
+        for band, bkey in zip(self._buckets, self._band_keys(sig)):
+            band.setdefault(bkey, []).append(j)
+
+    def add_if_new(self, key: Any, text: str) -> Optional[Any]:
+        """Insert text unless a near-duplicate is indexed; returns the existing key if so."""
+        sig = self.hasher.signature(text, self.shingle)
+        dup = self.find(sig)
+        if dup is None:
+            self.add(key, sig)
+        return dup
+
+
+def dedup_chunks(chunks: List[Dict[str, Any]], threshold: float = 0.9) -> Tuple[List[Dict[str, Any]], int]:
+    """Drop chunks that near-duplicate an earlier chunk (across all docs in the batch)."""
+    index = NearDupIndex(threshold=threshold)
+    kept: List[Dict[str, Any]] = []
+    dropped = 0
+    for c in chunks:
+        if index.add_if_new((c.get("doc_id"), c.get("chunk_id")), c.get("text", "")) is not None:
+            dropped += 1
+            continue
+        kept.append(c)
+    return kept, dropped
@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import multiprocessing
+import os
+import threading
+
+
+_pools: Dict[str, ProcessPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def pool_size(env_var: str, default: Optional[int] = None) -> int:
+    """Resolve a worker count from an env var; 0 disables the pool (run inline)."""
+    raw = os.getenv(env_var)
+    if raw is not None and raw.strip() != "":
+        try:
+            return max(0, int(raw))
+        except ValueError:
+            pass
+    if default is not None:
+        return default
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def get_process_pool(name: str, workers: int) -> ProcessPoolExecutor:
+    """Process-wide named pool, created lazily and recreated if it broke or was resized.
+
+    Workers are spawned (not forked) so children never inherit the event loop or
+    open sockets of the API process.
+    """
+    with _lock:
+        pool = _pools.get(name)
+        if pool is not None and (getattr(pool, "_broken", False) or getattr(pool, "_max_workers", workers) != workers):
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        if pool is None:
+            method = os.getenv("RAG_POOL_START_METHOD", "spawn")
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pools[name] = pool
+        return pool
+
+
+def discard_pool(name: str, pool: Optional[ProcessPoolExecutor] = None, terminate: bool = False) -> None:
+    """Drop a pool whose workers may be stuck; the next call creates a fresh one.
+
+    With `pool`, only that instance is dropped (a concurrent caller may already
+    have replaced it). Work queued by other callers is not cancelled; with
+    terminate=True the workers are killed, which fails their pending futures
+    with BrokenProcessPool so those callers can resubmit.
+    """
+    with _lock:
+        current = _pools.get(name)
+        if pool is None:
+            pool = current
+        if pool is not None and pool is current:
+            del _pools[name]
+    if pool is None:
+        return
+    procs = list((getattr(pool, "_processes", None) or {}).values()) if terminate else []
+    pool.shutdown(wait=False, cancel_futures=False)
+    for proc in procs:
+        if proc.is_alive():
+            proc.terminate()
+
+
+def shutdown_pools() -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,8 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import hashlib
+import json
+
+from .neardup import MinHasher, NearDupIndex
 
 
 def clean_text(text: str) -> str:
@@ -10,6 +13,17 @@ def doc_fingerprint(text: str) -> str:
     return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
 
 
+def chunk_fingerprint(payload: Dict[str, Any], salt: str = "") -> str:
+    """Fingerprint of everything that ends up in a point: payload plus embedding config."""
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256((salt + "\x1f" + body).encode("utf-8")).hexdigest()
+
+
+def embedding_salt(config: Dict[str, Any]) -> str:
+    """chunk_fingerprint salt for the resolved embedding config {provider, model, dim}."""
+    return f"{config.get('provider')}:{config.get('model') or ''}:{config.get('dim') or ''}"
+
+
 def is_valid_doc(text: str, min_chars: int = 20) -> bool:
     if not text:
         return False
@@ -18,21 +32,49 @@ def is_valid_doc(text: str, min_chars: int = 20) -> bool:
     return True
 
 
-def filter_and_normalize(docs: List[Dict[str, Any]], min_chars: int = 20) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
-    seen = set()
-    kept: List[Dict[str, Any]] = []
-    stats = {"input": 0, "kept": 0, "too_short": 0, "dedup": 0}
+Prepared = Tuple[Dict[str, Any], Optional[str], Optional[str], Any]
+
+
+def prepare_docs(docs: List[Dict[str, Any]], min_chars: int = 20, near_dup: bool = False) -> List[Prepared]:
+    """Per-doc, order-independent work: clean, validate, fingerprint and (optionally)
+    MinHash-sign. Safe to run in worker processes; text is None for too-short docs."""
+    hasher = MinHasher() if near_dup else None
+    out: List[Prepared] = []
     for d in docs:
-        stats["input"] += 1
         t = clean_text(d.get("text", ""))
         if not is_valid_doc(t, min_chars=min_chars):
+            out.append((d, None, None, None))
+            continue
+        out.append((d, t, doc_fingerprint(t), hasher.signature(t) if hasher else None))
+    return out
+
+
+def select_docs(prepared: List[Prepared], near_dup_threshold: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Order-dependent pass over prepare_docs output: exact and near-duplicate removal.
+
+    stats["near_dup_ids"] lists the ids of the docs dropped as near-duplicates.
+    """
+    seen = set()
+    near = NearDupIndex(threshold=near_dup_threshold) if near_dup_threshold else None
+    kept: List[Dict[str, Any]] = []
+    stats: Dict[str, Any] = {"input": 0, "kept": 0, "too_short": 0, "dedup": 0, "near_dup": 0, "near_dup_ids": []}
+    for d, t, fp, sig in prepared:
+        stats["input"] += 1
+        if t is None:
             stats["too_short"] += 1
             continue
-        fp = doc_fingerprint(t)
         if fp in seen:
             stats["dedup"] += 1
             continue
         seen.add(fp)
+        if near is not None:
+            if sig is None:
+                sig = near.hasher.signature(t, near.shingle)
+            if near.find(sig) is not None:
+                stats["near_dup"] += 1
+                stats["near_dup_ids"].append(d.get("id"))
+                continue
+            near.add(d.get("id"), sig)
         kept.append({
             "id": d.get("id"),
             "text": t,
@@ -42,3 +84,11 @@ def filter_and_normalize(docs: List[Dict[str, Any]], min_chars: int = 20) -> Tup
     return kept, stats
 
 
+def filter_and_normalize(
+    docs: List[Dict[str, Any]],
+    min_chars: int = 20,
+    near_dup_threshold: Optional[float] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Drop short docs, exact duplicates (sha256) and, if near_dup_threshold is set,
+    near-duplicates whose estimated Jaccard similarity reaches it (MinHash-LSH)."""
+    return select_docs(prepare_docs(docs, min_chars, near_dup=bool(near_dup_threshold)), near_dup_threshold)
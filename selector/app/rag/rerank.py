@@ -0,0 +1,218 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+import asyncio
+import os
+import re
+import threading
+
+import numpy as np
+
+
+_LATIN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+
+
+def _terms(text: str) -> set:
+    """Latin words/numbers (e.g. "25g", "100ge") plus CJK character bigrams."""
+    t = (text or "").lower()
+    terms = set(_LATIN.findall(t))
+    for run in _CJK_RUN.findall(t):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class LexicalReranker:
+    """CPU scoring function: weighted query-term coverage plus term-set Dice overlap.
+
+    Unlike a per-term str.count, it rewards covering *all* query aspects and
+    handles Chinese via bigrams; cost is linear in text length.
+    """
+
+    name = "lexical"
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        q = _terms(query)
+        if not q:
+            return [0.0] * len(texts)
+        out: List[float] = []
+        for text in texts:
+            d = _terms(text)
+            inter = len(q & d)
+            coverage = inter / len(q)
+            dice = 2.0 * inter / (len(q) + len(d)) if d else 0.0
+            out.append(0.8 * coverage + 0.2 * dice)
+        return out
+
+
+class OnnxCrossEncoder:
+    """Small cross-encoder (e.g. a MiniLM/bge reranker exported to ONNX) run on CPU.
+
+    RERANK_ONNX_MODEL points to a directory with model.onnx and tokenizer.json;
+    needs the optional onnxruntime and tokenizers packages.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, max_length: int = 512, batch_size: int = 32) -> None:
+        import onnxruntime as ort  # type: ignore
+        from tokenizers import Tokenizer  # type: ignore
+
+        self.session = ort.InferenceSession(os.path.join(model_dir, "model.onnx"), providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        out: List[float] = []
+        for i in range(0, len(texts), self.batch_size):
+            enc = self.tokenizer.encode_batch([(query, t) for t in texts[i:i + self.batch_size]])
+            feed = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            logits = self.session.run(None, {k: v for k, v in feed.items() if k in self.inputs})[0]
+            out += np.asarray(logits, dtype=np.float32).reshape(len(enc), -1)[:, 0].tolist()
+        return out
+
+
+@lru_cache(maxsize=4)
+def get_reranker(name: str = "lexical"):
+    if name == "onnx":
+        model_dir = os.getenv("RERANK_ONNX_MODEL")
+        if not model_dir:
+            raise ValueError("RERANK_ONNX_MODEL not configured")
+        return OnnxCrossEncoder(model_dir)
+    return LexicalReranker()
+
+
+class RerankCache:
+    """LRU of scores keyed by (collection, reranker, query, chunk id); shared by request threads."""
+
+    def __init__(self, max_size: int = 50000) -> None:
+        self.max_size = max_size
+        self._data: "OrderedDict[Tuple[str, str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, collection: str, model: str, query: str, ids: Sequence[str]) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        with self._lock:
+            for i in ids:
+                k = (collection, model, query, i)
+                if k in self._data:
+                    self._data.move_to_end(k)
+                    out[i] = self._data[k]
+        return out
+
+    def put_many(self, collection: str, model: str, query: str, scores: Dict[str, float]) -> None:
+        with self._lock:
+            for i, s in scores.items():
+                self._data[(collection, model, query, i)] = s
+                self._data.move_to_end((collection, model, query, i))
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self, collection: Optional[str] = None) -> None:
+        """Drop the scores of `collection` (its chunk text changed), or everything."""
+        with self._lock:
+            if collection is None:
+                self._data.clear()
+                return
+            for k in [k for k in self._data if k[0] == collection]:
+                del self._data[k]
+
+
+rerank_cache = RerankCache(int(os.getenv("RERANK_CACHE_SIZE", "50000")))
+
+
+def _hit_id(h: Dict[str, Any]) -> str:
+    payload = h.get("payload") or {}
+    pid = payload.get("id") if isinstance(payload, dict) else None
+    return str(pid if pid is not None else h.get("id"))
+
+
+def _by_collection(keys: Sequence[Tuple[str, str]]) -> Dict[str, List[str]]:
+    groups: Dict[str, List[str]] = {}
+    for c, hid in keys:
+        groups.setdefault(c, []).append(hid)
+    return groups
+
+
+def _minmax(values: Sequence[float]) -> np.ndarray:
+    v = np.asarray(values, dtype=np.float64)
+    span = float(v.max() - v.min()) if v.size else 0.0
+    return (v - v.min()) / span if span > 0 else np.zeros_like(v)
+
+
+async def rerank_hits(
+    query: str,
+    hits: List[Dict[str, Any]],
+    model: str = "lexical",
+    budget_ms: Optional[float] = 150,
+    collection: str = "",
+    weight: float = 0.5,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Second-stage rerank of fused candidates in one batch.
+
+    Hits are identified by (collection, chunk id): their own `collection` (set
+    on federated hits, whose ids may repeat across collections), else
+    `collection`. Cached scores are reused; the rest are scored in a worker
+    thread. If that exceeds budget_ms the fused order is returned unchanged (the
+    thread still finishes and fills the cache for the next identical query).
+    Hits are ordered by `final_score`, `weight` of the min-max scaled rerank
+    score plus the rest of the scaled fused score (combo_score, else score), so
+    a weak scorer refines the hybrid order instead of replacing it; merged
+    federated hits use their weighted_score as the fused score.
+    """
+    info: Dict[str, Any] = {"model": model, "reranked": False, "cached": 0, "weight": weight}
+    if not hits:
+        return hits, info
+    keys = [(str(h.get("collection") or collection), _hit_id(h)) for h in hits]
+    scores: Dict[Tuple[str, str], float] = {}
+    for c, ids in _by_collection(keys).items():
+        scores.update(((c, hid), v) for hid, v in rerank_cache.get_many(c, model, query, ids).items())
+    info["cached"] = len(scores)
+    missing = [i for i, key in enumerate(keys) if key not in scores]
+    if missing:
+        try:
+            scorer = get_reranker(model)
+        except Exception as e:
+            info["error"] = str(e)
+            return hits, info
+
+        def run() -> Dict[Tuple[str, str], float]:
+            texts = [((hits[i].get("payload") or {}).get("text") or "") for i in missing]
+            fresh = dict(zip((keys[i] for i in missing), scorer.score(query, texts)))
+            for c in {c for c, _ in fresh}:
+                rerank_cache.put_many(c, model, query, {hid: v for (c2, hid), v in fresh.items() if c2 == c})
+            return fresh
+
+        task = asyncio.ensure_future(asyncio.to_thread(run))
+        try:
+            if budget_ms and budget_ms > 0:
+                fresh = await asyncio.wait_for(asyncio.shield(task), timeout=budget_ms / 1000.0)
+            else:
+                fresh = await task
+        except asyncio.TimeoutError:
+            info["reason"] = "budget_exceeded"
+            return hits, info
+        scores.update(fresh)
+    rerank = [float(scores.get(key, 0.0)) for key in keys]
+    fused = [float(h.get("weighted_score", h.get("combo_score", h.get("score"))) or 0.0) for h in hits]
+    w = min(1.0, max(0.0, float(weight)))
+    final = w * _minmax(rerank) + (1.0 - w) * _minmax(fused)
+    out = []
+    for h, r, f in zip(hits, rerank, final):
+        h2 = dict(h)
+        h2["rerank_score"] = r
+        h2["final_score"] = float(f)
+        out.append(h2)
+    # stable: ties keep the fused order
+    out.sort(key=lambda x: x["final_score"], reverse=True)
+    info["reranked"] = True
+    return out, info
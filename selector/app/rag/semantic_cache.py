@@ -0,0 +1,158 @@
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def hit_ids(hits: List[Dict[str, Any]]) -> List[str]:
+    """Chunk ids of search hits (payload id, else point id), as evaluation scores them."""
+    out = []
+    for h in hits or []:
+        payload = h.get("payload") if isinstance(h, dict) else None
+        pid = (payload.get("id") or payload.get("doc_id")) if isinstance(payload, dict) else None
+        out.append(str(pid) if pid is not None else str(h.get("id")))
+    return out
+
+
+def _unit(vec: Any) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+class _Bucket:
+    """Cached queries of one collection and request variant: a matrix of unit
+    query vectors, searched by one dot product, with LRU replacement."""
+
+    def __init__(self, dim: int, capacity: int) -> None:
+        self.capacity = capacity
+        rows = min(capacity, 64)  # grown by doubling up to capacity
+        self.vecs = np.zeros((rows, dim), dtype=np.float32)
+        self.used = np.zeros(rows, dtype=np.int64)
+        self.entries: List[Tuple[str, Any, List[str]]] = []  # (query, result, ids)
+        self.n = 0
+
+    def nearest(self, v: np.ndarray) -> Tuple[float, int]:
+        if not self.n or v.shape[0] != self.vecs.shape[1]:
+            return -1.0, -1
+        sims = self.vecs[: self.n] @ v
+        i = int(np.argmax(sims))
+        return float(sims[i]), i
+
+    def put(self, v: np.ndarray, entry: Tuple[str, Any, List[str]], tick: int) -> None:
+        if self.n < self.capacity:
+            if self.n == len(self.vecs):
+                rows = min(self.capacity, 2 * len(self.vecs))
+                self.vecs = np.resize(self.vecs, (rows, self.vecs.shape[1]))
+                self.used = np.resize(self.used, rows)
+            i = self.n
+            self.n += 1
+            self.entries.append(entry)
+        else:
+            i = int(np.argmin(self.used))
+            self.entries[i] = entry
+        self.vecs[i] = v
+        self.used[i] = tick
+
+
+class SemanticCache:
+    """Final search results keyed by query embedding, per collection.
+
+    Paraphrased queries embed close to each other, so a lookup serves the result
+    of the nearest cached query of the same collection and request variant
+    (every request parameter but the query text) when their cosine similarity
+    reaches `threshold`. Callers pass the query vector they compute anyway.
+    bump(collection) on re-index, alias switch or delete drops its entries; a
+    result computed across a bump is not stored (see version()).
+    """
+
+    def __init__(self, capacity: int = 2048, threshold: float = 0.95, enabled: bool = True) -> None:
+        self.capacity = capacity
+        self.threshold = threshold
+        self.enabled = enabled
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._versions: Dict[str, int] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def variant(params: Dict[str, Any]) -> str:
+        canon = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(canon.encode("utf-8")).hexdigest()[:16]
+
+    def version(self, collection: str) -> int:
+        with self._lock:
+            return self._versions.get(collection, 0)
+
+    def bump(self, collection: str) -> None:
+        with self._lock:
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+            for key in [k for k in self._buckets if k[0] == collection]:
+                del self._buckets[key]
+
+    def lookup(self, collection: str, variant: str, vec: Any, threshold: Optional[float] = None) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """(cached result, {hit, similarity, query}) of the nearest cached query, if close enough."""
+        v = _unit(vec)
+        limit = self.threshold if threshold is None else threshold
+        with self._lock:
+            counts = self._counts.setdefault(collection, {"hits": 0, "misses": 0})
+            bucket = self._buckets.get((collection, variant))
+            sim, i = bucket.nearest(v) if bucket is not None else (-1.0, -1)
+            if i < 0 or sim < limit:
+                counts["misses"] += 1
+                return None
+            counts["hits"] += 1
+            self._tick += 1
+            bucket.used[i] = self._tick
+            query, result, _ = bucket.entries[i]
+        return result, {"hit": True, "similarity": round(sim, 4), "query": query}
+
+    def put(self, collection: str, variant: str, vec: Any, query: str, result: Any, ids: List[str], version: int) -> None:
+        """Store `result`, unless `collection` was bumped since `version` was read."""
+        v = _unit(vec)
+        with self._lock:
+            if self._versions.get(collection, 0) != version:
+                return
+            bucket = self._buckets.get((collection, variant))
+            if bucket is None or bucket.vecs.shape[1] != v.shape[0]:
+                bucket = self._buckets[(collection, variant)] = _Bucket(v.shape[0], self.capacity)
+            self._tick += 1
+            bucket.put(v, (query, result, ids), self._tick)
+
+    def nearest(self, collection: str, variant: str, vec: Any) -> Optional[Dict[str, Any]]:
+        """Nearest cached query of one variant of `collection`; does not count as a lookup."""
+        v = _unit(vec)
+        with self._lock:
+            bucket = self._buckets.get((collection, variant))
+            sim, i = bucket.nearest(v) if bucket is not None else (-1.0, -1)
+            if i < 0:
+                return None
+            query, _, ids = bucket.entries[i]
+        return {"similarity": round(sim, 4), "query": query, "ids": ids}
+
+    def stats(self, collection: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            names = [collection] if collection else sorted(set(self._counts) | {c for c, _ in self._buckets})
+            out: Dict[str, Any] = {}
+            for name in names:
+                counts = self._counts.get(name, {"hits": 0, "misses": 0})
+                total = counts["hits"] + counts["misses"]
+                out[name] = {
+                    "entries": sum(b.n for (c, _), b in self._buckets.items() if c == name),
+                    "hits": counts["hits"],
+                    "misses": counts["misses"],
+                    "hit_rate": round(counts["hits"] / total, 4) if total else None,
+                    "version": self._versions.get(name, 0),
+                }
+        return {"enabled": self.enabled, "threshold": self.threshold, "capacity": self.capacity, "collections": out}
+
+
+semantic_cache = SemanticCache(
+    capacity=int(os.getenv("RAG_SEMANTIC_CACHE_SIZE", "2048")),
+    threshold=float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.95")),
+    enabled=os.getenv("RAG_SEMANTIC_CACHE", "1") == "1",
+)
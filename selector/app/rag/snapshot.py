@@ -0,0 +1,306 @@
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+
+from .chunk_store import ChunkStore, chunk_store
+from .fingerprints import FingerprintStore
+from .state import state_dir
+
+
+FORMAT = 1
+MANIFEST = "manifest.json"
+FINGERPRINTS = "fingerprints.sqlite"
+CHUNK_INDEX = "chunks.sqlite"
+CHUNK_DATA = "chunks.dat"
+QDRANT = "qdrant.snapshot"
+_PIECE = 1 << 20
+
+
+class SnapshotError(ValueError):
+    """The uploaded archive is malformed, truncated or from another format version."""
+
+
+def _header(name: str, size: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = int(time.time())
+    # GNU format: base-256 sizes, so members over 8 GiB are fine
+    return info.tobuf(format=tarfile.GNU_FORMAT)
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+async def _read_file(f: BinaryIO, size: int) -> AsyncIterator[bytes]:
+    left = size
+    while left > 0:
+        piece = await asyncio.to_thread(f.read, min(_PIECE, left))
+        if not piece:
+            raise RuntimeError(f"{getattr(f, 'name', 'file')} shrank while being archived")
+        left -= len(piece)
+        yield piece
+
+
+def _vector_dim(info: Dict[str, Any]) -> Optional[int]:
+    config = (info.get("result") or {}).get("config") or {}
+    vectors = (config.get("params") or config).get("vectors") or {}
+    return vectors.get("size") if isinstance(vectors, dict) else None
+
+
+class SnapshotExport:
+    """One collection as a tar stream: manifest, fingerprints, chunk store, Qdrant snapshot.
+
+    Every member's size is known before the first byte is sent (local files are
+    captured up front, Qdrant reports the snapshot size), so the archive has a
+    Content-Length and is produced without buffering more than one piece.
+    """
+
+    def __init__(self, manifest: Dict[str, Any], members: List[Tuple[str, int, Callable[[], AsyncIterator[bytes]]]], cleanup: Callable[[], Any]) -> None:
+        self.manifest = manifest
+        self._members = members
+        self._cleanup = cleanup
+        self._closed = False
+        self._manifest = json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8")
+
+    @property
+    def size(self) -> int:
+        sizes = [len(self._manifest)] + [size for _, size, _ in self._members]
+        return sum(tarfile.BLOCKSIZE + n + (-n % tarfile.BLOCKSIZE) for n in sizes) + 2 * tarfile.BLOCKSIZE
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        try:
+            yield _header(MANIFEST, len(self._manifest)) + self._manifest + _padding(len(self._manifest))
+            for name, size, source in self._members:
+                yield _header(name, size)
+                sent = 0
+                async for piece in source():
+                    sent += len(piece)
+                    yield piece
+                if sent != size:
+                    raise RuntimeError(f"{name}: sent {sent} bytes, announced {size}")
+                yield _padding(size)
+            yield b"\0" * (2 * tarfile.BLOCKSIZE)
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            await self._cleanup()
+
+
+async def prepare_export(collection: str, physical: str, qdr: Any, info: Dict[str, Any]) -> SnapshotExport:
+    """Capture the state of `physical` for streaming; `info` is its Qdrant collection info.
+
+    Capture order keeps a concurrent incremental index safe to restore:
+    fingerprints first (they never name a point missing from the Qdrant
+    snapshot, so nothing is wrongly skipped on the next index), the chunk store
+    last (it holds text for every point in the snapshot).
+    """
+    tmp = tempfile.mkdtemp(prefix=".snapshot-", dir=state_dir())
+    handles: List[BinaryIO] = []
+    snap_name: Optional[str] = None
+
+    async def cleanup() -> None:
+        for f in handles:
+            f.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+        if snap_name:
+            try:
+                await qdr.delete_snapshot(physical, snap_name)
+            except Exception:
+                pass
+
+    try:
+        t = time.perf_counter()
+        fp = FingerprintStore(physical)
+        fp_path = os.path.join(tmp, FINGERPRINTS)
+        fp.backup(fp_path)
+        # the config queries must be embedded with; other meta keys are local bookkeeping
+        embedding = {k: fp.meta().get(k) for k in ("provider", "model", "dim")}
+        fingerprints = fp.counts()
+        fp.close()
+
+        created = await qdr.create_snapshot(physical)
+        desc = created.get("result") if isinstance(created, dict) else None
+        if not desc or not desc.get("name"):
+            raise RuntimeError(f"qdrant snapshot failed: {created}")
+        snap_name = desc["name"]
+        points = await qdr.count(physical)
+
+        store = chunk_store(physical)
+        index_path = os.path.join(tmp, CHUNK_INDEX)
+        data, data_size = store.backup(index_path)
+        if data is not None:
+            handles.append(data)
+        with sqlite3.connect(index_path) as db:
+            chunks = int(db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0])
+        db.close()
+
+        def local(path: str) -> Callable[[], AsyncIterator[bytes]]:
+            def source() -> AsyncIterator[bytes]:
+                f = open(path, "rb")
+                handles.append(f)
+                return _read_file(f, os.path.getsize(path))
+            return source
+
+        members: List[Tuple[str, int, Callable[[], AsyncIterator[bytes]]]] = [
+            (FINGERPRINTS, os.path.getsize(fp_path), local(fp_path)),
+            (CHUNK_INDEX, os.path.getsize(index_path), local(index_path)),
+        ]
+        if data is not None:
+            members.append((CHUNK_DATA, data_size, lambda: _read_file(data, data_size)))
+        if desc.get("size") is not None:
+            members.append((QDRANT, int(desc["size"]), lambda: qdr.stream_snapshot(physical, snap_name)))
+        else:
+            # older Qdrant without sizes in the snapshot description: spool to disk first
+            spool = os.path.join(tmp, QDRANT)
+            with open(spool, "wb") as f:
+                async for piece in qdr.stream_snapshot(physical, snap_name):
+                    await asyncio.to_thread(f.write, piece)
+            members.append((QDRANT, os.path.getsize(spool), local(spool)))
+
+        if embedding.get("dim") is None:
+            embedding["dim"] = _vector_dim(info)
+        manifest = {
+            "format": FORMAT,
+            "collection": collection,
+            "physical": physical,
+            "created_at": time.time(),
+            "embedding": embedding,
+            "points": points,
+            "chunks": chunks,
+            "fingerprints": fingerprints,
+            "text_store": store.stats(),
+            "qdrant_snapshot": {k: desc.get(k) for k in ("name", "size", "checksum")},
+            "files": {name: size for name, size, _ in members},
+            "capture_ms": round((time.perf_counter() - t) * 1000, 1),
+        }
+        return SnapshotExport(manifest, members, cleanup)
+    except BaseException:
+        await cleanup()
+        raise
+
+
+class _Body:
+    """Sequential reader over an async byte stream (e.g. a request body)."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._it = chunks.__aiter__()
+        self._buf = b""
+
+    async def _more(self) -> bool:
+        try:
+            self._buf += await self._it.__anext__()
+            return True
+        except StopAsyncIteration:
+            return False
+
+    async def exactly(self, n: int) -> bytes:
+        while len(self._buf) < n:
+            if not await self._more():
+                raise SnapshotError("archive is truncated")
+        out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+    async def pieces(self, n: int) -> AsyncIterator[bytes]:
+        while n > 0:
+            if not self._buf and not await self._more():
+                raise SnapshotError("archive is truncated")
+            out, self._buf = self._buf[:n], self._buf[n:]
+            n -= len(out)
+            yield out
+
+
+async def restore_archive(body: AsyncIterator[bytes], physical: str, qdr: Any) -> Dict[str, Any]:
+    """Unpack an archive from SnapshotExport into the (new) physical collection `physical`.
+
+    Members are streamed to a temp dir in the state dir; the Qdrant snapshot is
+    then uploaded from disk (Qdrant recovers the collection with its stored
+    vectors and config, nothing is embedded) and the local files are moved into
+    place. Raises SnapshotError for a bad archive and RuntimeError for a failed
+    recovery; the caller drops whatever was created under `physical`.
+    """
+    tmp = tempfile.mkdtemp(prefix=".restore-", dir=state_dir())
+    timings: Dict[str, float] = {}
+    try:
+        t = time.perf_counter()
+        reader = _Body(body)
+        manifest: Optional[Dict[str, Any]] = None
+        received: Dict[str, int] = {}
+        digest = hashlib.sha256()
+        while True:
+            block = await reader.exactly(tarfile.BLOCKSIZE)
+            if block == b"\0" * tarfile.BLOCKSIZE:
+                break
+            try:
+                info = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+            except tarfile.HeaderError as e:
+                raise SnapshotError(f"bad tar header: {e}")
+            size = info.size
+            if info.name == MANIFEST:
+                if size > 16 << 20:
+                    raise SnapshotError("manifest too large")
+                try:
+                    manifest = json.loads(await reader.exactly(size))
+                except ValueError as e:  # bad JSON or encoding, not SnapshotError
+                    raise SnapshotError(f"unreadable manifest: {e}")
+                if manifest.get("format") != FORMAT:
+                    raise SnapshotError(f"unsupported snapshot format {manifest.get('format')}")
+            elif info.isfile() and info.name in (FINGERPRINTS, CHUNK_INDEX, CHUNK_DATA, QDRANT):
+                with open(os.path.join(tmp, info.name), "wb") as f:
+                    async for piece in reader.pieces(size):
+                        if info.name == QDRANT:
+                            digest.update(piece)
+                        await asyncio.to_thread(f.write, piece)
+                received[info.name] = size
+            else:  # pax/longname headers or unknown members
+                async for _ in reader.pieces(size):
+                    pass
+            await reader.exactly(-size % tarfile.BLOCKSIZE)
+        timings["receive"] = round((time.perf_counter() - t) * 1000, 1)
+
+        if manifest is None:
+            raise SnapshotError("archive has no manifest.json")
+        for name, size in (manifest.get("files") or {}).items():
+            if received.get(name) != size:
+                raise SnapshotError(f"{name}: expected {size} bytes, got {received.get(name)}")
+        checksum = (manifest.get("qdrant_snapshot") or {}).get("checksum")
+        if checksum and digest.hexdigest() != checksum:
+            raise SnapshotError("qdrant snapshot checksum mismatch")
+
+        t = time.perf_counter()
+        res = await qdr.upload_snapshot(physical, os.path.join(tmp, QDRANT))
+        if not isinstance(res, dict) or res.get("status") != "ok":
+            raise RuntimeError(f"qdrant recovery failed: {res}")
+        points = await qdr.count(physical)
+        timings["qdrant_recover"] = round((time.perf_counter() - t) * 1000, 1)
+        warnings: List[str] = []
+        if points != manifest.get("points"):
+            # the manifest count is taken next to the snapshot, not inside it
+            warnings.append(f"recovered {points} points, manifest counted {manifest.get('points')} (index ran during the snapshot?)")
+
+        if FINGERPRINTS in received:
+            os.replace(os.path.join(tmp, FINGERPRINTS), FingerprintStore(physical).path)
+        if CHUNK_INDEX in received:
+            store = ChunkStore(physical)
+            os.replace(os.path.join(tmp, CHUNK_INDEX), store.index_path)
+            if CHUNK_DATA in received:
+                # the data file name carries the store generation recorded in the index
+                os.replace(os.path.join(tmp, CHUNK_DATA), store.data_path)
+            store.close()
+            chunks = len(chunk_store(physical))
+            if chunks != manifest.get("chunks"):
+                raise RuntimeError(f"restored {chunks} chunks, archive has {manifest.get('chunks')}")
+        return {"manifest": manifest, "points": points, "qdrant": res, "timings_ms": timings, "warnings": warnings}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,15 @@
+from typing import Optional
+import os
+import re
+
+
+def state_dir() -> str:
+    """Directory for per-collection local state (fingerprints, stores); RAG_STATE_DIR overrides."""
+    path = os.getenv("RAG_STATE_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "rag_state"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def collection_path(collection: str, suffix: str, base_dir: Optional[str] = None) -> str:
+    safe = re.sub(r"[^\w.-]+", "_", collection) or "_"
+    return os.path.join(base_dir or state_dir(), f"{safe}{suffix}")
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import sys
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """Keep local RAG state (fingerprints, chunk store, aliases) and eval history per test."""
+    monkeypatch.setenv("RAG_STATE_DIR", str(tmp_path / "rag_state"))
+    monkeypatch.setenv("EVAL_OUT_DIR", str(tmp_path / "eval_out"))
+    return tmp_path / "rag_state"
+
+
+def _ok(result: Any = True) -> Dict[str, Any]:
+    return {"status": "ok", "result": result, "time": 0.0}
+
+
+def _err(msg: str) -> Dict[str, Any]:
+    return {"status": {"error": msg}, "time": 0.0}
+
+
+class MemoryQdrant:
+    """In-process stand-in for the Qdrant REST client (app.rag.indexer.Qdrant).
+
+    All instances share `self.server`, like clients of one node; collection
+    names in point operations resolve through aliases as in Qdrant.
+    """
+
+    def __init__(self, server: Dict[str, Any]) -> None:
+        self.server = server
+        self.calls: List[tuple] = server.setdefault("calls", [])
+
+    @property
+    def collections(self) -> Dict[str, Dict[str, Any]]:
+        return self.server.setdefault("collections", {})
+
+    @property
+    def aliases(self) -> Dict[str, str]:
+        return self.server.setdefault("aliases", {})
+
+    def _col(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.collections.get(self.aliases.get(name, name))
+
+    def _fail(self, op: str) -> Optional[Dict[str, Any]]:
+        failing = self.server.get("fail", {})
+        if op in failing:
+            exc = failing[op]
+            if isinstance(exc, Exception):
+                raise exc
+            return _err(f"{op} failed")
+        return None
+
+    async def create_collection(self, name: str, dim: int, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.calls.append(("create_collection", name))
+        if name in self.collections or name in self.aliases:
+            return _err(f"Collection `{name}` already exists!")
+        self.collections[name] = {"dim": dim, "points": {}}
+        return _ok()
+
+    async def collection_info(self, name: str) -> Dict[str, Any]:
+        col = self._col(name)
+        if col is None:
+            return _err(f"Collection `{name}` doesn't exist!")
+        return _ok({"points_count": len(col["points"]), "config": {"params": {"vectors": {"size": col["dim"]}}}})
+
+    async def count(self, name: str, exact: bool = True) -> int:
+        col = self._col(name)
+        return len(col["points"]) if col else 0
+
+    async def switch_alias(self, alias: str, collection: str) -> Dict[str, Any]:
+        self.calls.append(("switch_alias", alias, collection))
+        failed = self._fail("switch_alias")
+        if failed:
+            return failed
+        if collection not in self.collections:
+            return _err(f"Collection `{collection}` doesn't exist!")
+        if alias in self.collections:
+            return _err(f"Collection `{alias}` already exists!")
+        self.aliases[alias] = collection
+        return _ok()
+
+    async def list_aliases(self) -> Dict[str, Any]:
+        return _ok({"aliases": [{"alias_name": a, "collection_name": c} for a, c in self.aliases.items()]})
+
+    async def create_snapshot(self, name: str) -> Dict[str, Any]:
+        col = self._col(name)
+        if col is None:
+            return _err("not found")
+        body = json.dumps({"dim": col["dim"], "points": {str(k): v for k, v in col["points"].items()}}).encode()
+        snap = f"{name}-{len(self.server.setdefault('snapshots', {}))}.snapshot"
+        self.server["snapshots"][snap] = body
+        return _ok({"name": snap, "size": len(body), "checksum": hashlib.sha256(body).hexdigest()})
+
+    async def stream_snapshot(self, name: str, snapshot: str, chunk_bytes: int = 1 << 20):
+        body = self.server["snapshots"][snapshot]
+        for i in range(0, len(body), 1000):
+            yield body[i:i + 1000]
+
+    async def delete_snapshot(self, name: str, snapshot: str) -> Dict[str, Any]:
+        self.server.get("snapshots", {}).pop(snapshot, None)
+        return _ok()
+
+    async def upload_snapshot(self, name: str, path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            data = json.loads(f.read())
+        self.collections[name] = {"dim": data["dim"], "points": {int(k): v for k, v in data["points"].items()}}
+        return _ok()
+
+    async def upsert(self, name: str, vectors: Any, payloads: List[Dict[str, Any]], ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        self.calls.append(("upsert", name, len(payloads)))
+        failed = self._fail("upsert")
+        if failed:
+            return failed
+        col = self._col(name)
+        if col is None:
+            return _err(f"Collection `{name}` doesn't exist!")
+        vecs = np.asarray(vectors, dtype=np.float32)
+        for i, payload in enumerate(payloads):
+            pid = ids[i] if ids is not None else i
+            col["points"][pid] = {"vector": vecs[i].tolist(), "payload": dict(payload)}
+        return _ok({"points": len(payloads)})
+
+    async def delete_points(self, name: str, ids: List[int]) -> Dict[str, Any]:
+        col = self._col(name)
+        for pid in ids:
+            col["points"].pop(pid, None)
+        return _ok()
+
+    @staticmethod
+    def _select(payload: Dict[str, Any], with_payload: Any) -> Dict[str, Any]:
+        if isinstance(with_payload, dict) and "include" in with_payload:
+            return {k: v for k, v in payload.items() if k in with_payload["include"]}
+        if isinstance(with_payload, dict) and "exclude" in with_payload:
+            return {k: v for k, v in payload.items() if k not in with_payload["exclude"]}
+        return dict(payload)
+
+    def _search(self, col: Dict[str, Any], vector: Any, limit: int, with_payload: Any) -> List[Dict[str, Any]]:
+        q = np.asarray(vector, dtype=np.float32)
+        hits = [
+            {"id": pid, "version": 0, "score": float(np.dot(q, np.asarray(p["vector"], dtype=np.float32))), "payload": self._select(p["payload"], with_payload)}
+            for pid, p in col["points"].items()
+        ]
+        hits.sort(key=lambda h: -h["score"])
+        return hits[:limit]
+
+    async def retrieve(self, name: str, ids: List[int], with_payload: Any = True) -> Dict[str, Any]:
+        self.calls.append(("retrieve", name, len(ids)))
+        failed = self._fail("retrieve")
+        if failed:
+            return failed
+        col = self._col(name)
+        if col is None:
+            return _err(f"Collection `{name}` doesn't exist!")
+        points = col["points"]
+        return _ok([{"id": pid, "payload": self._select(points[pid]["payload"], with_payload)} for pid in ids if pid in points])
+
+    async def search(self, name: str, vector: Any, limit: int = 5, params: Optional[Dict[str, Any]] = None, with_payload: Any = True) -> Dict[str, Any]:
+        self.calls.append(("search", name))
+        failed = self._fail("search")
+        if failed:
+            return failed
+        col = self._col(name)
+        if col is None:
+            return _err(f"Collection `{name}` doesn't exist!")
+        return _ok(self._search(col, vector, limit, with_payload))
+
+    async def search_batch(self, name: str, vectors: Any, limit: int = 5, params: Optional[Dict[str, Any]] = None, with_payload: Any = True) -> Dict[str, Any]:
+        failed = self._fail("search")
+        if failed:
+            return failed
+        col = self._col(name)
+        if col is None:
+            return _err(f"Collection `{name}` doesn't exist!")
+        return _ok([self._search(col, v, limit, with_payload) for v in np.asarray(vectors, dtype=np.float32)])
+
+    async def list_collections(self) -> Dict[str, Any]:
+        return _ok({"collections": [{"name": n} for n in self.collections]})
+
+    async def delete_collection(self, name: str) -> Dict[str, Any]:
+        self.calls.append(("delete_collection", name))
+        failed = self._fail("delete_collection")
+        if failed:
+            return failed
+        if self.collections.pop(name, None) is None:
+            return _err(f"Collection `{name}` doesn't exist!")
+        for alias in [a for a, c in self.aliases.items() if c == name]:
+            del self.aliases[alias]
+        return _ok()
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    """Route the app's Qdrant client to one in-memory node; yields its server state."""
+    from app.rag import indexer
+
+    server: Dict[str, Any] = {}
+    monkeypatch.setattr(indexer, "Qdrant", lambda *a, **kw: MemoryQdrant(server))
+    return server
+
+
+@pytest.fixture
+def client(qdrant, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    monkeypatch.delenv("SELECTOR_API_KEY", raising=False)
+    return TestClient(app)
+
+
+@pytest.fixture
+def collection():
+    """A collection name no other test uses (the app keeps process-wide caches by name)."""
+    return f"test_{uuid.uuid4().hex[:10]}"
@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+import threading
+
+from app.core.changelog import CatalogStore
+
+
+def write_source(path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["category", "brand", "model", "price", "spec_json", "lifecycle_status", "updated_at"])
+        for i in range(20):
+            w.writerow(["server", "acme", f"m{i}", 100 + i, json.dumps({"cpu_cores": 8 + i}), "active", "2026-01-01"])
+
+
+def state(store):
+    snap = store.snapshot()
+    # the CSV round trip turns a missing status into ""
+    return {k: (p["price"], p["spec"], p["lifecycle_status"] or None) for k, p in snap.products.items()}, snap.version
+
+
+def ops(start, n):
+    out = []
+    for i in range(start, start + n):
+        out.append({"op": "patch", "category": "server", "brand": "acme", "model": f"m{i % 20}", "fields": {"price": 1000 + i, "spec": {"ram_gb": i}}})
+        if i % 7 == 0:
+            out.append({"op": "delete", "category": "server", "brand": "acme", "model": f"m{(i + 3) % 20}"})
+        if i % 5 == 0:
+            out.append({"op": "upsert", "category": "server", "brand": "acme", "model": f"m{(i + 3) % 20}", "fields": {"price": i}})
+    return out
+
+
+def test_log_replays_on_restart(tmp_path):
+    src = tmp_path / "products.csv"
+    write_source(src)
+    store = CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6)
+    for i in range(0, 60, 6):
+        store.apply(ops(i, 6))
+    store.apply([{"op": "patch", "category": "server", "brand": "acme", "model": "nope", "fields": {"price": 1}}])
+    again = CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6)
+    assert state(again) == state(store)
+    assert again.stats()["log_ops"] == store.stats()["log_ops"]
+
+
+def test_compaction_folds_log_and_keeps_state(tmp_path):
+    src = tmp_path / "products.csv"
+    write_source(src)
+    store = CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6)
+    for i in range(0, 30, 5):
+        store.apply(ops(i, 5))
+    before = state(store)
+    assert store.compact() == before[1]
+    assert store.stats()["log_ops"] == 0 and store.stats()["compacted"]
+    store.apply(ops(30, 3))
+    after = state(store)
+    again = CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6)
+    assert state(again) == after
+    assert again.stats()["log_ops"] == store.stats()["log_ops"] > 0
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_concurrent_compactions_lose_nothing(tmp_path):
+    src = tmp_path / "products.csv"
+    write_source(src)
+    # a low threshold keeps background compactions racing explicit ones
+    store = CatalogStore(str(src), state_dir=str(tmp_path), compact_every=3)
+    errors = []
+
+    def writer(start):
+        try:
+            for i in range(start, start + 40, 2):
+                store.apply(ops(i, 2))
+        except Exception as e:  # pragma: no cover - the failure being tested for
+            errors.append(e)
+
+    def compactor():
+        try:
+            for _ in range(20):
+                store.compact()
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(s,)) for s in (0, 100)] + [threading.Thread(target=compactor) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    store.compact()  # waits for a background run still in flight
+    final = state(store)
+    assert CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6).snapshot().version == final[1]
+    assert state(CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6)) == final
+
+
+def two_stores(tmp_path):
+    # two instances over the same files stand in for two API worker processes
+    src = tmp_path / "products.csv"
+    write_source(src)
+    return [CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6) for _ in range(2)]
+
+
+def test_processes_share_one_version_sequence(tmp_path):
+    a, b = two_stores(tmp_path)
+    versions = []
+    for i in range(0, 12, 2):
+        versions.append(a.apply(ops(i, 1))["version"])
+        versions.append(b.apply(ops(i + 1, 1))["version"])
+    assert versions == list(range(1, 13))
+    # each sees the other's appends without a restart
+    assert state(a) == state(b)
+    assert a.stats()["log_ops"] == b.stats()["log_ops"]
+
+
+def test_compaction_keeps_entries_of_other_processes(tmp_path):
+    a, b = two_stores(tmp_path)
+    a.apply(ops(0, 4))
+    b.apply(ops(4, 4))  # a has not looked at the log since
+    a.apply(ops(8, 4))
+    assert a.compact() == 3
+    b.apply(ops(12, 4))
+    assert state(a) == state(b)
+    assert state(a)[1] == 4
+    fresh = CatalogStore(str(tmp_path / "products.csv"), state_dir=str(tmp_path), compact_every=10**6)
+    assert state(fresh) == state(a)
+    # a second compaction replaces the versioned base and removes the old one
+    assert b.compact() == 4
+    assert state(a) == state(fresh) and a.stats()["log_ops"] == 0
+    assert sorted(n for n in os.listdir(tmp_path) if ".base." in n and n.endswith(".csv")) == ["products.base.4.csv"]
+
+
+def test_torn_tail_is_cut_before_the_next_append(tmp_path):
+    a, b = two_stores(tmp_path)
+    a.apply(ops(0, 2))
+    with open(a.log_path, "a", encoding="utf-8") as f:
+        f.write('{"v": 99, "op": "upsert", "categ')  # crash mid-append
+    b.apply(ops(2, 2))
+    assert state(a) == state(b) and state(a)[1] == 2
+    with open(a.log_path, encoding="utf-8") as f:
+        assert all(json.loads(line)["v"] in (1, 2) for line in f)
+
+
+def _append_from_process(src, state_dir, start):
+    store = CatalogStore(src, state_dir=state_dir, compact_every=7)
+    for i in range(start, start + 30):
+        store.apply([{"op": "upsert", "category": "server", "brand": "acme", "model": f"p{i}", "fields": {"price": i}}])
+    store.compact()
+
+
+def test_concurrent_processes_lose_nothing(tmp_path):
+    import multiprocessing
+
+    src = tmp_path / "products.csv"
+    write_source(src)
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_append_from_process, args=(str(src), str(tmp_path), s)) for s in (0, 100)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+    assert [p.exitcode for p in procs] == [0, 0]
+    store = CatalogStore(str(src), state_dir=str(tmp_path), compact_every=10**6)
+    snap = store.snapshot()
+    assert snap.version == 60
+    assert {k[2] for k in snap.products} >= {f"p{i}" for s in (0, 100) for i in range(s, s + 30)}
@@ -0,0 +1,70 @@
+import os
+
+from app.rag.chunk_store import ChunkStore, chunk_store, drop_chunk_store
+from app.rag.hybrid import bm25_registry
+
+
+def text(i, rev=0):
+    return f"chunk {i} revision {rev} " + "storage latency throughput " * (i % 7 + 1)
+
+
+def test_compaction_keeps_live_text_and_drops_dead_bytes(tmp_path):
+    store = ChunkStore("docs", base_dir=str(tmp_path), block_bytes=512)
+    store.put_many((f"c{i}", text(i)) for i in range(200))
+    first = store.data_path
+    # replacing most chunks leaves their old blocks dead; past half the file
+    # the live ones move to the next generation
+    store.put_many((f"c{i}", text(i, 1)) for i in range(0, 200, 3))
+    store.put_many((f"c{i}", text(i, 2)) for i in range(1, 200, 3))
+    store.delete(f"c{i}" for i in range(2, 200, 3))
+    assert store.data_path != first and not os.path.exists(first)
+    assert store.stats()["dead_bytes"] < store.stats()["stored_bytes"]
+
+    want = {f"c{i}": text(i, 1 if i % 3 == 0 else 2) for i in range(200) if i % 3 != 2}
+    assert store.get_many(list(want) + ["c2", "nope"]) == want
+    assert dict(store.items()) == want
+    store.compact()
+    assert store.stats()["dead_bytes"] == 0
+
+    store.close()
+    reopened = ChunkStore("docs", base_dir=str(tmp_path))
+    assert len(reopened) == len(want) and reopened.get("c3") == want["c3"]
+    assert reopened.missing(["c0", "c2"]) == ["c2"]
+
+
+def test_failed_upsert_stores_no_text(client, qdrant, collection):
+    docs = [{"id": "a", "text": "Tiered NVMe caches absorb write bursts before flushing to capacity disks."}]
+    qdrant["fail"] = {"upsert": True}
+    r = client.post("/api/rag/index", json={"collection": collection, "docs": docs})
+    assert r.status_code == 200 and r.json()["embedded"] == 1
+    assert len(chunk_store(collection)) == 0
+    assert bm25_registry.search(collection, "NVMe caches") == []
+
+    qdrant["fail"] = {}
+    r = client.post("/api/rag/index", json={"collection": collection, "docs": docs})
+    assert r.json()["qdrant"]["status"] == "ok"
+    assert len(chunk_store(collection)) == 1
+    assert bm25_registry.search(collection, "NVMe caches")
+
+
+def test_lost_text_falls_back_to_qdrant_payload(client, qdrant, collection, monkeypatch):
+    docs = [{"id": "a", "text": "Tiered NVMe caches absorb write bursts before flushing to capacity disks."}]
+    monkeypatch.setenv("RAG_TEXT_IN_QDRANT", "1")
+    client.post("/api/rag/index", json={"collection": collection, "docs": docs})
+    drop_chunk_store(collection)  # e.g. the state dir was not on a volume
+    # vector search fails, so the BM25 fallback answers with ids only
+    qdrant["fail"] = {"search": True}
+    search = {"collection": collection, "query": "NVMe caches", "topk": 1, "rerank": False, "semantic_cache": False}
+    payload = client.post("/api/rag/search", json=search).json()["hits"][0]["payload"]
+    assert payload["text"] == docs[0]["text"] and "text_missing" not in payload
+    # recovered text is written back to the store
+    assert list(chunk_store(collection).get_many([payload["id"]]).values()) == [docs[0]["text"]]
+
+
+def test_text_missing_everywhere_is_flagged(client, qdrant, collection):
+    docs = [{"id": "a", "text": "Tiered NVMe caches absorb write bursts before flushing to capacity disks."}]
+    client.post("/api/rag/index", json={"collection": collection, "docs": docs})
+    drop_chunk_store(collection)
+    search = {"collection": collection, "query": "NVMe caches", "topk": 1, "rerank": False, "semantic_cache": False}
+    payload = client.post("/api/rag/search", json=search).json()["hits"][0]["payload"]
+    assert payload.get("text") is None and payload["text_missing"] is True
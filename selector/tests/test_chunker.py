@@ -0,0 +1,62 @@
+from app.rag.chunker import approx_token_len, chunk_document, chunk_spans, paragraph_spans, sentence_spans
+
+TEXT = (
+    "Erasure coding spreads fragments over many nodes. A rack can fail without data loss!  "
+    "Hot volumes live on NVMe.\nCold objects move to disks after thirty days? "
+    "分布式存储采用纠删码。热数据放在NVMe上！冷数据迁移到大容量硬盘。\n\n"
+    "Second paragraph: the compute tier runs virtual machines on dual socket servers."
+)
+
+
+def test_sentence_spans_are_trimmed_offsets():
+    spans = sentence_spans(TEXT)
+    assert spans[0] == (0, TEXT.index("!") + 1)  # terminators: 。！？!? and newline
+    for s, e in spans:
+        seg = TEXT[s:e]
+        assert seg and seg == seg.strip()
+    assert "分布式存储采用纠删码。" in [TEXT[s:e] for s, e in spans]
+    assert [e for _, e in spans] == sorted(e for _, e in spans)
+
+
+def test_paragraph_spans_split_on_blank_lines():
+    spans = paragraph_spans(TEXT)
+    assert len(spans) == 2
+    assert TEXT[spans[1][0]:spans[1][1]].startswith("Second paragraph")
+
+
+def test_chunk_offsets_slice_the_source():
+    for strategy in ("sentence", "paragraph"):
+        chunks = chunk_document("d", TEXT, strategy=strategy, max_chars=80, overlap=20)
+        assert [c["chunk_id"] for c in chunks] == list(range(len(chunks)))
+        for c in chunks:
+            assert c["text"] == TEXT[c["start"]:c["end"]]
+        assert chunks[0]["start"] == 0 and chunks[-1]["end"] == len(TEXT.rstrip())
+
+
+def test_char_windows_respect_max_chars_and_overlap():
+    spans = sentence_spans(TEXT)
+    windows = chunk_spans(TEXT, spans, max_chars=80, overlap=20)
+    longest = max(e - s for s, e in spans)
+    for s, e in windows:
+        assert e - s <= max(80, longest + 20)
+    for (s0, e0), (s1, _) in zip(windows, windows[1:]):
+        assert s1 < e0  # consecutive windows share text
+        assert e0 - s1 <= 20
+    # without overlap windows tile the sentence spans
+    plain = chunk_spans(TEXT, spans, max_chars=80, overlap=0)
+    assert all(e0 <= s1 for (_, e0), (s1, _) in zip(plain, plain[1:]))
+
+
+def test_token_windows_never_exceed_budget():
+    text = TEXT + " " + "x" * 300  # one segment far over the budget
+    chunks = chunk_document("d", text, max_tokens=16, overlap=10, token_len=approx_token_len)
+    assert chunks
+    for c in chunks:
+        assert approx_token_len(c["text"]) <= 16
+        assert c["text"] == text[c["start"]:c["end"]]
+    assert chunks[-1]["end"] == len(text)
+
+
+def test_empty_text():
+    assert chunk_document("d", "") == []
+    assert chunk_spans("", []) == []
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.rag import crawl
+from app.rag.pool import discard_pool, get_process_pool, shutdown_pools
+
+
+@pytest.fixture(autouse=True)
+def _pools():
+    yield
+    shutdown_pools()
+
+
+def test_discard_terminates_hung_worker_without_cancelling_others():
+    pool = get_process_pool("test", 1)
+    hung = pool.submit(time.sleep, 60)
+    queued = pool.submit(time.sleep, 0)
+    while not hung.running():
+        time.sleep(0.01)
+    procs = list(pool._processes.values())
+
+    discard_pool("test", pool, terminate=True)
+
+    with pytest.raises(BrokenProcessPool):
+        queued.result(timeout=10)
+    assert not queued.cancelled()
+    for proc in procs:
+        proc.join(timeout=5)
+        assert not proc.is_alive()
+    assert get_process_pool("test", 1) is not pool
+
+
+def test_discard_leaves_a_replaced_pool_alone():
+    old = get_process_pool("test", 1)
+    discard_pool("test")
+    fresh = get_process_pool("test", 1)
+    discard_pool("test", old, terminate=True)
+    assert get_process_pool("test", 1) is fresh
+    assert fresh.submit(abs, -3).result(timeout=30) == 3
+
+
+def test_extract_text_in_pool():
+    html = "<html><body><article><h1>Storage</h1><p>" + "NVMe tiering for hot data. " * 40 + "</p></article></body></html>"
+    text = asyncio.run(crawl.extract_text(html, workers=1, timeout_s=10))
+    assert "NVMe tiering" in text
+
+
+def test_extract_text_resubmits_after_pool_recycle(monkeypatch):
+    calls = []
+    real = crawl._run_limited
+
+    async def flaky(pool, html, limit):
+        calls.append(pool)
+        if len(calls) == 1:
+            discard_pool("crawl", pool, terminate=True)
+            raise BrokenProcessPool("worker killed")
+        return await real(pool, html, limit)
+
+    monkeypatch.setattr(crawl, "_run_limited", flaky)
+    html = "<html><body><p>" + "Object storage erasure coding. " * 40 + "</p></body></html>"
+    text = asyncio.run(crawl.extract_text(html, workers=1, timeout_s=10))
+    assert "erasure coding" in text
+    assert len(calls) == 2 and calls[0] is not calls[1]
+
+
+def test_inline_extraction_is_bounded(monkeypatch):
+    monkeypatch.setattr(crawl, "_clean_html", lambda html: time.sleep(1.0) or "late")
+
+    async def timed():
+        t = time.perf_counter()
+        text = await crawl.extract_text("<p>x</p>", workers=0, timeout_s=0.1)
+        return text, time.perf_counter() - t
+
+    text, elapsed = asyncio.run(timed())  # asyncio.run itself joins the stray thread
+    assert text == "" and elapsed < 0.9
+    monkeypatch.setattr(crawl, "_clean_html", lambda html: "text")
+    assert asyncio.run(crawl.extract_text("<p>x</p>", workers=0, timeout_s=0.1)) == "text"
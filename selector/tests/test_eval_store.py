@@ -0,0 +1,83 @@
+import csv
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.rag.eval_store import CSV_HEADER, EvalStore
+
+
+def run_out(n, recall=0.5):
+    results = [
+        {"query": f"q{i}", "relevant_ids": ["a", "b"], "hit_ids": ["a", "c"], "recall@k": recall, "precision@k": 0.5, "latency_ms": 3.0}
+        for i in range(n)
+    ]
+    return {"results": results, "summary": {"Recall@k": recall, "Precision@k": 0.5, "Latency P95 (ms)": 3.0}}
+
+
+def test_concurrent_writers_and_readers(tmp_path):
+    store = EvalStore(str(tmp_path / "evals.sqlite"))
+    errors = []
+
+    def write(i):
+        store.record_run(f"c{i % 3}", run_out(20), topk=5)
+
+    def read(_):
+        try:
+            store.latest()
+            store.history("c0")
+        except Exception as e:  # pragma: no cover - the failure being tested for
+            errors.append(e)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: write(i) if i % 2 else read(i), range(60)))
+    assert not errors
+    assert sum(e["n"] for e in store.latest()) == 60  # latest run per collection, 20 rows each
+    assert len(store.history("c0", limit=100)) == 10
+
+
+def test_csv_stream_survives_thread_hops(tmp_path):
+    store = EvalStore(str(tmp_path / "evals.sqlite"))
+    rid = store.record_run("docs", run_out(1200), topk=5)
+    it = store.iter_csv(rid, batch=100)
+    parts = []
+    # a streaming response resumes the generator on any free worker thread
+    with ThreadPoolExecutor(4) as pool:
+        while True:
+            part = pool.submit(next, it, None).result()
+            if part is None:
+                break
+            parts.append(part)
+    rows = list(csv.reader(io.StringIO("".join(parts))))
+    assert rows[0] == CSV_HEADER
+    assert len(rows) == 1 + 1200 + 1
+    assert rows[1][:3] == ["q0", "a,b", "a,c"]
+    assert rows[-1][0] == "SUMMARY"
+
+
+def test_legacy_csv_import_and_trend(tmp_path):
+    with open(tmp_path / "docs_eval.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(CSV_HEADER)
+        w.writerow(["q", "a", "a", 1.0, 1.0, 2.0])
+        w.writerow(["SUMMARY", "", "", 1.0, 1.0, 2.0])
+    store = EvalStore(str(tmp_path / "evals.sqlite"))
+    now = time.time()
+    store.record_run("docs", run_out(2, recall=0.8), created_at=now - 3 * 86400)
+    store.record_run("other", run_out(2, recall=0.2), created_at=now - 9 * 86400)
+    store.record_run("other", run_out(2, recall=0.6), created_at=now - 1 * 86400)
+    latest = {e["collection"]: e for e in store.latest()}
+    assert latest["other"]["trend_7d"]["Recall@k"] == 0.4
+    assert len(store.history("docs")) == 2  # imported run + recorded one
+    assert latest["docs"]["conf_int"]["Recall@k"] is not None
+
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    store = EvalStore(str(tmp_path / "evals.sqlite"))
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(id(store._db()))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert id(store._db()) not in seen
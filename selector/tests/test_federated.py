@@ -0,0 +1,85 @@
+import asyncio
+import random
+
+from app.rag.federated import merge_ranked, rank_score
+from app.rag.rerank import rerank_cache, rerank_hits
+
+DOCS = [
+    {"id": "vm", "text": "Virtualization clusters size vCPU and memory from concurrency; NVMe datastores hold hot VM disks."},
+    {"id": "net", "text": "Spine-leaf fabrics with 25G server ports carry east-west traffic between application tiers."},
+]
+
+
+def ranked_lists(rng, names):
+    out = {}
+    for name in names:
+        hits = [{"id": f"{name}-{i}", "score": rng.random()} for i in range(rng.randint(0, 12))]
+        for h in hits[::3]:
+            h["combo_score"] = rng.random()  # fused lists order by combo_score
+        out[name] = sorted(hits, key=rank_score, reverse=True)
+    return out
+
+
+def test_merge_ranked_matches_sorting_everything():
+    rng = random.Random(7)
+    for _ in range(200):
+        ranked = ranked_lists(rng, ["a", "b", "c", "d"])
+        weights = {n: rng.choice([0.0, -1.0, 0.5, 1.0, 2.0]) for n in ranked if rng.random() < 0.8}
+        limit = rng.randint(0, 30)
+        flat = [
+            dict(h, collection=n, weighted_score=weights.get(n, 1.0) * rank_score(h))
+            for n, hits in ranked.items() if weights.get(n, 1.0) > 0 for h in hits
+        ]
+        # stable sort of the concatenation: ties keep collection order, then list order
+        want = sorted(flat, key=lambda h: h["weighted_score"], reverse=True)[:limit]
+        assert merge_ranked(ranked, weights, limit) == want
+
+
+def test_merge_ranked_copies_hits():
+    hits = [{"id": 1, "score": 0.5}]
+    merged = merge_ranked({"a": hits}, {}, 5)
+    assert merged == [{"id": 1, "score": 0.5, "collection": "a", "weighted_score": 0.5}]
+    assert hits == [{"id": 1, "score": 0.5}]
+
+
+def test_rerank_keeps_colliding_ids_of_collections_apart():
+    rerank_cache.clear()
+    query = "nvme storage for virtual machines"
+    hits = [
+        {"id": 1, "collection": "cooling", "weighted_score": 0.9, "payload": {"id": "doc::0", "text": "rack cooling and power budget"}},
+        {"id": 1, "collection": "storage", "weighted_score": 0.8, "payload": {"id": "doc::0", "text": "NVMe storage for virtual machines"}},
+    ]
+    out, info = asyncio.run(rerank_hits(query, hits, budget_ms=None, collection="ignored", weight=1.0))
+    assert info["cached"] == 0
+    assert [h["collection"] for h in out] == ["storage", "cooling"]
+    assert out[0]["rerank_score"] > out[1]["rerank_score"]
+    # cached under each hit's own collection
+    assert rerank_cache.get_many("storage", "lexical", query, ["doc::0"]) == {"doc::0": out[0]["rerank_score"]}
+    assert not rerank_cache.get_many("ignored", "lexical", query, ["doc::0"])
+    _, again = asyncio.run(rerank_hits(query, hits, budget_ms=None, collection="ignored", weight=1.0))
+    assert again["cached"] == 2
+
+
+def test_federated_search_reranks_per_collection(client, collection):
+    a, b = collection + "_a", collection + "_b"
+    for name, doc in ((a, DOCS[0]), (b, DOCS[1])):
+        # the same document id in both: equal chunk ids, equal Qdrant point ids
+        r = client.post("/api/rag/index", json={"collection": name, "docs": [{**doc, "id": "same"}], "provider": "hash"})
+        assert r.status_code == 200
+    body = {"collections": [a, b], "query": "spine leaf 25G fabric", "provider": "hash", "rerank_weight": 1.0}
+    hits = client.post("/api/rag/search", json=body).json()["hits"]
+    assert [h["collection"] for h in hits] == [b, a]
+    assert hits[0]["rerank_score"] > hits[1]["rerank_score"]
+    assert "Spine-leaf" in hits[0]["payload"]["text"] and "Virtualization" in hits[1]["payload"]["text"]
+
+
+def test_failed_federated_evidence_is_not_cached(client, qdrant, collection):
+    a, b = collection + "_a", collection + "_b"
+    for name in (a, b):
+        assert client.post("/api/rag/index", json={"collection": name, "docs": DOCS, "provider": "hash"}).status_code == 200
+    body = {"scenario": "virtualization", "provider": "hash", "evidence_query": "vm storage sizing", "collections": [a, b]}
+    qdrant["fail"] = {"search": "error body"}
+    r = client.post("/api/recommend", json=body)
+    assert r.status_code == 200 and "etag" not in r.headers
+    qdrant["fail"] = {}
+    assert "etag" in client.post("/api/recommend", json=body).headers
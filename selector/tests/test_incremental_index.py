@@ -0,0 +1,62 @@
+from app.rag.fingerprints import FingerprintStore
+from app.rag.preprocess import embedding_salt
+
+DOCS = [
+    {"id": "a", "text": "Erasure coded object storage keeps durability high while using less raw capacity than replication."},
+    {"id": "b", "text": "NVMe flash tiers serve hot virtual machine disks with low latency and high IOPS per rack unit."},
+]
+
+
+def index(client, collection, **extra):
+    r = client.post("/api/rag/index", json={"collection": collection, "docs": DOCS, **extra})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_salt_uses_resolved_config():
+    assert embedding_salt({"provider": "hash", "model": None, "dim": 384}) == "hash::384"
+    assert embedding_salt({"provider": "openai", "model": "m", "dim": 1536}) != embedding_salt({"provider": "openai", "model": "m", "dim": 256})
+
+
+def test_auto_provider_records_resolved_config_and_skips_unchanged(client, collection, monkeypatch):
+    monkeypatch.setenv("EMBED_FALLBACK", "hash")
+    for key in ("OPENAI_API_KEY", "QWEN_API_KEY", "DASHSCOPE_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setenv("OLLAMA_BASE_URL", "http://127.0.0.1:9")
+
+    first = index(client, collection)
+    assert first["embedded"] > 0 and first["provider"] == "hash"
+    fp = FingerprintStore(collection)
+    meta = fp.meta()
+    assert {k: meta[k] for k in ("provider", "model", "dim")} == {"provider": "hash", "model": None, "dim": 384}
+    fp.close()
+
+    # "auto" resolves to the recorded provider again: nothing is re-embedded
+    assert index(client, collection)["embedded"] == 0
+    # naming the recorded provider explicitly is the same config
+    assert index(client, collection, provider="hash")["embedded"] == 0
+
+
+def test_changed_provider_reembeds_everything(client, collection):
+    first = index(client, collection, provider="hash")
+    total = first["embedded"]
+    out = index(client, collection, provider="fake")
+    assert out["embedded"] == total and out["skipped"] == 0
+    fp = FingerprintStore(collection)
+    assert fp.meta()["provider"] == "fake"
+    fp.close()
+
+
+def test_auto_resolving_elsewhere_reembeds_skipped_chunks(client, collection, monkeypatch):
+    for key in ("OPENAI_API_KEY", "QWEN_API_KEY", "DASHSCOPE_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setenv("OLLAMA_BASE_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("EMBED_FALLBACK", "fake")
+    total = index(client, collection, provider="hash")["embedded"]
+
+    # one doc edited; "auto" now lands on another provider than the rest was embedded with
+    DOCS_EDITED = [DOCS[0], {"id": "b", "text": DOCS[1]["text"] + " Dual controllers keep it available."}]
+    r = client.post("/api/rag/index", json={"collection": collection, "docs": DOCS_EDITED})
+    out = r.json()
+    assert out["provider"] == "fake"
+    assert out["skipped"] == 0 and out["embedded"] >= total
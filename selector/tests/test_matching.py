@@ -0,0 +1,76 @@
+import itertools
+
+import numpy as np
+
+from app.core.matching import build_index, category_options, sku_capacity
+
+
+def server(model, price, **spec):
+    return {"category": "server", "brand": "acme", "model": model, "price": price, "lifecycle_status": "active", "spec": spec}
+
+
+NEED = {"vcpu": 100, "memory_gb": 600, "storage_tb": 150, "iops": 100000}
+
+
+def test_unstated_capacity_is_unknown_not_invented():
+    assert sku_capacity(server("s", 1, cpu_sockets=2)) == {}
+    assert sku_capacity(server("s", 1, cpu_sockets=2, cores_per_socket=16, storage_tb=0)) == {"vcpu": 64.0, "storage_tb": 0.0}
+    sw = {"category": "switch", "spec": {"ports_100g": 4}}
+    assert sku_capacity(sw) == {"fabric_gbps": 400.0} and sku_capacity({"category": "switch", "spec": {}}) == {}
+
+    # sockets without cores used to count as 16 cores per socket
+    vague = server("vague", 100, cpu_sockets=2, memory_max_gb=1024, storage_tb=200, iops=10**6)
+    options, info = category_options(build_index([vague])["server"], NEED)
+    assert info["uncovered"] == ["vcpu"] and info["unknown"] == {"vcpu": 1}
+    assert options[0]["lines"][0]["unknown"] == ["vcpu"]
+    # with a SKU that states vcpu, that one covers it
+    cpu = server("cpu", 1000, vcpu=64)
+    options, info = category_options(build_index([vague, cpu])["server"], NEED)
+    assert info["uncovered"] == [] and info["unknown"]["vcpu"] == 1
+    assert {l["model"]: l["qty"] for l in options[0]["lines"]} == {"vague": 1, "cpu": 2}
+
+
+def test_complementary_skus_are_mixed():
+    compute = server("compute", 10000, vcpu=64, memory_max_gb=512)
+    storage = server("storage", 5000, storage_tb=100, iops=10**6)
+    idx = build_index([compute, storage])["server"]
+    options, info = category_options(idx, NEED)
+    assert info["unknown"] == {"vcpu": 1, "memory_gb": 1, "storage_tb": 1, "iops": 1}
+    assert len(options) == 1
+    best = options[0]
+    assert best["cost"] == 30000 and best["units"] == 4
+    lines = {l["model"]: l for l in best["lines"]}
+    assert lines["compute"]["qty"] == 2 and lines["compute"]["unknown"] == ["storage_tb", "iops"]
+    assert lines["storage"]["qty"] == 2 and lines["storage"]["unknown"] == ["vcpu", "memory_gb"]
+
+
+def brute_force(products, need, max_units=64):
+    """Cheapest cover with one model or two, over every unit count."""
+    caps = [np.array([sku_capacity(p).get(d, 0.0) for d in need]) for p in products]
+    want = np.array(list(need.values()), dtype=float)
+    best = np.inf
+    for a, b in itertools.combinations_with_replacement(range(len(products)), 2):
+        for na in range(0, max_units + 1):
+            for nb in range(max_units + 1 - na):
+                if na + nb == 0 or (a == b and nb):
+                    continue
+                if np.all(caps[a] * na + caps[b] * nb >= want - 1e-9):
+                    best = min(best, na * products[a]["price"] + nb * products[b]["price"])
+                    break
+    return best
+
+
+def test_mix_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for _ in range(12):
+        products = []
+        for i in range(6):
+            spec = {}
+            for key, hi in (("vcpu", 128), ("memory_max_gb", 1024), ("storage_tb", 120), ("iops", 500000)):
+                if rng.random() < 0.6:
+                    spec[key] = int(rng.integers(1, hi))
+            products.append(server(f"m{i}", int(rng.integers(1000, 20000)), **spec))
+        need = {"vcpu": 200, "memory_gb": 900, "storage_tb": 100, "iops": 200000}
+        options, _ = category_options(build_index(products)["server"], need, k=3)
+        want = brute_force(products, need)
+        assert (options[0]["cost"] if options else np.inf) == want
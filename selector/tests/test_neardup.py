@@ -0,0 +1,86 @@
+import numpy as np
+
+from app.rag.neardup import MinHasher, NearDupIndex, dedup_chunks, lsh_params, shingle_hashes
+from app.rag.preprocess import filter_and_normalize, prepare_docs, select_docs
+
+BASE = (
+    "The storage cluster uses erasure coding with eight data and three parity fragments, "
+    "spreading them over eleven nodes in three racks so a full rack can fail without data loss. "
+    "Hot volumes sit on NVMe and cold objects move to high capacity disks after thirty days."
+)
+EDITED = BASE.replace("thirty days", "thirty-one days")
+OTHER = (
+    "The compute tier runs virtual machines on dual socket servers with 512 GB of memory each; "
+    "live migration keeps workloads running during firmware updates and host maintenance windows."
+)
+
+
+def jaccard(a: str, b: str) -> float:
+    x, y = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(x & y) / len(x | y)
+
+
+def test_shingles_ignore_case_and_whitespace():
+    assert np.array_equal(shingle_hashes("Erasure   Coding\n"), shingle_hashes("erasure coding"))
+    assert shingle_hashes("").size == 1
+    assert shingle_hashes("abc", k=5).size == 1  # shorter than k: one shingle of the whole text
+
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    for a, b in ((BASE, EDITED), (BASE, OTHER)):
+        est = float(np.mean(hasher.signature(a) == hasher.signature(b)))
+        assert abs(est - jaccard(a, b)) < 0.1
+
+
+def test_lsh_params_put_the_s_curve_at_the_threshold():
+    for threshold in (0.5, 0.8, 0.9):
+        b, r = lsh_params(threshold, 128)
+        assert b * r <= 128
+        # probability of becoming a candidate is ~1/2 around the threshold
+        inflection = (1.0 / b) ** (1.0 / r)
+        assert abs(inflection - threshold) < 0.15
+
+
+def test_index_finds_near_duplicates_only():
+    index = NearDupIndex(threshold=0.8)
+    assert index.add_if_new("base", BASE) is None
+    assert index.add_if_new("edited", EDITED) == "base"
+    assert index.add_if_new("other", OTHER) is None
+    assert index._keys == ["base", "other"]
+
+
+def test_dedup_chunks_keeps_first_occurrence():
+    chunks = [
+        {"doc_id": "a", "chunk_id": 0, "text": BASE},
+        {"doc_id": "b", "chunk_id": 0, "text": OTHER},
+        {"doc_id": "c", "chunk_id": 3, "text": EDITED},
+    ]
+    kept, dropped = dedup_chunks(chunks, threshold=0.8)
+    assert dropped == 1
+    assert [c["doc_id"] for c in kept] == ["a", "b"]
+
+
+def test_precomputed_signatures_match_inline_selection():
+    docs = [{"id": "a", "text": BASE}, {"id": "b", "text": EDITED}, {"id": "c", "text": OTHER}, {"id": "d", "text": BASE}, {"id": "e", "text": "short"}]
+    kept, stats = filter_and_normalize(docs, near_dup_threshold=0.8)
+    assert [d["id"] for d in kept] == ["a", "c"]
+    assert stats == {"input": 5, "kept": 2, "too_short": 1, "dedup": 1, "near_dup": 1, "near_dup_ids": ["b"]}
+    # signatures computed by the index itself (no worker precompute) give the same result
+    assert select_docs(prepare_docs(docs, near_dup=False), 0.8) == (kept, stats)
+
+
+def test_near_dup_removal_is_opt_in_and_retires_old_chunks(client, collection):
+    from app.rag.chunk_store import chunk_store
+
+    docs = [{"id": "a", "text": BASE}, {"id": "b", "text": OTHER}, {"id": "c", "text": EDITED}]
+    first = client.post("/api/rag/index", json={"collection": collection, "docs": docs}).json()
+    assert first["filter_stats"]["near_dup"] == 0 and first["embedded"] == 3  # off by default
+    assert not chunk_store(collection).missing(["c::0"])
+
+    again = client.post("/api/rag/index", json={"collection": collection, "docs": docs, "near_dup_threshold": 0.8}).json()
+    assert again["filter_stats"]["near_dup_ids"] == ["c"]
+    assert again["deleted"] == 1 and again["embedded"] == 0
+    assert chunk_store(collection).missing(["a::0", "c::0"]) == ["c::0"]
+    hits = client.post("/api/rag/search", json={"collection": collection, "query": "thirty-one days", "topk": 5, "semantic_cache": False}).json()["hits"]
+    assert "c::0" not in {h["payload"]["id"] for h in hits}
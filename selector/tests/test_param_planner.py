@@ -0,0 +1,62 @@
+import itertools
+
+import pytest
+
+from app.core.param_planner import plan_parameters, plan_sweep
+
+GRID = {
+    "qps_peak": [50, 333, 2500.5],
+    "latency_p95_ms": [35, 150, 900],
+    "payload_kb": [0.5, 8, 63],
+    "growth_12m": [1.0, 1.7, 3.3],
+    "cache_hit_ratio": [0.0, 0.69, 0.7, 0.95],
+    "hot_capacity_tb": [0.15, 4.0],
+}
+BASE = {"scenario": "rag", "current": {"reads_per_request": 1.5, "writes_per_request": 0.35}}
+
+
+def scalar(point):
+    plan = plan_parameters({**BASE, "current": {**BASE["current"], **point}})
+    c, s, n = plan["compute"], plan["storage"], plan["network"]
+    return {
+        "concurrency_12m": c["concurrency_12m"],
+        "vcpu_min": c["vcpu_range"][0],
+        "vcpu_max": c["vcpu_range"][1],
+        "memory_gb_min": c["memory_gb_range"][0],
+        "memory_gb_max": c["memory_gb_range"][1],
+        "iops_required": s["iops_required"],
+        "throughput_mb_s": s["throughput_mb_s"],
+        "north_south_gbps": n["north_south_gbps"],
+        "east_west_gbps": n["east_west_gbps"],
+        "max_connections": n["max_connections"],
+        "hot_capacity_tb": s["hot_capacity_tb"],
+    }
+
+
+def test_sweep_matches_scalar_planner_point_for_point():
+    out = plan_sweep(BASE, GRID)
+    names = list(GRID)
+    points = list(itertools.product(*GRID.values()))
+    assert out["points"] == len(points)
+    for i, values in enumerate(points):
+        point = dict(zip(names, values))
+        assert {k: out["inputs"][k][i] for k in names} == pytest.approx(point)
+        assert {k: v[i] for k, v in out["outputs"].items()} == scalar(point), point
+
+
+def test_unswept_inputs_come_from_current():
+    out = plan_sweep({"current": {"qps_peak": 1200}}, {"payload_kb": [4, 16]})
+    assert out["outputs"]["throughput_mb_s"] == [round(1200 * 4 / 1024, 2), round(1200 * 16 / 1024, 2)]
+
+
+def test_sweep_rejects_unknown_axes_and_oversized_grids():
+    with pytest.raises(ValueError):
+        plan_sweep({}, {"budget": [1, 2]})
+    with pytest.raises(ValueError):
+        plan_sweep({}, {"qps_peak": list(range(1000)), "payload_kb": list(range(1000))}, max_points=10_000)
+
+
+def test_memoized_plans_are_independent_copies():
+    a = plan_parameters(BASE)
+    a["compute"]["vcpu_range"].append(99)
+    assert plan_parameters(BASE)["compute"]["vcpu_range"] != a["compute"]["vcpu_range"]
@@ -0,0 +1,76 @@
+from app.core.reco_cache import RecommendationCache, collection_version, etag_for, etag_matches
+from app.rag.aliases import aliases
+from app.rag.fingerprints import FingerprintStore
+
+DOCS = [
+    {"id": "vm", "text": "Virtualization clusters size vCPU and memory from concurrency; NVMe datastores hold hot VM disks."},
+    {"id": "net", "text": "Spine-leaf fabrics with 25G server ports carry east-west traffic between application tiers."},
+]
+REQ = {"scenario": "virtualization", "current": {"qps_peak": 800}, "provider": "hash", "evidence_query": "vm storage sizing"}
+
+
+def test_version_comes_from_persisted_state(collection):
+    other_worker = RecommendationCache()
+    key = RecommendationCache().key({"collection": collection})
+    assert other_worker.key({"collection": collection}) == key
+
+    fp = FingerprintStore(collection)
+    fp.set_meta(content_version="t1")
+    fp.close()
+    changed = RecommendationCache().key({"collection": collection})
+    assert changed != key
+    assert collection_version(collection) == f"{collection}:t1"
+
+    aliases.set(collection, collection + "__v1")
+    assert RecommendationCache().key({"collection": collection}) != changed
+    assert other_worker.key({"collection": collection}) == RecommendationCache().key({"collection": collection})
+
+
+def test_bump_frees_entries_of_that_collection():
+    cache = RecommendationCache()
+    cache.put("k1", "a", {"x": 1})
+    cache.put("k2", ["a", "b"], {"x": 2})
+    cache.put("k3", "b", {"x": 3})
+    cache.bump("a")
+    assert (cache.get("k1"), cache.get("k2"), cache.get("k3")) == (None, None, {"x": 3})
+
+
+def test_etag_matching():
+    tag = etag_for("abc")
+    assert etag_matches(f'W/{tag}, "zzz"', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches(None, tag)
+    assert etag_for("abc", "md") == '"abc.md"'
+
+
+def test_etag_changes_with_index_runs_in_every_worker(client, collection):
+    from app.main import RecommendRequest
+
+    body = {**REQ, "collection": collection}
+
+    def other_worker_etag():
+        return etag_for(RecommendationCache().key(RecommendRequest(**body).model_dump()))
+
+    assert client.post("/api/rag/index", json={"collection": collection, "docs": DOCS, "provider": "hash"}).status_code == 200
+    etag = client.post("/api/recommend", json=body).headers["etag"]
+    assert etag == other_worker_etag()
+    assert client.post("/api/recommend", json=body, headers={"If-None-Match": etag}).status_code == 304
+
+    # an unchanged re-index keeps the ETag; an edit changes it everywhere
+    client.post("/api/rag/index", json={"collection": collection, "docs": DOCS, "provider": "hash"})
+    assert client.post("/api/recommend", json=body).headers["etag"] == etag
+    edited = [DOCS[0], {**DOCS[1], "text": DOCS[1]["text"] + " Uplinks run at 100G."}]
+    client.post("/api/rag/index", json={"collection": collection, "docs": edited, "provider": "hash"})
+    new = client.post("/api/recommend", json=body, headers={"If-None-Match": etag})
+    assert new.status_code == 200 and new.headers["etag"] != etag
+    assert new.headers["etag"] == other_worker_etag()
+
+
+def test_qdrant_error_body_is_not_cached(client, qdrant, collection):
+    assert client.post("/api/rag/index", json={"collection": collection, "docs": DOCS, "provider": "hash"}).status_code == 200
+    qdrant["fail"] = {"search": "error body"}
+    r = client.post("/api/recommend", json={**REQ, "collection": collection, "evidence_query": "spine leaf fabric"})
+    assert r.status_code == 200 and "etag" not in r.headers
+    qdrant["fail"] = {}
+    r = client.post("/api/recommend", json={**REQ, "collection": collection, "evidence_query": "spine leaf fabric"})
+    assert "etag" in r.headers
@@ -0,0 +1,165 @@
+import csv
+import json
+import sqlite3
+import sys
+import types
+from contextlib import contextmanager
+
+import pytest
+
+from app.core import repository
+from app.core.catalog import load_products
+from app.core.repository import CatalogRepository
+
+
+PRODUCTS = [
+    ("server", "acme", "s1", 9000, {"cpu_sockets": 2, "cores_per_socket": 16, "memory_max_gb": 512}, "active"),
+    ("server", "acme", "s2", 15000, {"cpu_sockets": 2, "cores_per_socket": 32, "memory_max_gb": 1024}, "active"),
+    ("server", "zeta", "s3", "", {"cpu_sockets": 1, "cores_per_socket": 8}, "eol"),
+    ("switch", "acme", "w1", 4000, {"ports_10g": 48, "ports_100g": 4}, "active"),
+    ("security", "zeta", "f1", 20000, {"fw_throughput_gbps": 20}, "active"),
+]
+
+
+def write_catalog(tmp_path, rows=PRODUCTS):
+    products = tmp_path / "products.csv"
+    with open(products, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["category", "brand", "model", "price", "spec_json", "lifecycle_status", "updated_at"])
+        for category, brand, model, price, spec, status in rows:
+            w.writerow([category, brand, model, price, json.dumps(spec), status, "2026-01-01"])
+    caps = tmp_path / "capabilities.csv"
+    with open(caps, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["category", "template", "params_json", "notes", "updated_at"])
+        w.writerow(["server", "virt", json.dumps({"scenarios": ["virtualization"]}), "", "2026-01-01"])
+        w.writerow(["switch", "campus", json.dumps({"scenarios": ["campus_access"]}), "", "2026-01-01"])
+    return str(products), str(caps)
+
+
+class _PgConn:
+    """psycopg-shaped connection over SQLite: takes %s placeholders only, so
+    the Postgres code path (_sql translation, conn.transaction()) runs the
+    statements it would send to Postgres."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+
+    def _sql(self, sql):
+        assert "?" not in sql, sql
+        return sql.replace("%s", "?")
+
+    def execute(self, sql, params=()):
+        return self.db.execute(self._sql(sql), params)
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def executemany(self, sql, rows):
+                return conn.db.executemany(conn._sql(sql), rows)
+
+        return Cursor()
+
+    @contextmanager
+    def transaction(self):
+        self.db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def close(self):
+        self.db.close()
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def repo(request, tmp_path, monkeypatch):
+    if request.param == "postgres":
+        path = str(tmp_path / "pg.sqlite")
+        monkeypatch.setitem(sys.modules, "psycopg", types.SimpleNamespace(connect=lambda url, autocommit: _PgConn(path)))
+        r = CatalogRepository("postgresql://ict:ict@db:5432/ict")
+        assert r.is_pg
+    else:
+        r = CatalogRepository("sqlite:///" + str(tmp_path / "catalog.sqlite"))
+    yield r
+    r.close()
+
+
+def test_sync_loads_products_and_capabilities(repo, tmp_path):
+    products, caps = write_catalog(tmp_path)
+    assert repo.sync_from_csv(products, caps)
+    assert repo.version() == 1
+    assert repo.counts() == {"server": 3, "switch": 1, "security": 1}
+    # rows round-trip with their spec and derived metrics
+    key = lambda p: (p["category"], p["brand"], p["model"])
+    assert sorted(repo.query_products(), key=key) == sorted(load_products(products), key=key)
+    assert [c["template"] for c in repo.capabilities("server")] == ["virt"]
+    assert len(repo.capabilities()) == 2
+
+    # unchanged sources are not reloaded; a rewritten one is
+    assert not repo.sync_from_csv(products, caps)
+    write_catalog(tmp_path, PRODUCTS[:2])
+    assert repo.sync_from_csv(products, caps)
+    assert repo.version() == 2 and repo.counts() == {"server": 2}
+
+
+def test_query_filters(repo, tmp_path):
+    repo.sync_from_csv(*write_catalog(tmp_path))
+    models = lambda **kw: [p["model"] for p in repo.query_products(**kw)]
+    assert models(categories=["server"]) == ["s1", "s2", "s3"]
+    assert models(categories=["server", "switch"], brands=["acme"]) == ["s1", "s2", "w1"]
+    # unpriced rows stay eligible under a budget, as in hard_constraints_ok
+    assert models(max_price=10000) == ["s1", "s3", "w1"]
+    assert models(lifecycle_status=["eol"]) == ["s3"]
+    assert models(categories=["server"], limit=2) == ["s1", "s2"]
+    assert models(brands=["nobody"]) == []
+
+
+def test_writes_bump_version_and_invalidate_cache(repo, tmp_path):
+    repo.sync_from_csv(*write_catalog(tmp_path))
+    before = repo.query_products(categories=["server"])
+    assert repo.query_products(categories=["server"]) is before  # cached
+    s1 = dict(before[0], price=8000.0)
+    repo.upsert_products([s1])
+    assert repo.version() == 2
+    assert repo.query_products(categories=["server"])[0]["price"] == 8000.0
+    repo.delete_products([("server", "zeta", "s3")])
+    assert repo.version() == 3
+    assert [p["model"] for p in repo.query_products(categories=["server"])] == ["s1", "s2"]
+
+
+def test_version_is_shared_between_connections(tmp_path):
+    url = "sqlite:///" + str(tmp_path / "catalog.sqlite")
+    a, b = CatalogRepository(url), CatalogRepository(url)
+    a.sync_from_csv(*write_catalog(tmp_path))
+    assert len(b.query_products(categories=["server"])) == 3
+    a.delete_products([("server", "acme", "s1")])
+    # b's cache is keyed by the version a bumped
+    assert len(b.query_products(categories=["server"])) == 2
+    a.close()
+    b.close()
+
+
+def _select_client(client, tmp_path, monkeypatch, db_url):
+    products, caps = write_catalog(tmp_path)
+    monkeypatch.setenv("CATALOG_CSV", products)
+    monkeypatch.setenv("CAPABILITIES_CSV", caps)
+    monkeypatch.setenv("CATALOG_DB_URL", db_url)
+    monkeypatch.setattr(repository, "_repo", None)
+    body = {"scenario": "virtualization", "constraints": {"budget": 10000, "brand_prefer": ["acme"]}}
+    r = client.post("/api/select", json=body)
+    assert r.status_code == 200
+    return [c["model"] for c in r.json()["candidates"]]
+
+
+def test_select_falls_back_to_csv_when_the_database_is_unavailable(client, tmp_path, monkeypatch):
+    from_db = _select_client(client, tmp_path, monkeypatch, "sqlite:///" + str(tmp_path / "catalog.sqlite"))
+    assert repository._repo.version() == 1  # answered by the repository
+    repository._repo.close()
+    # compose points CATALOG_DB_URL at Postgres; without psycopg the repository raises
+    monkeypatch.setitem(sys.modules, "psycopg", None)
+    from_csv = _select_client(client, tmp_path, monkeypatch, "postgresql://ict:ict@db:5432/ict")
+    assert from_db == from_csv == ["s1"]
@@ -0,0 +1,59 @@
+import asyncio
+
+from app.rag.rerank import RerankCache, rerank_cache, rerank_hits
+
+
+def hit(pid, text, combo):
+    return {"id": pid, "score": combo, "combo_score": combo, "payload": {"id": pid, "text": text}}
+
+
+HITS = [
+    hit("a", "rack power budget and cooling for dense GPU servers", 0.90),
+    hit("b", "NVMe storage tier for virtual machine disks", 0.60),
+    hit("c", "NVMe over fabrics storage with 100GE networking for virtual machines", 0.55),
+]
+
+
+def run(hits, **kw):
+    return asyncio.run(rerank_hits("nvme storage for virtual machines", hits, budget_ms=None, **kw))
+
+
+def test_blend_keeps_fused_signal():
+    rerank_cache.clear()
+    blended, info = run(HITS, collection="c1")
+    assert info["reranked"] and info["weight"] == 0.5
+    rerank = {h["id"]: h["rerank_score"] for h in blended}
+    assert rerank["c"] > rerank["b"] > rerank["a"]
+    # pure rerank order vs the fused order, and the blend in between
+    assert [h["id"] for h in run(HITS, collection="c1", weight=1.0)[0]] == ["c", "b", "a"]
+    assert [h["id"] for h in run(HITS, collection="c1", weight=0.0)[0]] == ["a", "b", "c"]
+    assert {h["id"]: round(h["final_score"], 3) for h in blended}["a"] == 0.5
+
+
+def test_rerank_ties_keep_the_fused_order():
+    rerank_cache.clear()
+    same = "NVMe storage for virtual machines"
+    hits = [hit("x", same, 0.2), hit("y", same, 0.8), hit("z", "unrelated cooling notes", 0.5)]
+    out, _ = run(hits, collection="c1")
+    assert [h["id"] for h in out] == ["y", "x", "z"]
+
+
+def test_scores_are_cached_per_collection():
+    rerank_cache.clear()
+    _, first = run(HITS, collection="c1")
+    _, again = run(HITS, collection="c1")
+    _, other = run(HITS, collection="c2")
+    assert (first["cached"], again["cached"], other["cached"]) == (0, 3, 0)
+
+    rerank_cache.clear("c1")
+    _, after = run(HITS, collection="c1")
+    _, kept = run(HITS, collection="c2")
+    assert (after["cached"], kept["cached"]) == (0, 3)
+
+
+def test_cache_lru_bound():
+    cache = RerankCache(max_size=2)
+    cache.put_many("c", "m", "q", {"a": 1.0, "b": 2.0})
+    cache.get_many("c", "m", "q", ["a"])
+    cache.put_many("c", "m", "q", {"c": 3.0})
+    assert cache.get_many("c", "m", "q", ["a", "b", "c"]) == {"a": 1.0, "c": 3.0}
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from app.core.scoring import objective_ranks, pareto_front
+
+
+def brute_front(values):
+    out = []
+    for i, a in enumerate(values):
+        if not any(np.all(b >= a) and np.any(b > a) for j, b in enumerate(values) if j != i):
+            out.append(i)
+    return out
+
+
+def test_small_front():
+    values = np.array([
+        [1.0, 5.0],  # front
+        [2.0, 4.0],  # front
+        [1.5, 3.0],  # dominated by [2, 4]
+        [5.0, 1.0],  # front
+        [2.0, 4.0],  # duplicate of a front row: neither dominates the other
+    ])
+    assert pareto_front(values).tolist() == [0, 1, 3, 4]
+
+
+def test_empty_and_single():
+    assert pareto_front(np.zeros((0, 3))).tolist() == []
+    assert pareto_front(np.array([[1.0, 2.0, 3.0]])).tolist() == [0]
+
+
+@pytest.mark.parametrize("n,d,block", [(200, 2, 1024), (500, 3, 64), (300, 4, 7)])
+def test_matches_brute_force(n, d, block):
+    rng = np.random.default_rng(n + d)
+    # coarse values so ties and duplicates occur
+    values = rng.integers(0, 12, size=(n, d)).astype(float)
+    assert pareto_front(values, block=block).tolist() == brute_front(values)
+
+
+def test_objective_ranks_share_ties():
+    values = np.array([[3.0, 1.0], [5.0, 1.0], [3.0, 2.0]])
+    assert objective_ranks(values).tolist() == [[2, 2], [1, 2], [2, 1]]
+
+
+@pytest.mark.parametrize("n,d,hi", [(400, 2, 6), (300, 2, 50), (100, 1, 5)])
+def test_sweep_matches_brute_force(n, d, hi):
+    rng = np.random.default_rng(n * d + hi)
+    values = rng.integers(0, hi, size=(n, d)).astype(float)
+    assert pareto_front(values).tolist() == brute_front(values)
+
+
+def test_anti_correlated_front_is_fast_and_capped():
+    import time
+
+    x = np.random.default_rng(0).random(100_000)
+    values = np.column_stack([x, 1.0 - x])  # every row is on the front
+    start = time.perf_counter()
+    assert pareto_front(values).size == 100_000
+    assert time.perf_counter() - start < 2.0
+
+    capped = pareto_front(values, max_front=50)
+    assert capped.size == 50
+    assert set(capped.tolist()) <= set(range(100_000))
+
+
+def test_skyline_cap_returns_only_front_rows():
+    rng = np.random.default_rng(3)
+    values = rng.random((400, 3))
+    full = set(brute_front(values))
+    assert len(full) > 10
+    capped = pareto_front(values, block=16, max_front=10)
+    assert capped.size == 10 and set(capped.tolist()) <= full
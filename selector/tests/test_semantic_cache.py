@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.rag.semantic_cache import SemanticCache
+
+DOCS = [
+    {"id": "vm", "text": "Virtualization clusters size vCPU and memory from concurrency; NVMe datastores hold hot VM disks."},
+    {"id": "net", "text": "Spine-leaf fabrics with 25G server ports carry east-west traffic between application tiers."},
+]
+
+
+def test_nearest_stays_within_the_variant():
+    cache = SemanticCache(threshold=0.9)
+    v = np.array([1.0, 0.0, 0.0])
+    cache.put("c", "plain", v, "q plain", {}, ["a"], cache.version("c"))
+    cache.put("c", "reranked", v * 2, "q reranked", {}, ["b"], cache.version("c"))
+    cache.put("other", "plain", v, "q other", {}, ["z"], cache.version("other"))
+    near = cache.nearest("c", "plain", np.array([1.0, 0.1, 0.0]))
+    assert near["query"] == "q plain" and near["ids"] == ["a"] and near["similarity"] > 0.99
+    assert cache.nearest("c", "filtered", v) is None
+    # not a lookup: hit/miss counters are untouched
+    assert cache.stats("c")["collections"]["c"]["hits"] == 0
+
+
+def test_evaluation_scores_only_plain_vector_searches(client, collection):
+    assert client.post("/api/rag/index", json={"collection": collection, "docs": DOCS, "provider": "hash"}).status_code == 200
+    query = "vm storage sizing"
+    sample = {"collection": collection, "provider": "hash", "topk": 2, "samples": [{"query": query, "relevant_ids": ["vm::0"]}]}
+
+    # reranked and filtered answers to the same query are other results
+    client.post("/api/rag/search", json={"collection": collection, "provider": "hash", "query": query, "topk": 2})
+    client.post("/api/rag/search", json={"collection": collection, "provider": "hash", "query": query, "topk": 2, "rerank": False, "where": {"doc_id": "net"}})
+    ev = client.post("/api/rag/evaluate", json=sample).json()
+    assert ev["semantic_cache"]["served"] == 0 and ev["results"][0]["cache_similarity"] is None
+
+    client.post("/api/rag/search", json={"collection": collection, "provider": "hash", "query": query, "topk": 2, "rerank": False})
+    ev = client.post("/api/rag/evaluate", json=sample).json()
+    row = ev["results"][0]
+    assert ev["semantic_cache"]["served"] == 1 and row["cache_query"] == query
+    assert row["cache_overlap@k"] == 1.0 and row["cached_recall@k"] == row["recall@k"]
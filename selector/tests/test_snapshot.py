@@ -0,0 +1,97 @@
+import asyncio
+import io
+import json
+import tarfile
+
+import pytest
+
+from app.rag import snapshot
+from app.rag.chunk_store import chunk_store
+from app.rag.fingerprints import FingerprintStore
+from conftest import MemoryQdrant
+
+DOCS = [
+    {"id": f"d{i}", "text": f"Document {i} covers storage tiering, NVMe caching and erasure coding for rack {i}."}
+    for i in range(12)
+]
+
+
+async def pieces(data, size=777):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def export_bytes(collection, qdr):
+    info = await qdr.collection_info(collection)
+    export = await snapshot.prepare_export(collection, collection, qdr, info)
+    parts = [p async for p in export.stream()]
+    return export, b"".join(parts)
+
+
+@pytest.fixture
+def indexed(client, qdrant, collection):
+    r = client.post("/api/rag/index", json={"collection": collection, "docs": DOCS})
+    assert r.json()["qdrant"]["status"] == "ok"
+    return collection
+
+
+def test_archive_is_a_plain_tar_with_announced_size(qdrant, indexed):
+    export, data = asyncio.run(export_bytes(indexed, MemoryQdrant(qdrant)))
+    assert len(data) == export.size
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        names = tar.getnames()
+        manifest = json.load(tar.extractfile(snapshot.MANIFEST))
+    assert names[0] == snapshot.MANIFEST
+    assert set(names[1:]) == {snapshot.FINGERPRINTS, snapshot.CHUNK_INDEX, snapshot.CHUNK_DATA, snapshot.QDRANT}
+    assert manifest["format"] == snapshot.FORMAT and manifest["points"] == manifest["chunks"] == len(DOCS)
+    assert set(manifest["embedding"]) == {"provider", "model", "dim"} and manifest["embedding"]["dim"] == 384
+    # the Qdrant snapshot is released once streamed
+    assert not qdrant["snapshots"]
+
+
+def test_restore_round_trip(qdrant, indexed):
+    qdr = MemoryQdrant(qdrant)
+    _, data = asyncio.run(export_bytes(indexed, qdr))
+    out = asyncio.run(snapshot.restore_archive(pieces(data), "restored", qdr))
+    assert out["points"] == len(DOCS) and not out["warnings"]
+    assert qdrant["collections"]["restored"]["points"] == qdrant["collections"][indexed]["points"]
+    assert dict(chunk_store("restored").items()) == dict(chunk_store(indexed).items())
+    fp = FingerprintStore("restored")
+    assert fp.counts() == FingerprintStore(indexed).counts()
+    fp.close()
+
+
+@pytest.mark.parametrize("damage, message", [
+    (lambda d: d[: len(d) // 2], "truncated"),
+    (lambda d: d[:-1024], "truncated"),  # end-of-archive blocks missing
+    (lambda d: d[512 * 2:], "bad tar header"),  # starts inside the manifest
+])
+def test_damaged_archive_is_rejected(qdrant, indexed, damage, message):
+    qdr = MemoryQdrant(qdrant)
+    _, data = asyncio.run(export_bytes(indexed, qdr))
+    with pytest.raises(snapshot.SnapshotError, match=message):
+        asyncio.run(snapshot.restore_archive(pieces(damage(data)), "broken", qdr))
+    assert "broken" not in qdrant["collections"]
+
+
+def test_corrupted_qdrant_snapshot_fails_checksum(qdrant, indexed):
+    qdr = MemoryQdrant(qdrant)
+    _, data = asyncio.run(export_bytes(indexed, qdr))
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        member = tar.getmember(snapshot.QDRANT)
+    flipped = bytearray(data)
+    flipped[member.offset_data + 10] ^= 0xFF
+    with pytest.raises(snapshot.SnapshotError, match="checksum"):
+        asyncio.run(snapshot.restore_archive(pieces(bytes(flipped)), "broken", qdr))
+
+
+def test_endpoints_round_trip(client, qdrant, indexed):
+    r = client.post(f"/api/rag/collections/{indexed}/snapshot")
+    assert r.status_code == 200 and int(r.headers["content-length"]) == len(r.content)
+    restored = client.post(f"/api/rag/collections/{indexed}/restore", content=r.content)
+    assert restored.status_code == 200, restored.text
+    job = restored.json()["job"]
+    assert job["status"] == "live" and qdrant["aliases"][indexed] == job["target"]
+    hits = client.post("/api/rag/search", json={"collection": indexed, "query": "NVMe caching rack 3", "semantic_cache": False}).json()["hits"]
+    assert hits and all(h["payload"].get("text") for h in hits)
+    assert client.post(f"/api/rag/collections/{indexed}/restore", content=r.content[:4000]).status_code == 400
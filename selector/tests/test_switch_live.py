@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app import main
+from app.rag.aliases import aliases
+
+DOCS = [
+    {"id": "a", "text": "Erasure coded object storage keeps durability high while using less raw capacity than replication."},
+    {"id": "b", "text": "NVMe flash tiers serve hot virtual machine disks with low latency and high IOPS per rack unit."},
+]
+
+
+@pytest.fixture(autouse=True)
+def jobs():
+    yield
+    main._reindex_jobs.clear()
+
+
+@pytest.fixture
+def legacy(client, qdrant, collection):
+    """`collection` as a plain Qdrant collection, indexed incrementally."""
+    r = client.post("/api/rag/index", json={"collection": collection, "docs": DOCS})
+    assert r.json()["qdrant"]["status"] == "ok"
+    assert collection in qdrant["collections"]
+    return collection
+
+
+def reindex(collection):
+    job = main._new_job(collection, "building")
+    req = main.RAGIndexRequest(collection=collection, docs=DOCS, mode="blue_green", gc_grace_s=0)
+    asyncio.run(main._run_reindex(job, req))
+    return job
+
+
+def search(client, collection):
+    r = client.post("/api/rag/search", json={"collection": collection, "query": "NVMe flash latency", "semantic_cache": False})
+    assert r.status_code == 200, r.text
+    return r.json()["hits"]
+
+
+def test_failed_alias_switch_keeps_the_only_copy(client, qdrant, legacy):
+    qdrant["fail"] = {"switch_alias": True}
+    job = reindex(legacy)
+    assert job["status"] == "failed" and job["live_in_app"]
+    # the legacy collection is gone, so the new version is all there is
+    assert legacy not in qdrant["collections"] and job["target"] in qdrant["collections"]
+    assert aliases.resolve(legacy) == job["target"]
+    assert search(client, legacy)
+
+    # the next job creates the Qdrant alias and collects the stranded version
+    qdrant["fail"] = {}
+    again = reindex(legacy)
+    assert again["status"] == "done" and again["previous"] == job["target"]
+    assert qdrant["aliases"][legacy] == again["target"] and job["target"] not in qdrant["collections"]
+    assert search(client, legacy)
+
+
+def test_failed_legacy_delete_rolls_back(client, qdrant, legacy):
+    qdrant["fail"] = {"delete_collection": True}
+    job = reindex(legacy)
+    assert job["status"] == "failed" and "live_in_app" not in job
+    assert aliases.resolve(legacy) == legacy
+    # nothing serves the target, so it is dropped (the injected failure hits that too)
+    assert ("delete_collection", job["target"]) in qdrant["calls"]
+    qdrant["fail"] = {}
+    assert legacy in qdrant["collections"]
+    assert search(client, legacy)
+
+
+def test_failed_switch_between_versions_keeps_live_one(client, qdrant, legacy):
+    first = reindex(legacy)
+    assert first["status"] == "done"
+    qdrant["fail"] = {"switch_alias": True}
+    job = reindex(legacy)
+    assert job["status"] == "failed" and "live_in_app" not in job
+    assert aliases.resolve(legacy) == first["target"] and qdrant["aliases"][legacy] == first["target"]
+    assert job["target"] not in qdrant["collections"]
+
+
+def test_incremental_index_waits_for_running_job(client, legacy):
+    job = main._new_job(legacy, "building")
+    r = client.post("/api/rag/index", json={"collection": legacy, "docs": DOCS})
+    assert r.status_code == 409 and job["job_id"] in r.json()["detail"]
+    job["status"] = "live"
+    assert client.post("/api/rag/index", json={"collection": legacy, "docs": DOCS}).status_code == 200
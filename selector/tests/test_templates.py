@@ -0,0 +1,136 @@
+import math
+import random
+
+import pytest
+
+from app.core.param_planner import plan_parameters
+from app.core.templates import TemplateIndex, _ParamIndex, parse_constraint, plan_query
+
+INF = math.inf
+
+CAPS = [
+    {"category": "server", "template": "virtualization_baseline", "params": {
+        "scenarios": ["virtualization"],
+        "compute": {"vcpu_range": [8, 32], "memory_gb_range": [32, 256]},
+        "network": {"nic_min": "2x10G"},
+        "storage": {"hot_capacity_tb": 2},
+    }},
+    {"category": "switch", "template": "campus_access_l3", "params": {
+        "scenarios": ["campus_access"],
+        "network": {"ports_ge": ">=48", "uplinks_25g": ">=2"},
+        "security": {"acl": True},
+    }},
+    {"category": "security", "template": "boundary_ngfw", "params": {
+        "scenarios": ["sec_boundary"],
+        "security": {"l7_tput_gbps": ">=5", "log_retention_days": 180, "acl": False},
+    }},
+    {"category": "server", "template": "edge_small", "params": {"compute": {"vcpu_range": "<=8"}}},
+]
+
+
+@pytest.mark.parametrize("key,value,expected", [
+    ("ports_ge", ">=48", (48.0, INF)),
+    ("x", "<=10", (-INF, 10.0)),
+    ("x", "8-32", (8.0, 32.0)),
+    ("x", "8 to 32", (8.0, 32.0)),
+    ("x", [32, 8], (8.0, 32.0)),
+    ("x", "==4", (4.0, 4.0)),
+    ("nic_min", "2x10G", (20.0, INF)),
+    ("nic", "2x25G + 4x10G", (90.0, INF)),
+    ("hot_capacity_tb", 2, (2.0, INF)),
+    ("log_retention_days", "180", (180.0, INF)),
+    ("acl", True, None),
+    ("tls", "TLS1.3", None),
+])
+def test_parse_constraint(key, value, expected):
+    assert parse_constraint(key, value) == expected
+
+
+def test_default_virtualization_plan_matches_its_template():
+    idx = TemplateIndex(CAPS)
+    query = plan_query(plan_parameters({"scenario": "virtualization"}))
+    assert query["storage.hot_capacity_tb"] == 4.0
+    names = [t["template"] for t in idx.match(query, "virtualization", "server")]
+    assert names == ["virtualization_baseline", "edge_small"]
+    assert idx.match(query, "virtualization", "server")[0]["matched"] == 3
+
+
+def test_fit_and_within_modes():
+    idx = TemplateIndex(CAPS)
+    assert [t["template"] for t in idx.match({"network.ports_ge": 24}, mode="fit")][0] == "campus_access_l3"
+    assert "campus_access_l3" not in [t["template"] for t in idx.match({"network.ports_ge": 24}, mode="within")]
+    assert [t["template"] for t in idx.match({"compute.vcpu_range": [40, 64]}, category="server")] == []
+    assert [t["template"] for t in idx.match({"compute.vcpu_range": 16}, category="server", mode="within")] == ["virtualization_baseline"]
+
+
+def test_flags_exclude_only_contradicting_templates():
+    idx = TemplateIndex(CAPS)
+    names = [t["template"] for t in idx.match({"security.acl": True})]
+    assert "boundary_ngfw" not in names and names[0] == "campus_access_l3"
+    assert len(names) == 3
+
+
+def test_param_index_lookups_touch_only_excluded_templates():
+    pix = _ParamIndex([(0.0, 10.0, 0), (5.0, INF, 1), (20.0, 30.0, 2), (-INF, 4.0, 3)])
+    assert sorted(pix.below(6.0)) == [3]
+    assert sorted(pix.above(6.0)) == [2]
+    assert sorted(pix.excluded(6.0, "within")) == [2, 3]
+    assert pix.excluded(40.0, "fit") == [3, 0, 2]
+
+
+def test_matches_brute_force_on_random_templates():
+    rng = random.Random(7)
+    caps = []
+    for i in range(300):
+        params = {}
+        for key in ("a", "b", "c"):
+            kind = rng.random()
+            lo = rng.randint(0, 50)
+            if kind < 0.3:
+                params[key] = [lo, lo + rng.randint(0, 50)]
+            elif kind < 0.5:
+                params[key] = f">={lo}"
+            elif kind < 0.6:
+                params[key] = f"<={lo}"
+            elif kind < 0.75:
+                params[key] = lo
+        if rng.random() < 0.3:
+            params["f"] = rng.random() < 0.5
+        caps.append({"category": rng.choice(["server", "switch"]), "template": f"t{i}", "params": params})
+    idx = TemplateIndex(caps)
+
+    def ok(i, query, mode):
+        for key, value in query.items():
+            if isinstance(value, bool):
+                if idx.flags[i].get(key, value) != value:
+                    return False
+                continue
+            iv = idx.intervals[i].get(key)
+            if iv is not None and not (iv[1] >= value if mode == "fit" else iv[0] <= value <= iv[1]):
+                return False
+        return True
+
+    for _ in range(200):
+        query = {k: rng.randint(-5, 110) for k in rng.sample(["a", "b", "c"], rng.randint(1, 3))}
+        if rng.random() < 0.3:
+            query["f"] = rng.random() < 0.5
+        mode = rng.choice(["fit", "within"])
+        category = rng.choice([None, "server"])
+        got = {t["template"] for t in idx.match(query, category=category, mode=mode)}
+        want = {c["template"] for i, c in enumerate(caps) if ok(i, query, mode) and (category is None or c["category"] == category)}
+        assert got == want
+
+
+def test_templates_match_endpoint_uses_the_plan(client, monkeypatch, tmp_path):
+    import csv
+    import json
+
+    path = tmp_path / "capabilities.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["category", "template", "params_json", "notes", "updated_at"])
+        for cap in CAPS:
+            w.writerow([cap["category"], cap["template"], json.dumps(cap["params"]), "", "2025-08-01"])
+    monkeypatch.setenv("CAPABILITIES_CSV", str(path))
+    r = client.post("/api/templates/match", json={"scenario": "virtualization", "category": "server"})
+    assert [t["template"] for t in r.json()["templates"]][0] == "virtualization_baseline"
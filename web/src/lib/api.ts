@@ -117,7 +117,7 @@ export async function getEvals(base: string, apiKey?: string) {
   const now = Date.now();
   const evals = (res?.evals || []).map((e: any) => ({
     collection: e.collection,
-    timestamp: now,
+    timestamp: e.created_at ? Math.round(e.created_at * 1000) : now,
     recall_at_3: e.summary?.['Recall@k'] ?? null,
     precision_at_3: e.summary?.['Precision@k'] ?? null,
     latency_p95: e.summary?.['Latency P95 (ms)'] ?? null,